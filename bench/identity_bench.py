@@ -0,0 +1,65 @@
+"""Decodes activity pages of 500 items with and without the per-response
+identity map, for pages whose items come from fewer or more distinct
+owners, and counts the model objects each leaves behind.
+
+    python bench/identity_bench.py
+"""
+
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rdio'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'test'))
+from rdio import JSONBasedObject, RdioActivityStream, decode_response_result
+import fixtures
+
+ITEMS = 500
+REPEATS = 10
+
+
+def page(owners):
+    users = [fixtures.user('s%d' % i, firstName='User%d' % i,
+                           lastSongPlayed=fixtures.track('t%d' % i))
+             for i in range(owners)]
+    return {'last_id': 1, 'user': users[0], 'updates': [
+        fixtures.activity(owner=users[i % owners],
+                          date='2011-06-01T12:%02d:00' % (i % 60),
+                          albums=[fixtures.album('a%d' % (i % owners))])
+        for i in range(ITEMS)]}
+
+
+def objects(value, seen):
+    if isinstance(value, JSONBasedObject):
+        if id(value) in seen: return
+        seen.add(id(value))
+        for attr, item in value.__dict__.iteritems():
+            if attr != '_data': objects(item, seen)
+    elif isinstance(value, list):
+        for item in value: objects(item, seen)
+    return len(seen)
+
+
+def best(function, *args):
+    times = []
+    for i in range(REPEATS):
+        start = time.time()
+        result = function(*args)
+        times.append(time.time() - start)
+    return min(times), result
+
+
+def main():
+    print '%8s  %-12s %9s %9s' % ('owners', 'decode', 'time', 'objects')
+    for owners in (1, 10, 100, ITEMS):
+        data = page(owners)
+        for name, decode in (
+                ('plain', RdioActivityStream),
+                ('identity', lambda data: decode_response_result(
+                    RdioActivityStream, data))):
+            elapsed, stream = best(decode, data)
+            print '%8d  %-12s %7.1fms %9d' % (
+                owners, name, elapsed * 1000, objects(stream, set()))
+
+
+if __name__ == '__main__':
+    main()
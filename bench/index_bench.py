@@ -0,0 +1,63 @@
+"""Times CollectionIndex queries against a synthetic collection, typing each
+query one keystroke at a time the way a search box would. Each keystroke
+reports the best of REPEATS runs.
+
+    python bench/index_bench.py [tracks]
+"""
+
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rdio'))
+from rdio import RdioTrack
+from index import CollectionIndex
+
+WORDS = ('love night blue heart fire dream home time light girl road rain '
+         'summer city river gold wild black song dance moon star baby '
+         'never world sweet ghost shadow dark island paper').split()
+REPEATS = 20
+QUERIES = ('love', 'night fire', 'artist 12', 'album 7 dark', 'zzz', 'b')
+
+
+def track(i, rand):
+    key = 't%d' % i
+    return RdioTrack({
+        'key': key, 'type': 't', 'url': '/music/%s/' % key, 'icon': '',
+        'baseIcon': '', 'name': ' '.join(rand.sample(WORDS, 3)),
+        'artist': 'Artist %d' % (i % 2000), 'artistUrl': '',
+        'artistKey': 'r%d' % (i % 2000), 'isExplicit': False,
+        'isClean': False, 'price': '0.99', 'canStream': True,
+        'canSample': True, 'canTether': True, 'shortUrl': '', 'embedUrl': '',
+        'duration': 200, 'album': 'Album %d %s' % (i % 5000,
+                                                   rand.choice(WORDS)),
+        'albumKey': 'a%d' % (i % 5000), 'albumUrl': '', 'canDownload': False,
+        'canDownloadAlbumOnly': False, 'trackNum': i % 12,
+        'playCount': rand.randint(0, 500)})
+
+
+def main(size):
+    rand = random.Random(0)
+    tracks = [track(i, rand) for i in range(size)]
+    start = time.time()
+    index = CollectionIndex(tracks)
+    print 'built index of %d tracks in %.2fs' % (size, time.time() - start)
+    for sort in (None, 'name', 'playCount'):
+        for query in QUERIES:
+            times = []
+            for end in range(1, len(query) + 1):
+                best = None
+                for repeat in range(REPEATS):
+                    start = time.time()
+                    index.get_tracks_in_collection(query=query[:end],
+                                                   sort=sort, count=50)
+                    elapsed = time.time() - start
+                    best = elapsed if best is None else min(best, elapsed)
+                times.append(best)
+            print '%-10s %-14r mean %8.1fus  max %8.1fus' % (
+                sort or 'dateAdded', query,
+                sum(times) / len(times) * 1e6, max(times) * 1e6)
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,60 @@
+"""Times Api.get through chains of pass-through middleware layers against a
+transport that answers instantly, so what is left is the client's own cost
+per call and what each layer adds to it. Each depth reports the best of
+REPEATS runs of CALLS calls.
+
+    python bench/middleware_bench.py
+"""
+
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rdio'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'test'))
+from rdio import Api
+import fixtures
+
+CALLS = 2000
+REPEATS = 5
+
+
+class InstantTransport(object):
+
+    def __init__(self):
+        self.content = json.dumps({'status': 'ok',
+                                   'result': {'t1': fixtures.track('t1')}})
+
+    def request(self, url, body, headers):
+        return {'status': '200'}, self.content
+
+
+def passthrough(call, proceed):
+    return proceed(call)
+
+
+def per_call(api):
+    best = None
+    for i in range(REPEATS):
+        start = time.time()
+        for j in range(CALLS): api.get(['t1'])
+        elapsed = (time.time() - start) / CALLS
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    print '%7s %12s %14s' % ('layers', 'us per call', 'us per layer')
+    base = None
+    for depth in (0, 1, 5, 20):
+        api = Api('key', 'secret', transport=InstantTransport(),
+                  middleware=[passthrough] * depth)
+        seconds = per_call(api)
+        if base is None: base = seconds
+        print '%7d %12.1f %14s' % (
+            depth, seconds * 1e6,
+            '%.2f' % ((seconds - base) * 1e6 / depth) if depth else '-')
+
+
+if __name__ == '__main__':
+    main()
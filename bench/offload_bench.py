@@ -0,0 +1,85 @@
+"""Compares inline decoding with DecodeOffloader for growing responses.
+
+For each response size it reports how long one decode takes and how much
+work a second thread got done meanwhile (a GIL stall shows up as a low
+number). Offloading pays off from the first size where its time is lower,
+or where the other thread keeps making progress.
+
+    python bench/offload_bench.py [processes]
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from functools import partial
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rdio'))
+from rdio import parse_response, parse_result_list
+from offload import DecodeOffloader
+
+SIZES = (10, 100, 1000, 5000, 20000)
+
+
+def track(i):
+    key = 't%d' % i
+    return {
+        'key': key, 'type': 't', 'url': '/music/%s/' % key,
+        'icon': 'http://img.rdio.com/album/%d/square-200.jpg' % (i % 97),
+        'baseIcon': 'album/%d/square-200.jpg' % (i % 97),
+        'name': 'Track %d' % i, 'artist': 'Artist %d' % (i % 31),
+        'artistUrl': '/artist/%d/' % (i % 31), 'artistKey': 'r%d' % (i % 31),
+        'isExplicit': False, 'isClean': False, 'price': '0.99',
+        'canStream': True, 'canSample': True, 'canTether': True,
+        'shortUrl': 'http://rd.io/x/%s/' % key,
+        'embedUrl': 'http://rd.io/e/%s/' % key, 'duration': 200 + i % 100,
+        'album': 'Album %d' % (i % 97), 'albumKey': 'a%d' % (i % 97),
+        'albumUrl': '/album/%d/' % (i % 97), 'canDownload': False,
+        'canDownloadAlbumOnly': False, 'trackNum': i % 12}
+
+
+def measure(decode, content, repeat=3):
+    progress = [0]
+    done = threading.Event()
+    def spin():
+        while not done.is_set():
+            progress[0] += 1
+            time.sleep(0)
+    spinner = threading.Thread(target=spin)
+    spinner.start()
+    start = time.time()
+    for i in range(repeat):
+        decode(content)
+    elapsed = (time.time() - start) / repeat
+    done.set()
+    spinner.join()
+    return elapsed, progress[0] / repeat
+
+
+def main():
+    processes = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    offloader = DecodeOffloader(processes=processes, threshold=0)
+    decoder = partial(parse_result_list, fields=None)
+    inline = lambda content: parse_response(content, decoder)
+    offloaded = lambda content: offloader.decode(content, decoder)
+    print '%8s %10s %12s %12s %12s %12s' % (
+        'tracks', 'bytes', 'inline ms', 'offload ms', 'inline spin',
+        'offload spin')
+    crossover = None
+    for size in SIZES:
+        content = json.dumps({'status': 'ok',
+                              'result': [track(i) for i in range(size)]})
+        inline_time, inline_spin = measure(inline, content)
+        offload_time, offload_spin = measure(offloaded, content)
+        print '%8d %10d %12.1f %12.1f %12d %12d' % (
+            size, len(content), inline_time * 1000, offload_time * 1000,
+            inline_spin, offload_spin)
+        if crossover is None and offload_time < inline_time:
+            crossover = len(content)
+    offloader.close()
+    if crossover: print 'Offloading is faster from about %d bytes.' % crossover
+    else: print 'Offloading was never faster; tune on a multi-core machine.'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Compares serialize.dump/load with cPickle and plain JSON for batches of
+decoded tracks, playlists with their tracks, and activity pages.
+
+JSON can only carry the raw data, so its load time includes decoding the
+models again. Expect dump/load to be the smallest by far but not the
+fastest: cPickle is written in C.
+
+    python bench/serialize_bench.py
+"""
+
+import cPickle
+import json
+import os
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rdio'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'test'))
+from rdio import RdioActivityStream, RdioPlaylist, RdioTrack
+from serialize import dump, load
+import fixtures
+
+REPEATS = 5
+
+
+def tracks():
+    return [RdioTrack(fixtures.track('t%d' % i, name='Track %d' % i,
+                                     playCount=i % 50))
+            for i in range(1000)]
+
+
+def playlists():
+    return [RdioPlaylist(fixtures.playlist(
+        'p%d' % i, tracks=[fixtures.track('t%d' % ((i * 7 + j) % 300))
+                           for j in range(20)]))
+            for i in range(100)]
+
+
+def activity():
+    owners = [fixtures.user('s%d' % i, firstName='User%d' % i,
+                            lastSongPlayed=fixtures.track('t%d' % i))
+              for i in range(10)]
+    return [RdioActivityStream({
+        'last_id': 1, 'user': owners[0],
+        'updates': [fixtures.activity(owner=owners[i % 10],
+                                      date='2011-06-01T12:%02d:00' % (i % 60))
+                    for i in range(200)]})]
+
+
+def best(function, *args):
+    times = []
+    for i in range(REPEATS):
+        start = time.time()
+        result = function(*args)
+        times.append(time.time() - start)
+    return min(times), result
+
+
+def main():
+    for name, build, cls in (('tracks', tracks, RdioTrack),
+                             ('playlists', playlists, RdioPlaylist),
+                             ('activity', activity, RdioActivityStream)):
+        objects = build()
+        raw = [obj._data for obj in objects]
+        codecs = (
+            ('dump/load', dump, load),
+            ('cPickle', lambda o: cPickle.dumps(o, 2), cPickle.loads),
+            ('json', lambda o: json.dumps(raw),
+             lambda s: [cls(data) for data in json.loads(s)]))
+        print name
+        for codec, encode, decode in codecs:
+            dump_time, encoded = best(encode, objects)
+            load_time, decoded = best(decode, encoded)
+            print '  %-10s %9d bytes  dump %7.1fms  load %7.1fms' % (
+                codec, len(encoded), dump_time * 1000, load_time * 1000)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,56 @@
+"""Builds an ArtistSimilarity from synthetic collections with a long tail of
+artists, then times similar() for popular and obscure artists against
+counting every artist pair with nested loops.
+
+    python bench/similar_bench.py [users] [artists per user]
+"""
+
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rdio'))
+from similar import ArtistSimilarity
+
+ARTISTS = 50000
+
+
+def collections(users, size):
+    rand = random.Random(0)
+    for user in range(users):
+        # Squaring skews picks towards low numbers, so r0 is the most
+        # collected artist and the tail is long.
+        yield 's%d' % user, ['r%d' % int(ARTISTS * rand.random() ** 2)
+                             for i in range(size)]
+
+
+def nested_loops(users, size):
+    pairs = {}
+    for user, artists in collections(users, size):
+        artists = sorted(set(artists))
+        for i, a in enumerate(artists):
+            for b in artists[i + 1:]:
+                pairs[a, b] = pairs.get((a, b), 0) + 1
+    return pairs
+
+
+def main(users, size):
+    start = time.time()
+    matrix = ArtistSimilarity()
+    for user, artists in collections(users, size):
+        matrix.add(user, artists)
+    print 'built %d pairs in %.2fs' % (len(matrix), time.time() - start)
+    for artist in ('r0', 'r100', 'r10000', 'r40000'):
+        start = time.time()
+        similar = matrix.similar(artist)
+        print '%-7s %6d fans  similar() %8.1fms  top %s' % (
+            artist, matrix.fans(artist), (time.time() - start) * 1000,
+            similar[0][0] if similar else None)
+    start = time.time()
+    pairs = nested_loops(min(users, 200), size)
+    print 'nested loops over %d users: %d pairs counted in %.2fs' % (
+        min(users, 200), len(pairs), time.time() - start)
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]] or [10000, 200])
@@ -0,0 +1,63 @@
+"""Stress-tests one Api shared by many threads. Every request goes through a
+PooledHttpTransport of CONNECTIONS fake connections that each take LATENCY
+seconds to answer, the way a real socket would. Throughput should grow
+linearly with the thread count up to CONNECTIONS and then level off.
+
+    python bench/thread_bench.py [connections] [latency]
+"""
+
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'rdio'))
+from rdio import Api, PooledHttpTransport
+
+DURATION = 2.0
+RESPONSE = '{"status": "ok", "result": "token"}'
+
+
+class SlowTransport(object):
+
+    def __init__(self, latency):
+        self.latency = latency
+
+    def request(self, url, body, headers):
+        time.sleep(self.latency)
+        return {'status': '200'}, RESPONSE
+
+
+def run(api, threads):
+    counts = [0] * threads
+    stop = threading.Event()
+    def work(i):
+        while not stop.is_set():
+            api.get_playback_token()
+            counts[i] += 1
+    workers = [threading.Thread(target=work, args=(i,))
+               for i in range(threads)]
+    start = time.time()
+    for worker in workers: worker.start()
+    time.sleep(DURATION)
+    stop.set()
+    for worker in workers: worker.join()
+    return sum(counts) / (time.time() - start)
+
+
+def main(connections, latency):
+    transport = PooledHttpTransport(
+        connections, factory=lambda: SlowTransport(latency))
+    api = Api('key', 'secret', 'token', 'secret', transport=transport)
+    single = None
+    for threads in sorted(set([1, 2, connections // 2, connections,
+                               connections * 2]) - set([0])):
+        throughput = run(api, threads)
+        single = single or throughput
+        print '%3d threads  %8.1f calls/s  %5.2fx  (linear %dx)' % (
+            threads, throughput, throughput / single,
+            min(threads, connections))
+
+
+if __name__ == '__main__':
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 8,
+         float(sys.argv[2]) if len(sys.argv) > 2 else 0.02)
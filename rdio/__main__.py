@@ -0,0 +1,7 @@
+"""Runs the command line tool; see cli.py, or `python -m rdio --help`."""
+
+import sys
+
+from cli import main
+
+sys.exit(main())
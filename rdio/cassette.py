@@ -0,0 +1,127 @@
+"""Records API traffic to a cassette file and replays it, so Api can be
+exercised offline and deterministically."""
+
+from collections import defaultdict
+import json
+import random
+import threading
+import time
+from urlparse import parse_qsl
+
+import httplib2
+
+
+class CassetteMissError(KeyError):
+    """Raised when a replayed request was never recorded."""
+
+
+def request_key(url, body):
+    """Identifies a request by its URL and non-oAuth parameters, so the
+    changing nonce, timestamp and signature don't matter."""
+    params = sorted((k, v) for k, v in parse_qsl(body or '', True)
+                    if not k.startswith('oauth_'))
+    return json.dumps([url, params])
+
+
+def _method(key):
+    return dict(json.loads(key)[1]).get('method')
+
+
+class RecordingTransport(object):
+    """Wraps a transport and records every request/response pair sent
+    through it, along with how long each took."""
+
+    def __init__(self, transport, path=None):
+        """Instantiates a new recorder.
+
+        Keyword arguments:
+        transport -- the transport to pass requests to.
+        path      -- optional. The cassette file save() writes to.
+
+        """
+        self.transport = transport
+        self.path = path
+        self.interactions = []
+        self._lock = threading.Lock()
+
+    def request(self, url, body, headers):
+        """Posts body to url through the wrapped transport and records it."""
+        start = time.time()
+        response, content = self.transport.request(url, body, headers)
+        duration = time.time() - start
+        with self._lock:
+            self.interactions.append({
+                'key': request_key(url, body),
+                'status': int(response.get('status', 200)),
+                'headers': dict(response),
+                'content': content,
+                'duration': duration})
+        return response, content
+
+    def save(self, path=None):
+        """Writes the recorded interactions to a cassette file."""
+        with self._lock:
+            interactions = list(self.interactions)
+        with open(path or self.path, 'w') as cassette:
+            json.dump({'interactions': interactions}, cassette, indent=1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.save()
+
+
+class ReplayTransport(object):
+    """Serves recorded responses back. Repeated requests are answered in the
+    order they were recorded, starting over once they run out.
+
+    latency may be None (answer at once), a number of seconds, or
+    'recorded' to sleep for durations drawn from those recorded for the same
+    API method."""
+
+    def __init__(self, path=None, interactions=None, latency=None, seed=0):
+        """Instantiates a new replayer.
+
+        Keyword arguments:
+        path         -- optional. The cassette file to replay.
+        interactions -- optional. Recorded interactions, instead of a file.
+        latency      -- optional. The latency to inject; see above.
+        seed         -- optional. Seeds the sampling of recorded latencies.
+
+        """
+        if interactions is None:
+            with open(path) as cassette:
+                interactions = json.load(cassette)['interactions']
+        self.latency = latency
+        self._random = random.Random(seed)
+        self._responses = defaultdict(list)
+        self._durations = defaultdict(list)
+        for interaction in interactions:
+            key = str(interaction['key'])
+            self._responses[key].append(interaction)
+            self._durations[_method(key)].append(interaction['duration'])
+        self._played = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def _delay(self, key):
+        if self.latency == 'recorded':
+            durations = self._durations[_method(key)]
+            with self._lock: return self._random.choice(durations)
+        return self.latency or 0
+
+    def request(self, url, body, headers):
+        """Returns the recorded response for this request."""
+        key = request_key(url, body)
+        recorded = self._responses.get(key)
+        if not recorded: raise CassetteMissError(key)
+        with self._lock:
+            interaction = recorded[self._played[key] % len(recorded)]
+            self._played[key] += 1
+        delay = self._delay(key)
+        if delay: time.sleep(delay)
+        response = httplib2.Response(dict(
+            (k.encode('utf-8'), v.encode('utf-8'))
+            for k, v in interaction['headers'].iteritems()))
+        response.status = interaction['status']
+        return response, interaction['content'].encode('utf-8')
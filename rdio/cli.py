@@ -0,0 +1,234 @@
+"""The command line tool run by `python -m rdio`, for bulk jobs against the
+API. Objects are written to the output as JSON Lines of their raw data as
+they arrive, and a per-method timing summary is printed when the job ends.
+
+Credentials are read from the RDIO_CONSUMER_KEY, RDIO_CONSUMER_SECRET,
+RDIO_TOKEN and RDIO_TOKEN_SECRET environment variables unless they are given
+as options."""
+
+import argparse
+from multiprocessing.pool import ThreadPool
+import json
+import os
+import sys
+import time
+
+from rdio import Api, PooledHttpTransport
+from throttle import RateLimiter, ThrottledTransport
+from timing import TimingTransport
+
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _read_keys(stream):
+    keys = []
+    for line in stream:
+        keys.extend(key for key in line.replace(',', ' ').split())
+    return keys
+
+
+class Job(object):
+    """What every command gets: the Api, a thread pool of the configured
+    concurrency, the parsed arguments, and the output."""
+
+    def __init__(self, api, pool, args, output, log):
+        self.api = api
+        self.pool = pool
+        self.args = args
+        self.output = output
+        self.log = log
+        self.written = 0
+        self.errors = 0
+
+    def write(self, objects):
+        """Writes objects as JSON Lines and flushes, so output streams."""
+        lines = [json.dumps(obj._data, separators=(',', ':')) + '\n'
+                 for obj in objects if obj is not None]
+        self.output.write(''.join(lines))
+        self.output.flush()
+        self.written += len(lines)
+
+    def error(self, message):
+        self.errors += 1
+        self.log.write('error: %s\n' % (message,))
+
+    def input_keys(self):
+        if self.args.input == '-': return _read_keys(sys.stdin)
+        with open(self.args.input) as stream: return _read_keys(stream)
+
+
+def dump_collection(job):
+    """Writes every track in a collection, oldest first. Pages are fetched
+    concurrency at a time."""
+    api, args = job.api, job.args
+    size = args.chunk_size
+    def page(start):
+        return api.get_tracks_in_collection(user=args.user, start=start,
+                                            count=size, sort='dateAdded')
+    start = 0
+    while True:
+        starts = [start + i * size for i in range(args.concurrency)]
+        for tracks in job.pool.imap(page, starts):
+            tracks = tracks or []
+            job.write(tracks)
+            if len(tracks) < size: return
+        start += size * args.concurrency
+
+
+def get_keys(job):
+    """Writes the objects for the keys read from the input, in input order,
+    fetching chunk-size keys per get call."""
+    api, args = job.api, job.args
+    extras = args.extras.split(',') if args.extras else []
+    def fetch(keys):
+        try:
+            return keys, api.get(keys, extras=extras), None
+        except Exception as e:
+            return keys, None, e
+    for keys, objects, error in job.pool.imap(
+            fetch, _chunks(job.input_keys(), args.chunk_size)):
+        if error:
+            job.error('get %s...: %r' % (keys[0], error))
+            continue
+        found = dict((obj.key, obj) for obj in objects or [])
+        job.write([found[key] for key in keys if key in found])
+        for key in keys:
+            if key not in found: job.error('%s was not found' % key)
+
+
+def mirror_playlist(job):
+    """Copies a playlist, in order, into the current user's playlists and
+    writes the new playlist."""
+    api, args = job.api, job.args
+    results = api.get([args.playlist], extras=['trackKeys'])
+    if not results:
+        job.error('%s was not found' % args.playlist)
+        return
+    playlist = results[0]
+    chunks = list(_chunks(playlist.track_keys, args.chunk_size)) or [[]]
+    copy = api.create_playlist(args.name or 'Copy of %s' % playlist.name,
+                               playlist.description or '', chunks[0])
+    # Order matters, so the rest are added one chunk at a time.
+    for chunk in chunks[1:]: api.add_to_playlist(copy.key, chunk)
+    job.write([copy])
+
+
+def crawl_followers(job):
+    """Writes the followers of a user, then their followers, and so on to
+    depth, each user once."""
+    api, args = job.api, job.args
+    size = args.chunk_size
+    def followers(user):
+        found = []
+        try:
+            while True:
+                page = api.user_followers(user, start=len(found),
+                                          count=size) or []
+                found.extend(page)
+                if len(page) < size: return user, found, None
+        except Exception as e:
+            return user, found, e
+    seen = set([args.user])
+    frontier = [args.user]
+    for depth in range(args.depth):
+        next_frontier = []
+        for user, found, error in job.pool.imap_unordered(followers,
+                                                          frontier):
+            if error: job.error('followers of %s: %r' % (user, error))
+            new = []
+            for follower in found:
+                if follower.key not in seen:
+                    seen.add(follower.key)
+                    new.append(follower)
+            if args.limit: new = new[:args.limit - job.written]
+            job.write(new)
+            next_frontier.extend(follower.key for follower in new)
+            if args.limit and job.written >= args.limit: return
+        frontier = next_frontier
+
+
+def parser():
+    parser = argparse.ArgumentParser(
+        prog='python -m rdio', description=__doc__.split('\n\n')[0])
+    environ = os.environ.get
+    parser.add_argument('--consumer-key',
+                        default=environ('RDIO_CONSUMER_KEY'))
+    parser.add_argument('--consumer-secret',
+                        default=environ('RDIO_CONSUMER_SECRET'))
+    parser.add_argument('--token', default=environ('RDIO_TOKEN'))
+    parser.add_argument('--token-secret',
+                        default=environ('RDIO_TOKEN_SECRET'))
+    parser.add_argument('--concurrency', type=int, default=4,
+                        help='requests in flight at once (default 4)')
+    parser.add_argument('--rate', type=float, default=0,
+                        help='most requests per second (default unlimited)')
+    parser.add_argument('--chunk-size', type=int, default=100,
+                        help='objects per request (default 100)')
+    parser.add_argument('--input', default='-',
+                        help='file to read keys from (default stdin)')
+    parser.add_argument('--output', default='-',
+                        help='file to write JSON Lines to (default stdout)')
+    commands = parser.add_subparsers(title='commands')
+
+    command = commands.add_parser('collection', help=dump_collection.__doc__)
+    command.add_argument('--user', help='the owner (default: you)')
+    command.set_defaults(run=dump_collection)
+
+    command = commands.add_parser('get', help=get_keys.__doc__)
+    command.add_argument('--extras', help='comma-separated extra fields')
+    command.set_defaults(run=get_keys)
+
+    command = commands.add_parser('mirror-playlist',
+                                  help=mirror_playlist.__doc__)
+    command.add_argument('playlist', help='the key of the playlist')
+    command.add_argument('--name', help='the name of the copy')
+    command.set_defaults(run=mirror_playlist)
+
+    command = commands.add_parser('followers', help=crawl_followers.__doc__)
+    command.add_argument('user', help='the key of the user to start from')
+    command.add_argument('--depth', type=int, default=1)
+    command.add_argument('--limit', type=int, default=0,
+                         help='stop after this many users')
+    command.set_defaults(run=crawl_followers)
+    return parser
+
+
+def main(argv=None, transport=None):
+    """Runs the tool. Returns the exit status: 0, or 1 if any item failed.
+
+    Keyword arguments:
+    argv      -- optional. The arguments, instead of sys.argv[1:].
+    transport -- optional. The transport to call the API through, instead
+                 of a PooledHttpTransport of concurrency connections.
+
+    """
+    args = parser().parse_args(argv)
+    times = TimingTransport(transport or
+                            PooledHttpTransport(args.concurrency))
+    transport = times
+    if args.rate: transport = ThrottledTransport(
+        times, RateLimiter(args.rate, burst=args.concurrency))
+    api = Api(args.consumer_key, args.consumer_secret, args.token,
+              args.token_secret, transport=transport)
+    # The library prints some messages, so keep them out of the output.
+    stdout = sys.stdout
+    output = stdout if args.output == '-' else open(args.output, 'w')
+    sys.stdout = sys.stderr
+    pool = ThreadPool(args.concurrency)
+    job = Job(api, pool, args, output, sys.stderr)
+    start = time.time()
+    try:
+        args.run(job)
+    finally:
+        pool.close()
+        pool.join()
+        sys.stdout = stdout
+        if output is not stdout: output.close()
+        elapsed = time.time() - start
+        sys.stderr.write('%s\n%d objects in %.2fs (%.1f/s), %d errors\n' % (
+            times.times.summary(), job.written, elapsed,
+            job.written / elapsed if elapsed else 0.0, job.errors))
+    return 1 if job.errors else 0
@@ -0,0 +1,182 @@
+"""A transport that asks for compressed responses and decompresses them as
+they arrive, counting bytes on the wire and after decompression per API
+method."""
+
+import errno
+import httplib
+import socket
+import threading
+import zlib
+from urlparse import urlsplit
+
+import httplib2
+
+from rdio import HTTP_METHOD, request_method
+
+CHUNK_SIZE = 16 * 1024
+ACCEPT_ENCODING = 'gzip, deflate'
+# Errors that mean a reused keep-alive connection was closed by the server
+# before our request reached it, so sending it again is safe.
+_STALE_ERRORS = (httplib.BadStatusLine, httplib.CannotSendRequest)
+_STALE_ERRNOS = (errno.ECONNRESET, errno.EPIPE)
+
+
+class TransferStats(object):
+    """Counts calls, compressed bytes and decompressed bytes per API method.
+    Safe to share between transports and threads."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = {}
+
+    def record(self, method, compressed, decompressed):
+        with self._lock:
+            totals = self._totals.setdefault(method, [0, 0, 0])
+            totals[0] += 1
+            totals[1] += compressed
+            totals[2] += decompressed
+
+    def report(self):
+        """Returns a dictionary of {method: {'calls', 'compressed',
+        'decompressed', 'ratio'}}, where ratio is decompressed / compressed.
+        """
+        with self._lock:
+            totals = dict((k, list(v)) for k, v in self._totals.iteritems())
+        report = {}
+        for method, (calls, compressed, decompressed) in totals.iteritems():
+            report[method] = {
+                'calls': calls,
+                'compressed': compressed,
+                'decompressed': decompressed,
+                'ratio': float(decompressed) / compressed if compressed
+                         else 1.0}
+        return report
+
+
+class _Deflate(object):
+    # "deflate" should be zlib-wrapped, but some servers send a raw stream.
+    # Try the wrapper first and fall back to raw if the header is wrong.
+
+    def __init__(self):
+        self._decompressor = zlib.decompressobj()
+        self._started = False
+
+    def decompress(self, data):
+        if not self._started:
+            self._started = True
+            try:
+                return self._decompressor.decompress(data)
+            except zlib.error:
+                self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+        return self._decompressor.decompress(data)
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+def decompressor(encoding):
+    """Returns an incremental decompressor for a Content-Encoding, or None if
+    the body isn't compressed."""
+    if encoding == 'gzip': return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if encoding == 'deflate': return _Deflate()
+    return None
+
+
+class CompressedHttpTransport(object):
+    """Sends requests over one keep-alive connection, negotiating gzip or
+    deflate and decompressing the body chunk by chunk. Not thread safe; use
+    one per thread, or several inside a PooledHttpTransport."""
+
+    def __init__(self, timeout=None, stats=None, chunk_size=CHUNK_SIZE):
+        """Instantiates a new transport.
+
+        Keyword arguments:
+        timeout    -- optional. The socket timeout.
+        stats      -- optional. The TransferStats to count bytes in.
+        chunk_size -- optional. How many bytes to read from the socket at
+                      once.
+
+        """
+        self.timeout = timeout
+        self.stats = stats or TransferStats()
+        self.chunk_size = chunk_size
+        self._address = None
+        self._connection = None
+        self._reused = False
+
+    def _connect(self, scheme, netloc):
+        if self._address != (scheme, netloc):
+            self.close()
+            if scheme == 'https':
+                connection = httplib.HTTPSConnection
+            else:
+                connection = httplib.HTTPConnection
+            self._connection = connection(netloc, timeout=self.timeout)
+            self._address = (scheme, netloc)
+            self._reused = False
+        return self._connection
+
+    def close(self):
+        """Closes the connection."""
+        if self._connection: self._connection.close()
+        self._address = self._connection = None
+        self._reused = False
+
+    def _stale(self, error):
+        if not self._reused: return False
+        if isinstance(error, _STALE_ERRORS): return True
+        return (isinstance(error, socket.error) and
+                not isinstance(error, socket.timeout) and
+                error.errno in _STALE_ERRNOS)
+
+    def stream(self, url, body, headers):
+        """Posts body to url. Returns a (response, chunks) tuple, where chunks
+        iterates over the decompressed body. The chunks must be read to the
+        end before the next request."""
+        scheme, netloc, path = urlsplit(url)[:3]
+        headers = dict(headers)
+        headers['Accept-Encoding'] = ACCEPT_ENCODING
+        connection = self._connect(scheme, netloc)
+        try:
+            connection.request(HTTP_METHOD, path, body, headers)
+            raw = connection.getresponse()
+        except (httplib.HTTPException, socket.error) as e:
+            # Only send again when the server dropped our idle keep-alive
+            # connection. Anything else, a timeout included, may have been
+            # applied already, and calls like addToPlaylist aren't safe to
+            # repeat.
+            stale = self._stale(e)
+            connection.close()
+            self._reused = False
+            if not stale: raise
+            connection.request(HTTP_METHOD, path, body, headers)
+            raw = connection.getresponse()
+        self._reused = True
+        response = httplib2.Response(raw)
+        # Like httplib2, keep the encoding under a name that won't suggest
+        # the content we return is still compressed.
+        encoding = response.pop('content-encoding', None)
+        if encoding: response['-content-encoding'] = encoding
+        return response, self._chunks(raw, decompressor(encoding),
+                                      request_method(body))
+
+    def _chunks(self, raw, decompress, method):
+        compressed = decompressed = 0
+        while True:
+            chunk = raw.read(self.chunk_size)
+            if not chunk: break
+            compressed += len(chunk)
+            if decompress: chunk = decompress.decompress(chunk)
+            decompressed += len(chunk)
+            if chunk: yield chunk
+        if decompress:
+            chunk = decompress.flush()
+            decompressed += len(chunk)
+            if chunk: yield chunk
+        self.stats.record(method, compressed, decompressed)
+
+    def request(self, url, body, headers):
+        """Posts body to url. Returns a (response, content) tuple with the
+        content decompressed."""
+        response, chunks = self.stream(url, body, headers)
+        return response, ''.join(chunks)
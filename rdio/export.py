@@ -0,0 +1,215 @@
+"""Streams collections and playlists to disk as JSON Lines or length-prefixed
+binary records, a page at a time, so exports can be resumed and never hold
+more than one page in memory."""
+
+import gzip
+import json
+import os
+import struct
+import zlib
+
+from rdio import derive_rdio_type_from_data, methods
+
+BINARY_MAGIC = 'RDX1'
+GZIP_MAGIC = '\x1f\x8b'
+PAGE_SIZE = 1000
+
+_length = struct.Struct('>I')
+
+
+def _jsonl(records):
+    return ''.join(json.dumps(record, separators=(',', ':')) + '\n'
+                   for record in records)
+
+
+def _binary(records):
+    chunks = []
+    for record in records:
+        payload = json.dumps(record, separators=(',', ':'))
+        chunks.append(_length.pack(len(payload)))
+        chunks.append(payload)
+    return ''.join(chunks)
+
+
+_formats = {'jsonl': _jsonl, 'binary': _binary}
+
+
+class ExportFile(object):
+    """Appends pages of raw API records to a file, checkpointing after each
+    one in a state file beside it. Reopening an unfinished export truncates
+    anything written after the last checkpoint and reports where to carry
+    on from; reopening a finished one starts it over.
+
+    With compress, each page is written as its own gzip member, so the file
+    is valid gzip at every checkpoint."""
+
+    def __init__(self, path, format='jsonl', compress=False, state_path=None):
+        """Opens an export file, resuming it if its state file says it's
+        unfinished and starting it over otherwise.
+
+        Keyword arguments:
+        path       -- the file to write.
+        format     -- optional. 'jsonl' or 'binary'.
+        compress   -- optional. If True, gzip the records.
+        state_path -- optional. Where to keep the checkpoint; defaults to
+                      path + '.state'.
+
+        """
+        if format not in _formats:
+            raise ValueError("Unknown export format %r." % (format,))
+        self.path = path
+        self.format = format
+        self.compress = compress
+        self.state_path = state_path or path + '.state'
+        self.state = {'offset': 0, 'records': 0, 'bytes': 0, 'done': False}
+        if os.path.exists(self.state_path) and os.path.exists(path):
+            with open(self.state_path) as state:
+                saved = json.load(state)
+            if (saved.get('format'), saved.get('compress')) == (
+                    format, compress) and not saved.get('done'):
+                self.state.update(saved)
+        self._file = open(path, 'r+b' if self.state['bytes'] else 'wb')
+        self._file.seek(self.state['bytes'])
+        self._file.truncate()
+        if not self.state['bytes'] and format == 'binary':
+            self._write(BINARY_MAGIC)
+
+    @property
+    def offset(self):
+        """How many records of the source have been written."""
+        return self.state['offset']
+
+    @property
+    def done(self):
+        return self.state['done']
+
+    def _write(self, data):
+        if self.compress:
+            compressor = zlib.compressobj(6, zlib.DEFLATED,
+                                          16 + zlib.MAX_WBITS)
+            data = compressor.compress(data) + compressor.flush()
+        self._file.write(data)
+
+    def write_page(self, records, offset=None, done=False):
+        """Writes a page of records in one write and checkpoints.
+
+        Keyword arguments:
+        records -- the raw records to write.
+        offset  -- optional. The source offset to resume from next time;
+                   defaults to the number of records written so far.
+        done    -- optional. If True, the export is marked finished.
+
+        """
+        if records: self._write(_formats[self.format](records))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self.state['records'] += len(records)
+        self.state['offset'] = (self.state['records'] if offset is None
+                                else offset)
+        self.state['bytes'] = self._file.tell()
+        self.state['done'] = done
+        self.state['format'] = self.format
+        self.state['compress'] = self.compress
+        temporary = self.state_path + '.tmp'
+        with open(temporary, 'w') as state:
+            json.dump(self.state, state)
+        os.rename(temporary, self.state_path)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def export_tracks_in_collection(api, path, user=None, format='jsonl',
+                                compress=False, page_size=PAGE_SIZE,
+                                extras=None):
+    """Writes every track in a user's collection to path, oldest first,
+    resuming an earlier unfinished export of the same file; a finished one
+    is written again from the start. Returns the number of records in the
+    file.
+
+    Keyword arguments:
+    api       -- the Api to fetch the collection with.
+    path      -- the file to write.
+    user      -- optional. The owner of the collection; defaults to the
+                 current user.
+    format    -- optional. 'jsonl' or 'binary'.
+    compress  -- optional. If True, gzip the records.
+    page_size -- optional. How many tracks to fetch and write at once.
+    extras    -- optional. A list of additional fields to export.
+
+    """
+    with ExportFile(path, format, compress) as export:
+        while not export.done:
+            data = {'method': methods['get_tracks_in_collection'],
+                    'sort': 'dateAdded', 'start': export.offset,
+                    'count': page_size}
+            if extras: data['extras'] = ','.join(extras)
+            if user:
+                data['user'] = user
+                page = api.call_api(data)
+            else:
+                page = api.call_api_authenticated(data)
+            page = page or []
+            export.write_page(page, done=len(page) < page_size)
+        return export.state['records']
+
+
+def export_playlists(api, path, format='jsonl', compress=False, extras=None):
+    """Writes the current user's playlists to path, each record marked with
+    the set ('owned', 'collab' or 'subscribed') it came from in a
+    'playlistSet' field. Like export_tracks_in_collection, an unfinished
+    export is resumed and a finished one written again. Returns the number
+    of records in the file.
+
+    Keyword arguments:
+    api      -- the Api to fetch the playlists with.
+    path     -- the file to write.
+    format   -- optional. 'jsonl' or 'binary'.
+    compress -- optional. If True, gzip the records.
+    extras   -- optional. A list of additional fields to export, such as
+                'trackKeys'.
+
+    """
+    with ExportFile(path, format, compress) as export:
+        if not export.done:
+            data = {'method': methods['get_playlists']}
+            if extras: data['extras'] = ','.join(extras)
+            sets = api.call_api_authenticated(data) or {}
+            # One checkpoint per set, so a resume skips the finished ones.
+            names = ('owned', 'collab', 'subscribed')
+            for i in range(export.offset, len(names)):
+                page = sets.get(names[i]) or []
+                for playlist in page: playlist['playlistSet'] = names[i]
+                export.write_page(page, offset=i + 1,
+                                  done=i + 1 == len(names))
+        return export.state['records']
+
+
+def read_export(path, decode=False):
+    """Yields the records of an export file in order, as raw dictionaries or,
+    with decode, as model objects. The format and compression are detected
+    from the file."""
+    with open(path, 'rb') as raw:
+        compressed = raw.read(2) == GZIP_MAGIC
+    stream = gzip.open(path, 'rb') if compressed else open(path, 'rb')
+    with stream:
+        if stream.read(len(BINARY_MAGIC)) == BINARY_MAGIC:
+            records = _read_binary(stream)
+        else:
+            stream.seek(0)
+            records = (json.loads(line) for line in stream)
+        for record in records:
+            yield derive_rdio_type_from_data(record) if decode else record
+
+
+def _read_binary(stream):
+    while True:
+        header = stream.read(_length.size)
+        if not header: return
+        yield json.loads(stream.read(_length.unpack(header)[0]))
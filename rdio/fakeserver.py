@@ -0,0 +1,575 @@
+"""A local stand-in for the Rdio API, for load tests that mustn't touch the
+real one. It answers OAuth-signed POSTs to /1/ for every method in methods
+from a synthetic catalog, after a configurable delay.
+
+Objects are generated from their keys, so the catalog costs no memory
+however big it is: artist rN has albums_per_artist albums, album aN has
+tracks_per_album tracks, user sN has a collection of collection_size tracks,
+playlists_per_user playlists of playlist_length tracks and followers
+followers, and so on. The same catalog always generates the same data."""
+
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+import json
+import multiprocessing
+import random
+import re
+import socket
+import threading
+import time
+from urlparse import parse_qsl
+import zlib
+
+import oauth2 as oauth
+
+from rdio import Api, methods
+
+_key_pattern = re.compile(r'^([a-z]+)(\d+)$')
+_api_methods = frozenset(methods.values())
+
+# Methods the Api only calls with an access token.
+AUTHENTICATED = frozenset([
+    'addFriend', 'addToCollection', 'addToPlaylist', 'createPlaylist',
+    'currentUser', 'deletePlaylist', 'getObjectFromShortCode',
+    'getObjectFromUrl', 'getPlaylists', 'removeFriend',
+    'removeFromCollection', 'removeFromPlaylist',
+    'setPlaylistCollaborating', 'setPlaylistCollaborationMode',
+    'setPlaylistFields', 'setPlaylistOrder'])
+
+_base_date = 1300000000
+
+
+def _index(text):
+    return zlib.crc32(text) & 0x7fffffff
+
+
+class Catalog(object):
+    """Generates Rdio objects, as the API's JSON, from their keys."""
+
+    def __init__(self, artists=1000, albums_per_artist=5, tracks_per_album=12,
+                 users=1000, collection_size=500, playlists_per_user=5,
+                 playlist_length=30, followers=50, activity_size=50,
+                 search_size=100):
+        """Instantiates a new catalog. Every argument is optional and sets
+        how many of something there are."""
+        self.artists = artists
+        self.albums_per_artist = albums_per_artist
+        self.tracks_per_album = tracks_per_album
+        self.albums = artists * albums_per_artist
+        self.tracks = self.albums * tracks_per_album
+        self.users = users
+        self.collection_size = min(collection_size, self.tracks)
+        self.playlists_per_user = playlists_per_user
+        self.playlists = users * playlists_per_user
+        self.playlist_length = min(playlist_length, self.tracks)
+        self.followers = min(followers, users)
+        self.activity_size = activity_size
+        self.search_size = search_size
+
+    def _sample(self, seed, population, size):
+        return random.Random(seed).sample(xrange(population), size)
+
+    def artist(self, i):
+        key = 'r%d' % i
+        return {
+            'key': key, 'type': 'r', 'url': '/artist/Artist_%d/' % i,
+            'icon': 'http://img.rdio.com/%s.jpg' % key,
+            'baseIcon': 'album/%s.jpg' % key, 'name': 'Artist %d' % i,
+            'length': self.albums_per_artist * self.tracks_per_album,
+            'hasRadio': True, 'shortUrl': 'http://rd.io/x/%s/' % key,
+            'albumCount': self.albums_per_artist, 'radioKey': 'rr%d' % i,
+            'topSongsKey': 'tr%d' % i}
+
+    def _music(self, key, rdio_type, name, artist, url):
+        return {
+            'key': key, 'type': rdio_type, 'url': url,
+            'icon': 'http://img.rdio.com/%s.jpg' % key,
+            'baseIcon': 'album/%s.jpg' % key, 'name': name,
+            'artist': 'Artist %d' % artist,
+            'artistUrl': '/artist/Artist_%d/' % artist,
+            'artistKey': 'r%d' % artist, 'isExplicit': False,
+            'isClean': False, 'price': '9.99', 'canStream': True,
+            'canSample': True, 'canTether': True,
+            'shortUrl': 'http://rd.io/x/%s/' % key,
+            'embedUrl': 'http://rd.io/e/%s/' % key,
+            'duration': 180 + _index(key) % 240}
+
+    def album(self, i):
+        artist = i // self.albums_per_artist
+        first = i * self.tracks_per_album
+        data = self._music('a%d' % i, 'a', 'Album %d' % i, artist,
+                           '/artist/Artist_%d/album/Album_%d/' % (artist, i))
+        data.update({
+            'displayDate': 'Jan 1, 2011', 'releaseDateISO': '2011-01-01',
+            'trackKeys': ['t%d' % n for n in
+                          range(first, first + self.tracks_per_album)]})
+        return data
+
+    def track(self, i):
+        album = i // self.tracks_per_album
+        artist = album // self.albums_per_artist
+        data = self._music(
+            't%d' % i, 't', 'Track %d' % i, artist,
+            '/artist/Artist_%d/album/Album_%d/track/Track_%d/' % (
+                artist, album, i))
+        data.update({
+            'album': 'Album %d' % album, 'albumKey': 'a%d' % album,
+            'albumUrl': '/artist/Artist_%d/album/Album_%d/' % (artist, album),
+            'albumArtist': 'Artist %d' % artist,
+            'albumArtistKey': 'r%d' % artist, 'canDownload': False,
+            'canDownloadAlbumOnly': False,
+            'trackNum': i % self.tracks_per_album + 1,
+            'playCount': _index('t%d' % i) % 100})
+        return data
+
+    def user(self, i):
+        key = 's%d' % i
+        return {
+            'key': key, 'type': 's', 'url': '/people/user%d/' % i,
+            'icon': 'http://img.rdio.com/%s.jpg' % key,
+            'baseIcon': 'user/%s.jpg' % key, 'firstName': 'User',
+            'lastName': str(i), 'libraryVersion': i,
+            'gender': 'm' if i % 2 else 'f', 'username': 'user%d' % i,
+            'collectionKey': 'c%d' % i,
+            'heavyRotationKey': 'e%d' % i,
+            'followersUrl': '/people/user%d/people/followers/' % i,
+            'followingUrl': '/people/user%d/people/following/' % i,
+            'collectionUrl': '/people/user%d/collection/' % i,
+            'playlistsUrl': '/people/user%d/playlists/' % i}
+
+    def playlist(self, i):
+        key = 'p%d' % i
+        owner = i // self.playlists_per_user
+        return {
+            'key': key, 'type': 'p',
+            'url': '/people/user%d/playlists/%d/' % (owner, i),
+            'icon': 'http://img.rdio.com/%s.jpg' % key,
+            'baseIcon': 'playlist/%s.jpg' % key, 'name': 'Playlist %d' % i,
+            'length': self.playlist_length, 'owner': 'User %d' % owner,
+            'ownerUrl': '/people/user%d/' % owner, 'ownerKey': 's%d' % owner,
+            'ownerIcon': 'http://img.rdio.com/s%d.jpg' % owner,
+            'lastUpdated': _base_date + i,
+            'shortUrl': 'http://rd.io/x/%s/' % key,
+            'embedUrl': 'http://rd.io/e/%s/' % key,
+            'description': '', 'trackKeys': [
+                't%d' % n for n in self._sample(
+                    key, self.tracks, self.playlist_length)]}
+
+    def object(self, key):
+        """Returns the data for key, or None if the catalog has no such
+        object."""
+        match = _key_pattern.match(key or '')
+        if not match: return None
+        kind, i = match.group(1), int(match.group(2))
+        make, count = {
+            'r': (self.artist, self.artists), 'a': (self.album, self.albums),
+            't': (self.track, self.tracks), 's': (self.user, self.users),
+            'p': (self.playlist, self.playlists)}.get(kind, (None, 0))
+        return make(i) if i < count else None
+
+    def collection(self, user):
+        """Returns the track numbers in user's collection."""
+        return sorted(self._sample('c%d' % user, self.tracks,
+                                   self.collection_size))
+
+    def follows(self, user, direction):
+        return self._sample('%s%d' % (direction, user), self.users,
+                            self.followers)
+
+    def activity(self, user, scope):
+        owners = ([user] if scope == 'user' else
+                  self._sample('%s%d' % (scope, user), self.users,
+                               min(10, self.users)))
+        updates = []
+        for n in range(self.activity_size):
+            owner = owners[n % len(owners)]
+            album = _index('%d.%d' % (owner, n)) % self.albums
+            updates.append({
+                'owner': self.user(owner), 'update_type': 0,
+                'date': time.strftime('%Y-%m-%dT%H:%M:%S',
+                                      time.gmtime(_base_date - n * 3600)),
+                'albums': [self.album(album)]})
+        return {'last_id': _base_date, 'user': self.user(user),
+                'updates': updates}
+
+
+def _page(items, params, default_count=None):
+    start = int(params.get('start') or 0)
+    count = int(params.get('count') or default_count or len(items))
+    return items[start:start + count]
+
+
+def _user_index(key):
+    match = _key_pattern.match(key or '')
+    return int(match.group(2)) if match else 0
+
+
+class _Handlers(object):
+    """Answers each API method, by its API name, from a Catalog."""
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def answer(self, method, params, user):
+        if method not in _api_methods: raise KeyError(method)
+        handler = getattr(self, method, None)
+        # The rest change the user's data, which the catalog doesn't keep,
+        # so they just succeed.
+        if handler is None: return True
+        return handler(params, user)
+
+    def _owner(self, params, user):
+        return _user_index(params['user']) if 'user' in params else user
+
+    def get(self, params, user):
+        found = {}
+        for key in params.get('keys', '').split(','):
+            data = self.catalog.object(key)
+            if data is not None: found[key] = data
+        return found
+
+    def currentUser(self, params, user):
+        return self.catalog.user(user)
+
+    def findUser(self, params, user):
+        name = params.get('email') or params.get('vanityName') or ''
+        return self.catalog.user(_index(name) % self.catalog.users)
+
+    def getActivityStream(self, params, user):
+        return self.catalog.activity(self._owner(params, user),
+                                     params.get('scope', 'user'))
+
+    def getAlbumsForArtist(self, params, user):
+        catalog = self.catalog
+        first = _user_index(params.get('artist')) * catalog.albums_per_artist
+        return _page([catalog.album(i) for i in
+                      range(first, first + catalog.albums_per_artist)],
+                     params)
+
+    def getTracksForArtist(self, params, user):
+        catalog = self.catalog
+        per_artist = catalog.albums_per_artist * catalog.tracks_per_album
+        first = _user_index(params.get('artist')) * per_artist
+        return [catalog.track(i) for i in
+                _page(range(first, first + per_artist), params, 100)]
+
+    def getTracksInCollection(self, params, user):
+        catalog = self.catalog
+        return [catalog.track(i) for i in _page(
+            catalog.collection(self._owner(params, user)), params)]
+
+    def _collection_albums(self, params, user):
+        per_album = self.catalog.tracks_per_album
+        return sorted(set(i // per_album for i in self.catalog.collection(
+            self._owner(params, user))))
+
+    def getAlbumsInCollection(self, params, user):
+        return [self.catalog.album(i) for i in
+                _page(self._collection_albums(params, user), params)]
+
+    def getArtistsInCollection(self, params, user):
+        per_artist = self.catalog.albums_per_artist
+        artists = sorted(set(i // per_artist for i in
+                             self._collection_albums(params, user)))
+        return [self.catalog.artist(i) for i in _page(artists, params)]
+
+    def getAlbumsForArtistInCollection(self, params, user):
+        artist = _user_index(params.get('artist'))
+        per_artist = self.catalog.albums_per_artist
+        return [self.catalog.album(i) for i in
+                self._collection_albums(params, user)
+                if i // per_artist == artist]
+
+    def getTracksForArtistInCollection(self, params, user):
+        artist = params.get('artist')
+        return [track for track in self.getTracksInCollection(
+            {'user': params.get('user', 's%d' % user)}, user)
+            if track['artistKey'] == artist]
+
+    def getTracksForAlbumInCollection(self, params, user):
+        album = params.get('album')
+        return [track for track in self.getTracksInCollection(
+            {'user': params.get('user', 's%d' % user)}, user)
+            if track['albumKey'] == album]
+
+    def getHeavyRotation(self, params, user):
+        catalog = self.catalog
+        limit = int(params.get('limit') or 10)
+        if params.get('type') == 'artists':
+            return [catalog.artist(i) for i in
+                    catalog._sample('hr%d' % user, catalog.artists,
+                                    min(limit, catalog.artists))]
+        return [catalog.album(i) for i in
+                catalog._sample('ha%d' % user, catalog.albums,
+                                min(limit, catalog.albums))]
+
+    def getNewReleases(self, params, user):
+        catalog = self.catalog
+        return [catalog.album(i) for i in _page(
+            range(catalog.albums - 1, -1, -1)[:200], params, 20)]
+
+    def getTopCharts(self, params, user):
+        catalog = self.catalog
+        make, count = {
+            'Artist': (catalog.artist, catalog.artists),
+            'Album': (catalog.album, catalog.albums),
+            'Track': (catalog.track, catalog.tracks),
+            'Playlist': (catalog.playlist, catalog.playlists),
+        }[params['type']]
+        return [make(i) for i in _page(range(min(count, 200)), params, 20)]
+
+    def getObjectFromShortCode(self, params, user):
+        return self.catalog.object(params.get('short_code'))
+
+    def getObjectFromUrl(self, params, user):
+        parts = [part for part in params.get('url', '').split('/') if part]
+        return self.catalog.object(parts[-1] if parts else None)
+
+    def getPlaybackToken(self, params, user):
+        return 'GAlNi78J_____zlyYWs5ZG02N2pkaHlhcWsyOWJtYjkyN2xvY2FsaG9zdA'
+
+    def getPlaylists(self, params, user):
+        per_user = self.catalog.playlists_per_user
+        return {'owned': [self.catalog.playlist(i) for i in
+                          range(user * per_user, (user + 1) * per_user)],
+                'collab': [], 'subscribed': []}
+
+    def createPlaylist(self, params, user):
+        data = self.catalog.playlist(user * self.catalog.playlists_per_user)
+        tracks = params.get('tracks')
+        data.update({'key': 'p%d' % self.catalog.playlists,
+                     'name': params.get('name', ''),
+                     'description': params.get('description', ''),
+                     'trackKeys': tracks.split(',') if tracks else []})
+        data['length'] = len(data['trackKeys'])
+        return data
+
+    def search(self, params, user):
+        catalog = self.catalog
+        makers = {'artist': (catalog.artist, catalog.artists),
+                  'album': (catalog.album, catalog.albums),
+                  'track': (catalog.track, catalog.tracks),
+                  'playlist': (catalog.playlist, catalog.playlists),
+                  'user': (catalog.user, catalog.users)}
+        types = [kind.strip().lower() for kind in
+                 params.get('types', 'Track').split(',')]
+        seed = _index(params.get('query', ''))
+        results = []
+        counts = {}
+        for n in range(catalog.search_size):
+            kind = types[n % len(types)]
+            if kind not in makers: continue
+            make, count = makers[kind]
+            results.append(make((seed + n * 7919) % count))
+            counts[kind] = counts.get(kind, 0) + 1
+        result = {'results': _page(results, params, 10),
+                  'number_results': len(results)}
+        for kind, count in counts.iteritems():
+            result['%s_count' % ('person' if kind == 'user' else kind)] = \
+                count
+        return result
+
+    def searchSuggestions(self, params, user):
+        return self.search(dict(params, types='Artist,Album,Track,User',
+                                start=0, count=10), user)['results']
+
+    def userFollowers(self, params, user):
+        return [self.catalog.user(i) for i in _page(self.catalog.follows(
+            self._owner(params, user), 'followers'), params)]
+
+    def userFollowing(self, params, user):
+        return [self.catalog.user(i) for i in _page(self.catalog.follows(
+            self._owner(params, user), 'following'), params)]
+
+
+class _Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+
+    def __init__(self, address, handler):
+        HTTPServer.__init__(self, address, handler)
+        self.connections = set()
+        self.connections_lock = threading.Lock()
+
+    def process_request_thread(self, request, client_address):
+        with self.connections_lock: self.connections.add(request)
+        try:
+            ThreadingMixIn.process_request_thread(self, request,
+                                                  client_address)
+        finally:
+            with self.connections_lock: self.connections.discard(request)
+
+    def close_connections(self):
+        # Wakes the threads waiting on kept-alive connections, so they end.
+        with self.connections_lock: connections = list(self.connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Send each response in one write, so small responses aren't held back
+    # by Nagle's algorithm waiting on the client's delayed ACK.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status, payload):
+        content = json.dumps(payload, separators=(',', ':'))
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+        self.wfile.flush()
+
+    def do_POST(self):
+        fake = self.server.fake
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.path != '/1/':
+            return self.reply(404, {'status': 'error',
+                                    'message': 'Not found'})
+        params = dict(parse_qsl(body, keep_blank_values=True))
+        try:
+            user = fake.verify(self.headers.get('Host'), params)
+        except oauth.Error as e:
+            return self.reply(401, {'status': 'error', 'message': str(e)})
+        method = params.get('method')
+        fake.delay(method)
+        try:
+            if method in AUTHENTICATED and user is None:
+                raise oauth.Error('%s requires an access token' % method)
+            result = fake.handlers.answer(method, params,
+                                          user if user is not None else 0)
+        except oauth.Error as e:
+            return self.reply(401, {'status': 'error', 'message': str(e)})
+        except (KeyError, ValueError) as e:
+            return self.reply(200, {'status': 'error', 'message':
+                                    'Bad call to %s: %r' % (method, e)})
+        fake.count(method)
+        self.reply(200, {'status': 'ok', 'result': result})
+
+
+class FakeRdioServer(object):
+    """Serves a synthetic catalog over the Rdio API protocol on a local
+    port, one thread per connection. Requests must be signed with the
+    consumer, and with one of tokens when a token is sent; each token is
+    logged in as its own user."""
+
+    def __init__(self, consumer_key='key', consumer_secret='secret',
+                 tokens=None, catalog=None, latency=0.0, jitter=0.0,
+                 latencies=None, host='127.0.0.1', port=0):
+        """Instantiates a new server, which serves once started.
+
+        Keyword arguments:
+        consumer_key    -- optional. The application's oAuth key.
+        consumer_secret -- optional. The application's oAuth secret.
+        tokens          -- optional. A dictionary of {token key: secret} of
+                           the access tokens to accept.
+        catalog         -- optional. The Catalog to serve.
+        latency         -- optional. Seconds to wait before answering.
+        jitter          -- optional. Up to this many more seconds are added
+                           at random.
+        latencies       -- optional. A dictionary of {API method name:
+                           seconds} to use instead of latency.
+        host            -- optional. The address to listen on.
+        port            -- optional. The port to listen on; by default any
+                           free one.
+
+        """
+        self.consumer = oauth.Consumer(consumer_key, consumer_secret)
+        self.tokens = tokens if tokens is not None else {'token': 'secret'}
+        self.catalog = catalog or Catalog()
+        self.handlers = _Handlers(self.catalog)
+        self.latency = latency
+        self.jitter = jitter
+        self.latencies = latencies or {}
+        self.requests = {}
+        self._lock = threading.Lock()
+        self._oauth = oauth.Server(signature_methods={
+            'HMAC-SHA1': oauth.SignatureMethod_HMAC_SHA1()})
+        self._server = _Server((host, port), _Handler)
+        self._server.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        """The root URL to give an Api."""
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%d/1/' % (host, port)
+
+    def api(self, token='token', **kwargs):
+        """Returns an Api signed in with token (or not at all, if token is
+        None) that calls this server. Other arguments are passed to Api."""
+        return Api(self.consumer.key, self.consumer.secret, token,
+                   self.tokens.get(token), root_url=self.url, **kwargs)
+
+    def user_for(self, token):
+        """Returns the number of the user token is logged in as."""
+        return _index(token) % self.catalog.users
+
+    def start(self):
+        """Starts serving on a background thread and returns self."""
+        self._thread = threading.Thread(target=self._server.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._server.close_connections()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def verify(self, host, params):
+        # Checks the signature and returns the user the token is logged in
+        # as, or None for a call without a token. Raises oauth.Error.
+        token_key = params.get('oauth_token')
+        token = None
+        if token_key is not None:
+            if token_key not in self.tokens:
+                raise oauth.Error('Unknown access token')
+            token = oauth.Token(token_key, self.tokens[token_key])
+        if params.get('oauth_consumer_key') != self.consumer.key:
+            raise oauth.Error('Unknown consumer')
+        request = oauth.Request('POST', 'http://%s/1/' % host, params)
+        self._oauth.verify_request(request, self.consumer, token)
+        return None if token is None else self.user_for(token_key)
+
+    def delay(self, method):
+        seconds = self.latencies.get(method, self.latency)
+        if self.jitter: seconds += random.random() * self.jitter
+        if seconds > 0: time.sleep(seconds)
+
+    def count(self, method):
+        with self._lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+
+
+def _serve(urls, kwargs):
+    server = FakeRdioServer(**kwargs).start()
+    urls.put(server.url)
+    server._thread.join()
+
+
+def serve_in_process(**kwargs):
+    """Starts a FakeRdioServer in a child process, so that it doesn't share
+    the caller's GIL, and returns (url, process). Terminate the process to
+    stop it. Arguments are passed to FakeRdioServer."""
+    urls = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_serve, args=(urls, kwargs))
+    process.daemon = True
+    process.start()
+    return urls.get(), process
@@ -0,0 +1,107 @@
+"""Merges the activity streams of many users into one feed, newest first."""
+
+from bisect import bisect_left
+import calendar
+from collections import OrderedDict
+import heapq
+from multiprocessing.pool import ThreadPool
+
+
+def _timestamp(date):
+    return calendar.timegm(date.utctimetuple()) + date.microsecond / 1e6
+
+
+def _key_of(obj):
+    return getattr(obj, 'key', None)
+
+
+def activity_key(item):
+    """Returns what identifies an activity item, so the same event reached
+    through two streams is only shown once."""
+    return (_key_of(item.owner), item.date, item.update_type_id,
+            _key_of(item.reviewed_item),
+            tuple(_key_of(album) for album in item.albums), item.comment)
+
+
+class MergedFeed(object):
+    """Fetches the activity streams of many users at once, at most
+    concurrency at a time, and merges them by date with a heap.
+
+    Each stream is a single request, so every stream is fetched before the
+    first item is yielded; limit and since then bound how much of each
+    stream is merged at all. Users whose stream couldn't be fetched are left
+    out and their errors kept in errors."""
+
+    def __init__(self, api, concurrency=8):
+        """Instantiates a new feed.
+
+        Keyword arguments:
+        api         -- the Api to fetch streams with.
+        concurrency -- optional. The most requests in flight at once.
+
+        """
+        self.api = api
+        self.errors = {}
+        self._pool = ThreadPool(concurrency)
+
+    def close(self):
+        """Stops the worker threads."""
+        self._pool.close()
+        self._pool.join()
+
+    def _fetch(self, user):
+        try:
+            return user, self.api.get_activity_stream(user, 'user'), None
+        except Exception as e:
+            return user, None, e
+
+    def items(self, users, limit=None, since=None):
+        """Yields the RdioActivityItems of users' streams, newest first,
+        each event once.
+
+        Keyword arguments:
+        users -- the keys of the users whose activity to merge.
+        limit -- optional. The most items to yield.
+        since -- optional. A datetime; only items newer than it are
+                 yielded.
+
+        """
+        users = list(OrderedDict.fromkeys(users))
+        cutoff = _timestamp(since) if since else None
+        heap = []
+        for user, stream, error in self._pool.imap_unordered(self._fetch,
+                                                              users):
+            if error:
+                self.errors[user] = error
+                continue
+            # Repeats are dropped first, so that trimming to limit keeps
+            # limit distinct items.
+            updates = dict((activity_key(item), item)
+                           for item in (stream and stream.updates) or [])
+            # Oldest first, so the cutoff is a bisection and the newest
+            # are at the end.
+            stamped = sorted((_timestamp(item.date), i, item)
+                             for i, item in enumerate(updates.itervalues()))
+            if cutoff is not None:
+                del stamped[:bisect_left(stamped, (cutoff, len(stamped)))]
+            if limit: del stamped[:-limit]
+            if stamped:
+                stamp, i, item = stamped.pop()
+                heap.append((-stamp, user, i, item, stamped))
+        heapq.heapify(heap)
+        seen = set()
+        yielded = 0
+        while heap and (not limit or yielded < limit):
+            stamp, user, i, item, stamped = heap[0]
+            if stamped:
+                stamp, i, next_item = stamped.pop()
+                heapq.heapreplace(heap, (-stamp, user, i, next_item,
+                                         stamped))
+            else:
+                heapq.heappop(heap)
+            key = activity_key(item)
+            if key in seen: continue
+            seen.add(key)
+            yielded += 1
+            yield item
+
@@ -0,0 +1,70 @@
+"""Fetches the tracks of many playlists at once, each track only once."""
+
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from rdio import RdioPlaylistSet
+
+CHUNK_SIZE = 100
+
+
+def _playlists(playlists):
+    if isinstance(playlists, RdioPlaylistSet):
+        playlists = (playlists.owned_playlists +
+                     playlists.collaborated_playlists +
+                     playlists.subscribed_playlists)
+    return [playlist for playlist in playlists if playlist is not None]
+
+
+def _get_all(api, pool, keys, chunk_size, extras):
+    # Returns the objects for keys by key, fetched chunk_size keys per get,
+    # with the chunks in parallel.
+    chunks = [keys[i:i + chunk_size] for i in range(0, len(keys), chunk_size)]
+    found = {}
+    for objects in pool.imap_unordered(
+            lambda chunk: api.get(chunk, extras=extras) or [], chunks):
+        for obj in objects:
+            if obj is not None: found[obj.key] = obj
+    return found
+
+
+def hydrate_playlists(api, playlists, chunk_size=CHUNK_SIZE, concurrency=8,
+                      extras=None):
+    """Sets the tracks of every playlist to its RdioTracks, in track_keys
+    order, and returns the tracks fetched by key. A track on several
+    playlists is fetched once and the same RdioTrack is shared between
+    them; tracks Rdio no longer has are left out.
+
+    Playlists listed without their track_keys (get_playlists without
+    extras=['trackKeys']) have them fetched first, in one get per chunk.
+
+    Keyword arguments:
+    api         -- the Api to fetch with. It is called from concurrency
+                   threads at once, so it should be made with connections.
+    playlists   -- an RdioPlaylistSet, or a list of RdioPlaylists.
+    chunk_size  -- optional. The most keys per get call.
+    concurrency -- optional. The most get calls in flight at once.
+    extras      -- optional. A list of additional track fields to fetch.
+
+    """
+    playlists = _playlists(playlists)
+    pool = ThreadPool(concurrency)
+    try:
+        bare = [playlist for playlist in playlists
+                if not playlist.track_keys and playlist.track_count]
+        if bare:
+            found = _get_all(api, pool, [playlist.key for playlist in bare],
+                             chunk_size, ['trackKeys'])
+            for playlist in bare:
+                if playlist.key in found:
+                    playlist.track_keys = found[playlist.key].track_keys
+        keys = list(OrderedDict.fromkeys(
+            key for playlist in playlists for key in playlist.track_keys))
+        tracks = _get_all(api, pool, keys, chunk_size, extras or [])
+    finally:
+        pool.close()
+        pool.join()
+    for playlist in playlists:
+        playlist.tracks = [tracks[key] for key in playlist.track_keys
+                           if key in tracks]
+    return tracks
@@ -0,0 +1,202 @@
+"""A local index over a mirrored collection that answers collection queries
+without calling the API."""
+
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import ifilter, islice
+import re
+import unicodedata
+
+from rdio import RdioInvalidParameterException
+
+# Prefixes up to this long are indexed directly; longer query terms are
+# looked up in the sorted vocabulary.
+PREFIX_LENGTH = 3
+
+_word = re.compile(r'\w+', re.UNICODE)
+_empty = frozenset()
+
+
+def tokenize(text):
+    """Splits text into lowercase words with accents removed."""
+    if not text: return []
+    if isinstance(text, str): text = text.decode('utf-8', 'replace')
+    text = unicodedata.normalize('NFKD', text.lower())
+    text = u''.join(c for c in text if not unicodedata.combining(c))
+    return _word.findall(text)
+
+
+def _lower(value):
+    return (value or u'').lower()
+
+
+def _play_count(obj):
+    play_count = getattr(obj, 'play_count', None)
+    data = getattr(obj, '_data', None)
+    if play_count is None and data: play_count = data.get('playCount')
+    return play_count or 0
+
+
+class _Index(object):
+    # An inverted index over one kind of object, plus each sort order.
+
+    def __init__(self, objects, fields, sorts):
+        self.objects = list(objects)
+        postings = defaultdict(set)
+        prefixes = defaultdict(set)
+        for doc, obj in enumerate(self.objects):
+            tokens = set()
+            for field in fields:
+                tokens.update(tokenize(getattr(obj, field, None)))
+            for token in tokens:
+                postings[token].add(doc)
+                for i in range(1, min(len(token), PREFIX_LENGTH) + 1):
+                    prefixes[token[:i]].add(doc)
+        self.vocabulary = sorted(postings)
+        self.postings = dict((token, frozenset(docs))
+                             for token, docs in postings.iteritems())
+        self.prefixes = dict((prefix, frozenset(docs))
+                             for prefix, docs in prefixes.iteritems())
+        self.orders = {}
+        self.ranks = {}
+        for sort, key in sorts.iteritems():
+            docs = range(len(self.objects))
+            if key: docs.sort(key=lambda doc: key(self.objects[doc]))
+            self.orders[sort] = docs
+            ranks = [0] * len(docs)
+            for rank, doc in enumerate(docs): ranks[doc] = rank
+            self.ranks[sort] = ranks
+
+    def _term(self, term):
+        # The documents with a word starting with term. Short prefixes are
+        # precomputed; longer ones are a range of the sorted vocabulary.
+        if len(term) <= PREFIX_LENGTH: return self.prefixes.get(term, _empty)
+        vocabulary = self.vocabulary
+        i = bisect_left(vocabulary, term)
+        j = bisect_left(vocabulary, term + u'\uffff', i)
+        if j - i == 1: return self.postings[vocabulary[i]]
+        docs = set()
+        for token in vocabulary[i:j]: docs.update(self.postings[token])
+        return docs
+
+    def match(self, query):
+        """Returns the sets of documents matching each word of query,
+        smallest first. A document matches the query if it is in all of
+        them."""
+        return sorted((self._term(term) for term in set(tokenize(query))),
+                      key=len)
+
+    def query(self, query, sort, start, count):
+        order = self.orders[sort]
+        if not order: return []
+        start = start or 0
+        end = start + count if count else None
+        matches = self.match(query) if query else None
+        # A query with no words in it, like '?!', matches nothing.
+        if query and not matches: return []
+        if matches:
+            smallest, rest = matches[0], matches[1:]
+            # Either intersect the matches and sort them, or walk the sort
+            # order until the page is full, whichever is cheaper for the
+            # number of matches we expect. Both loops run in C, but sorting
+            # costs several times more per document.
+            expected = float(len(smallest))
+            for docs in rest: expected *= float(len(docs)) / len(order)
+            if (end is None or end * len(order) >
+                    expected * (len(smallest) + 8 * expected)):
+                docs = smallest.intersection(*rest) if rest else smallest
+                docs = sorted(docs, key=self.ranks[sort].__getitem__)
+            else:
+                docs = order
+                for matched in matches:
+                    docs = ifilter(matched.__contains__, docs)
+                docs = list(islice(docs, end))
+        else:
+            docs = order
+        objects = self.objects
+        return [objects[doc] for doc in docs[start:end]]
+
+
+class CollectionIndex(object):
+    """Answers get_tracks_in_collection, get_albums_in_collection and
+    get_artists_in_collection queries from a mirrored collection. Queries
+    match words by prefix across names, artists and albums; every sort
+    option is pre-computed, so filtering and paging never touch the API.
+
+    The objects are expected in the order they were added to the collection,
+    which is what the 'dateAdded' sort returns."""
+
+    def __init__(self, tracks=(), albums=(), artists=()):
+        """Builds the index.
+
+        Keyword arguments:
+        tracks  -- optional. The RdioTracks in the collection.
+        albums  -- optional. The RdioAlbums in the collection.
+        artists -- optional. The RdioArtists in the collection.
+
+        """
+        self.tracks = _Index(tracks, ('name', 'artist_name', 'album_name'), {
+            'dateAdded': None,
+            'playCount': lambda t: -_play_count(t),
+            'artist': lambda t: (_lower(t.artist_name),
+                                 _lower(t.album_name), t.track_number),
+            'album': lambda t: (_lower(t.album_name), t.track_number),
+            'name': lambda t: _lower(t.name)})
+        self.albums = _Index(albums, ('name', 'artist_name'), {
+            'dateAdded': None,
+            'playCount': lambda a: -_play_count(a),
+            'artist': lambda a: (_lower(a.artist_name), _lower(a.name)),
+            'name': lambda a: _lower(a.name)})
+        self.artists = _Index(artists, ('name',), {
+            'dateAdded': None,
+            'name': lambda r: _lower(r.name)})
+
+    @classmethod
+    def mirror(cls, api, user=None, page_size=1000):
+        """Builds an index by paging through a user's whole collection.
+
+        Keyword arguments:
+        api       -- the Api to fetch the collection with.
+        user      -- optional. The owner of the collection.
+        page_size -- optional. How many objects to fetch per call.
+
+        """
+        def pages(method, sort=None):
+            start = 0
+            while True:
+                page = method(user=user, start=start, count=page_size,
+                              sort=sort) or []
+                for obj in page: yield obj
+                if len(page) < page_size: break
+                start += page_size
+        return cls(pages(api.get_tracks_in_collection, 'dateAdded'),
+                   pages(api.get_albums_in_collection, 'dateAdded'),
+                   pages(api.get_artists_in_collection))
+
+    def _query(self, index, method, start, count, sort, query):
+        sort = sort or 'dateAdded'
+        if sort not in index.orders:
+            raise RdioInvalidParameterException(sort, 'sort', method)
+        results = index.query(query, sort, start, count)
+        return results if results else None
+
+    def get_tracks_in_collection(self, start=None, count=None, sort=None,
+                                 query=None):
+        """Returns the tracks in the collection, like
+        Api.get_tracks_in_collection."""
+        return self._query(self.tracks, 'get_tracks_in_collection', start,
+                           count, sort, query)
+
+    def get_albums_in_collection(self, start=None, count=None, sort=None,
+                                 query=None):
+        """Returns the albums in the collection, like
+        Api.get_albums_in_collection."""
+        return self._query(self.albums, 'get_albums_in_collection', start,
+                           count, sort, query)
+
+    def get_artists_in_collection(self, start=None, count=None, sort=None,
+                                  query=None):
+        """Returns the artists in the collection, like
+        Api.get_artists_in_collection."""
+        return self._query(self.artists, 'get_artists_in_collection', start,
+                           count, sort, query)
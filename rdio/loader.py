@@ -0,0 +1,129 @@
+"""Resolves the keys that model objects refer to, such as an album's
+track_keys or a track's album_key, in batches.
+
+Inside a Loader's scope, every object an API call returns is registered with
+it. The first time a reference attribute (album.tracks, track.album,
+track.artist, playlist.owner, ...) is read, the loader fetches that
+reference for every object registered so far with one chunked get, so
+walking a list of albums and reading each one's tracks costs one request per
+chunk rather than one per album. What was fetched is cached for the rest of
+the scope."""
+
+from memory import cache_footprint
+from rdio import JSONBasedObject, Reference, loader_scope
+
+CHUNK_SIZE = 100
+
+_nested = (JSONBasedObject, list, dict)
+
+
+class Loader(object):
+    """A scope for lazy references. Use it as a context manager around the
+    code that reads them:
+
+        with Loader(api) as loader:
+            albums = api.get_albums_for_artist('r1')
+            for album in albums:
+                print album.name, [track.name for track in album.tracks]
+    """
+
+    def __init__(self, api, chunk_size=CHUNK_SIZE, extras=None):
+        """Instantiates a new loader.
+
+        Keyword arguments:
+        api        -- the Api to fetch referenced objects with.
+        chunk_size -- optional. The most keys per get call.
+        extras     -- optional. A list of additional fields to fetch the
+                      referenced objects with.
+
+        """
+        self.api = api
+        self.chunk_size = chunk_size
+        self.extras = extras or []
+        self.objects = []
+        self.cache = {}
+        self.calls = 0
+        self._registered = set()
+        # How many of self.objects each reference has been loaded for.
+        self._loaded = {}
+        self._previous = None
+
+    def __enter__(self):
+        self._previous = loader_scope.loader
+        loader_scope.loader = self
+        return self
+
+    def __exit__(self, *exc_info):
+        loader_scope.loader = self._previous
+        self._previous = None
+
+    def register(self, value):
+        """Registers the model objects in value, which may be an object or a
+        list or dictionary of them, and the objects nested in those, so that
+        their references are loaded along with the next batch."""
+        # Breadth first, so objects are registered in the order they came.
+        queue = [value]
+        for value in queue:
+            if isinstance(value, JSONBasedObject):
+                if getattr(type(value), 'references', None):
+                    # self.objects keeps these alive, so ids aren't reused.
+                    if id(value) in self._registered: continue
+                    self._registered.add(id(value))
+                    self.objects.append(value)
+                # The raw _data holds nothing decoded.
+                queue.extend(item for attr, item in value.__dict__.iteritems()
+                             if attr != '_data' and isinstance(item, _nested))
+            elif isinstance(value, list):
+                queue.extend(item for item in value
+                             if isinstance(item, _nested))
+            elif isinstance(value, dict):
+                queue.extend(item for item in value.itervalues()
+                             if isinstance(item, _nested))
+
+    def resolve(self, obj, reference):
+        """Returns the value of reference for obj, loading it first for
+        every registered object that hasn't had it loaded."""
+        self.register(obj)
+        name = reference.name
+        start = self._loaded.get(name, 0)
+        if start < len(self.objects):
+            keys = []
+            for other in self.objects[start:]:
+                other_reference = getattr(type(other), name, None)
+                if (not isinstance(other_reference, Reference) or
+                        name in other.__dict__):
+                    continue
+                value = getattr(other, other_reference.key_attr, None)
+                if not value: continue
+                if other_reference.many: keys.extend(value)
+                else: keys.append(value)
+            end = len(self.objects)
+            self.load(keys)
+            self._loaded[name] = max(self._loaded.get(name, 0), end)
+        value = getattr(obj, reference.key_attr, None)
+        cache = self.cache
+        if reference.many:
+            return [cache[key] for key in value or []
+                    if cache.get(key) is not None]
+        return cache.get(value) if value else None
+
+    def load(self, keys):
+        """Fetches the keys that aren't cached yet, chunk_size at a time,
+        and caches them; keys Rdio doesn't know are cached as None."""
+        wanted = []
+        seen = set()
+        for key in keys:
+            if key not in self.cache and key not in seen:
+                seen.add(key)
+                wanted.append(key)
+        for i in range(0, len(wanted), self.chunk_size):
+            chunk = wanted[i:i + self.chunk_size]
+            self.calls += 1
+            for obj in self.api.get(chunk, extras=self.extras) or []:
+                if obj is not None: self.cache[obj.key] = obj
+            for key in chunk: self.cache.setdefault(key, None)
+
+    def memory_usage(self):
+        """Returns the footprint of the loaded objects; see
+        rdio.memory.cache_footprint."""
+        return cache_footprint(self.cache.itervalues())
@@ -0,0 +1,216 @@
+"""Drives Apis from many threads or processes against a server, by default
+a local FakeRdioServer, and reports throughput and latency percentiles at
+each level of concurrency, for capacity planning.
+
+    python -m rdio.loadgen --mode thread --levels 1,2,4,8,16 --latency 0.05
+
+Latency is timed around whole Api calls, so it includes signing and
+decoding as well as the round trip."""
+
+import argparse
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+import multiprocessing
+import random
+import time
+
+from rdio import Api
+from fakeserver import Catalog, serve_in_process
+from timing import percentile
+
+
+def _get(api, rng, catalog):
+    api.get(['t%d' % rng.randrange(catalog.tracks) for i in range(20)])
+
+
+def _collection(api, rng, catalog):
+    api.get_tracks_in_collection(
+        user='s%d' % rng.randrange(catalog.users),
+        start=rng.randrange(max(1, catalog.collection_size - 50)), count=50)
+
+
+def _search(api, rng, catalog):
+    api.search('query %d' % rng.randrange(1000), ['Artist', 'Album', 'Track'],
+               count=20)
+
+
+def _activity(api, rng, catalog):
+    api.get_activity_stream('s%d' % rng.randrange(catalog.users), 'friends')
+
+
+def _mixed(api, rng, catalog):
+    rng.choice((_get, _get, _collection, _search, _activity))(api, rng,
+                                                              catalog)
+
+
+# What each worker does over and over, by name.
+SCENARIOS = {'get': _get, 'collection': _collection, 'search': _search,
+             'activity': _activity, 'mixed': _mixed}
+
+
+class Target(namedtuple('Target', 'url consumer_key consumer_secret token '
+                                  'token_secret')):
+    """Where to send load, and as whom. Picklable, so that worker processes
+    can make their own Api."""
+
+    def api(self, connections=None):
+        return Api(self.consumer_key, self.consumer_secret, self.token,
+                   self.token_secret, connections=connections,
+                   root_url=self.url)
+
+
+def _work(target, scenario, catalog, deadline, seed, api=None):
+    # Runs scenario until deadline. Returns (seconds, failed) for each call.
+    api = api or target.api()
+    rng = random.Random(seed)
+    run = SCENARIOS[scenario]
+    calls = []
+    while time.time() < deadline:
+        start = time.time()
+        try:
+            run(api, rng, catalog)
+            failed = False
+        except Exception:
+            failed = True
+        calls.append((time.time() - start, failed))
+    return calls
+
+
+def _work_in_process(args):
+    return _work(*args)
+
+
+def run_load(target, scenario='mixed', concurrency=4, duration=5.0,
+             mode='thread', catalog=None):
+    """Runs scenario from concurrency workers for duration seconds and
+    returns a dictionary of 'mode', 'concurrency', 'calls', 'errors',
+    'seconds', 'throughput' (calls per second), and 'mean', 'p50', 'p95',
+    'p99' and 'max' latencies in seconds.
+
+    Keyword arguments:
+    target      -- the Target to send load to.
+    scenario    -- optional. The name of one of SCENARIOS.
+    concurrency -- optional. How many workers send calls at once.
+    duration    -- optional. How long to send calls for, in seconds.
+    mode        -- optional. 'thread' for threads sharing one Api with a
+                   connection each, or 'process' for processes with an Api
+                   each.
+    catalog     -- optional. The Catalog the server serves, which keys are
+                   picked from.
+
+    """
+    if scenario not in SCENARIOS:
+        raise ValueError("Unknown scenario %r." % (scenario,))
+    catalog = catalog or Catalog()
+    if mode == 'thread':
+        api = target.api(concurrency)
+        pool = ThreadPool(concurrency)
+        work = lambda args: _work(*args, api=api)
+    elif mode == 'process':
+        pool = multiprocessing.Pool(concurrency)
+        work = _work_in_process
+    else:
+        raise ValueError("Unknown mode %r." % (mode,))
+    # The deadline is set once the workers exist, so starting them isn't
+    # counted.
+    start = time.time()
+    deadline = start + duration
+    try:
+        results = pool.map(work, [(target, scenario, catalog, deadline, seed)
+                                  for seed in range(concurrency)])
+    finally:
+        pool.close()
+        pool.join()
+    elapsed = time.time() - start
+    latencies = [seconds for calls in results for seconds, failed in calls]
+    errors = sum(failed for calls in results for seconds, failed in calls)
+    total = sum(latencies)
+    return {
+        'mode': mode, 'concurrency': concurrency, 'calls': len(latencies),
+        'errors': errors, 'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'mean': total / len(latencies) if latencies else 0.0,
+        'p50': percentile(latencies, 0.5), 'p95': percentile(latencies, 0.95),
+        'p99': percentile(latencies, 0.99),
+        'max': max(latencies) if latencies else 0.0}
+
+
+def scaling_curve(target, levels=(1, 2, 4, 8, 16), **kwargs):
+    """Runs run_load at each concurrency in levels and returns the results
+    in order. Other arguments are passed to run_load."""
+    return [run_load(target, concurrency=level, **kwargs)
+            for level in levels]
+
+
+def format_curve(results):
+    """Returns the results of scaling_curve as a table, with each level's
+    throughput relative to the first."""
+    lines = ['%7s %6s %8s %10s %7s %8s %8s %8s %8s' % (
+        'mode', 'conc', 'calls', 'calls/s', 'scale', 'mean ms', 'p50 ms',
+        'p95 ms', 'p99 ms') + ' errors']
+    base = results[0]['throughput'] if results else 0.0
+    for result in results:
+        lines.append('%7s %6d %8d %10.1f %6.2fx %8.1f %8.1f %8.1f %8.1f %6d'
+                     % (result['mode'], result['concurrency'],
+                        result['calls'], result['throughput'],
+                        result['throughput'] / base if base else 0.0,
+                        result['mean'] * 1000, result['p50'] * 1000,
+                        result['p95'] * 1000, result['p99'] * 1000,
+                        result['errors']))
+    return '\n'.join(lines)
+
+
+def parser():
+    parser = argparse.ArgumentParser(prog='python -m rdio.loadgen',
+                                     description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', help='the API root to load; by default a '
+                        'FakeRdioServer is started in another process')
+    parser.add_argument('--consumer-key', default='key')
+    parser.add_argument('--consumer-secret', default='secret')
+    parser.add_argument('--token', default='token')
+    parser.add_argument('--token-secret', default='secret')
+    parser.add_argument('--mode', choices=('thread', 'process'),
+                        default='thread')
+    parser.add_argument('--levels', default='1,2,4,8,16',
+                        help='concurrency levels (default 1,2,4,8,16)')
+    parser.add_argument('--duration', type=float, default=5.0,
+                        help='seconds per level (default 5)')
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS),
+                        default='mixed')
+    parser.add_argument('--latency', type=float, default=0.05,
+                        help="the fake server's latency (default 0.05s)")
+    parser.add_argument('--jitter', type=float, default=0.0,
+                        help="up to this much more latency at random")
+    parser.add_argument('--artists', type=int, default=1000,
+                        help='the size of the fake catalog')
+    parser.add_argument('--collection-size', type=int, default=500)
+    return parser
+
+
+def main(argv=None):
+    args = parser().parse_args(argv)
+    catalog = Catalog(artists=args.artists,
+                      collection_size=args.collection_size)
+    server = None
+    url = args.url
+    if not url:
+        url, server = serve_in_process(
+            consumer_key=args.consumer_key,
+            consumer_secret=args.consumer_secret,
+            tokens={args.token: args.token_secret}, catalog=catalog,
+            latency=args.latency, jitter=args.jitter)
+    target = Target(url, args.consumer_key, args.consumer_secret,
+                    args.token, args.token_secret)
+    try:
+        results = scaling_curve(
+            target, [int(level) for level in args.levels.split(',')],
+            scenario=args.scenario, duration=args.duration, mode=args.mode,
+            catalog=catalog)
+    finally:
+        if server: server.terminate()
+    print format_curve(results)
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
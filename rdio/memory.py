@@ -0,0 +1,162 @@
+"""Reports how much memory decoded models, result lists and caches hold,
+split into the raw JSON each model keeps in _data and what decoding added
+on top of it."""
+
+from collections import defaultdict
+import sys
+import threading
+import types
+import weakref
+
+from rdio import JSONBasedObject
+
+# Shared by everything that uses them, so never counted.
+_SHARED = (type, types.ModuleType, types.FunctionType, types.MethodType,
+           types.BuiltinFunctionType, bool, types.NoneType)
+_CONTAINERS = (list, tuple, set, frozenset)
+
+
+def footprint(value, seen=None, nested=True):
+    """Returns a dictionary of the bytes value holds, following every
+    reference: 'total', split into 'data', the _data dictionaries of the
+    models reached and everything in them, and 'decoded', the rest; and
+    'objects', the number of models reached.
+
+    Each object is counted once, so a string a model's attribute shares
+    with its _data counts as data. Pass the same seen set to several calls
+    to leave out what earlier calls counted.
+
+    Keyword arguments:
+    value  -- the model, result list or other object to measure.
+    seen   -- optional. The ids of objects already counted.
+    nested -- optional. If False, models value refers to are left out.
+
+    """
+    seen = set() if seen is None else seen
+    sizes = {'data': 0, 'decoded': 0, 'objects': 0}
+    root = value
+    stack = [(value, 'decoded')]
+    while stack:
+        value, part = stack.pop()
+        if isinstance(value, _SHARED) or id(value) in seen: continue
+        if (not nested and value is not root and
+                isinstance(value, JSONBasedObject)): continue
+        seen.add(id(value))
+        sizes[part] += sys.getsizeof(value)
+        if isinstance(value, dict):
+            for key, item in value.iteritems():
+                stack.append((key, part))
+                stack.append((item, part))
+        elif isinstance(value, _CONTAINERS):
+            stack.extend((item, part) for item in value)
+        elif isinstance(value, basestring):
+            pass
+        else:
+            if isinstance(value, JSONBasedObject): sizes['objects'] += 1
+            attrs = getattr(value, '__dict__', None)
+            if attrs is not None:
+                # Attribute names are shared by every instance, so only the
+                # dictionary and the values are counted. _data goes on the
+                # stack last so that all of it is counted first.
+                seen.add(id(attrs))
+                sizes[part] += sys.getsizeof(attrs)
+                data = attrs.get('_data')
+                stack.extend((item, part) for name, item
+                             in attrs.iteritems() if name != '_data')
+                if data is not None: stack.append((data, 'data'))
+            for cls in type(value).__mro__:
+                for name in getattr(cls, '__slots__', ()):
+                    item = getattr(value, name, None)
+                    if item is not None: stack.append((item, part))
+    sizes['total'] = sizes['data'] + sizes['decoded']
+    return sizes
+
+
+def deep_size(value):
+    """Returns the bytes value holds, following every reference."""
+    return footprint(value)['total']
+
+
+def cache_footprint(values):
+    """Returns the footprint of a cache's values, as footprint does, with
+    what they share counted once and 'entries', the number of them."""
+    usage = {'data': 0, 'decoded': 0, 'objects': 0, 'total': 0}
+    seen = set()
+    values = list(values)
+    for value in values:
+        for part, size in footprint(value, seen).iteritems():
+            usage[part] += size
+    usage['entries'] = len(values)
+    return usage
+
+
+_trackers = []
+_trackers_lock = threading.Lock()
+
+
+def _tracked_new(cls, *args, **kwargs):
+    obj = object.__new__(cls)
+    # start and stop change _trackers from other threads.
+    with _trackers_lock: trackers = list(_trackers)
+    for tracker in trackers: tracker._add(obj)
+    return obj
+
+
+class AllocationTracker(object):
+    """Keeps a weak reference to every model made while it is started, so
+    report can count those still alive per class. Models made before are
+    not seen. Starting it slows making models down, and stopping the last
+    tracker puts the usual constructor back."""
+
+    def __init__(self):
+        self.made = defaultdict(int)
+        self._live = defaultdict(weakref.WeakSet)
+        self._lock = threading.Lock()
+
+    def _add(self, obj):
+        cls = type(obj)
+        with self._lock:
+            self.made[cls.__name__] += 1
+            self._live[cls].add(obj)
+
+    def start(self):
+        with _trackers_lock:
+            if self not in _trackers:
+                _trackers.append(self)
+                JSONBasedObject.__new__ = staticmethod(_tracked_new)
+        return self
+
+    def stop(self):
+        with _trackers_lock:
+            if self in _trackers: _trackers.remove(self)
+            if not _trackers and '__new__' in JSONBasedObject.__dict__:
+                del JSONBasedObject.__new__
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def report(self):
+        """Returns a dictionary of {class name: {'live', 'made', 'total',
+        'data', 'decoded'}}: the instances alive and made, and the footprint
+        of those alive. Each class counts only its own instances, not the
+        models they refer to; what they share with another class is
+        counted against the one measured first."""
+        with self._lock:
+            live = [(cls, list(objects))
+                    for cls, objects in self._live.iteritems()]
+        report = {}
+        seen = set()
+        for cls, objects in sorted(live, key=lambda item: item[0].__name__):
+            sizes = {'data': 0, 'decoded': 0, 'total': 0}
+            for obj in objects:
+                for part, size in footprint(obj, seen, False).iteritems():
+                    if part in sizes: sizes[part] += size
+            entry = report.setdefault(cls.__name__, {
+                'live': 0, 'made': self.made[cls.__name__],
+                'data': 0, 'decoded': 0, 'total': 0})
+            entry['live'] += len(objects)
+            for part, size in sizes.iteritems(): entry[part] += size
+        return report
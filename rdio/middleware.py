@@ -0,0 +1,201 @@
+"""Layers for an Api's middleware: timing, throttling, retries, logging and
+caching around whole calls, where they see the decoded result as well as
+the raw response.
+
+    api = Api(..., middleware=[Logged(), Retry(), Throttle(limiter)])
+
+Layers run in the order given, the first outermost; see rdio.compose."""
+
+from collections import OrderedDict
+import httplib
+import logging
+import socket
+import threading
+import time
+
+from memory import cache_footprint, deep_size
+from timing import CallTimes
+
+# Calls that read the catalog without changing anything, which are safe to
+# repeat or answer from a cache.
+READ_METHODS = frozenset([
+    'get', 'getAlbumsForArtist', 'getNewReleases', 'getObjectFromShortCode',
+    'getObjectFromUrl', 'getTopCharts', 'getTracksForArtist', 'search',
+    'searchSuggestions'])
+
+
+class Timer(object):
+    """Records every call in a CallTimes, including calls a later layer
+    answered without a request."""
+
+    def __init__(self, times=None):
+        """Instantiates a new timer.
+
+        Keyword arguments:
+        times -- optional. The CallTimes to record in.
+
+        """
+        self.times = times or CallTimes()
+
+    def __call__(self, call, proceed):
+        start = time.time()
+        try:
+            result = proceed(call)
+        except Exception:
+            self.times.record(call.method, time.time() - start,
+                              len(call.content or ''), error=True)
+            raise
+        self.times.record(call.method, time.time() - start,
+                          len(call.content or ''))
+        return result
+
+
+class Throttle(object):
+    """Makes calls wait for a RateLimiter. Put it inside a ResponseCache so
+    cached calls don't wait."""
+
+    def __init__(self, limiter):
+        self.limiter = limiter
+
+    def __call__(self, call, proceed):
+        self.limiter.acquire()
+        return proceed(call)
+
+
+class Retry(object):
+    """Repeats calls that fail with a network error, waiting longer before
+    each attempt. Errors the API returns are not retried."""
+
+    def __init__(self, attempts=3, backoff=0.5, methods=READ_METHODS,
+                 errors=(socket.error, httplib.HTTPException),
+                 sleep=time.sleep):
+        """Instantiates a new retry layer.
+
+        Keyword arguments:
+        attempts -- optional. The most times to try a call.
+        backoff  -- optional. The seconds to wait before the second attempt;
+                    each later wait is twice the one before.
+        methods  -- optional. The API methods to retry, or None for all.
+                    Other calls might have taken effect before failing.
+        errors   -- optional. The exceptions to retry on.
+        sleep    -- optional. Waits for a number of seconds.
+
+        """
+        self.attempts = attempts
+        self.backoff = backoff
+        self.methods = methods
+        self.errors = errors
+        self.sleep = sleep
+        self.retries = 0
+
+    def __call__(self, call, proceed):
+        if self.methods is not None and call.method not in self.methods:
+            return proceed(call)
+        for attempt in range(self.attempts - 1):
+            try:
+                return proceed(call)
+            except self.errors:
+                self.retries += 1
+                self.sleep(self.backoff * 2 ** attempt)
+        return proceed(call)
+
+
+class Logged(object):
+    """Logs each call's method, size and duration at DEBUG, and failures at
+    WARNING."""
+
+    def __init__(self, logger=None):
+        """Instantiates a new logging layer.
+
+        Keyword arguments:
+        logger -- optional. The logging.Logger to log to; defaults to the
+                  'rdio' logger.
+
+        """
+        self.logger = logger or logging.getLogger('rdio')
+
+    def __call__(self, call, proceed):
+        start = time.time()
+        try:
+            result = proceed(call)
+        except Exception as e:
+            self.logger.warning('%s failed after %.3fs: %r', call.method,
+                                time.time() - start, e)
+            raise
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug('%s %s bytes in %.3fs', call.method,
+                              len(call.content) if call.content else '-',
+                              time.time() - start)
+        return result
+
+
+class ResponseCache(object):
+    """Answers repeated calls with the result decoded the first time,
+    keeping the most recently used size results. Cached results are the
+    same objects every time, so callers mustn't change them.
+
+    Only the params are part of the cache key, not the user, so share a
+    cache only between Apis whose users may see the same results."""
+
+    def __init__(self, size=1000, ttl=None, methods=READ_METHODS,
+                 max_bytes=None, clock=time.time):
+        """Instantiates a new cache.
+
+        Keyword arguments:
+        size      -- optional. The most results to keep.
+        ttl       -- optional. How many seconds a result is served for.
+        methods   -- optional. The API methods to cache.
+        max_bytes -- optional. The most memory the results may hold, each
+                     measured when cached as if it shared nothing.
+        clock     -- optional. Returns the current time in seconds.
+
+        """
+        self.size = size
+        self.ttl = ttl
+        self.methods = methods
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.bytes = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.bytes = 0
+
+    def memory_usage(self):
+        """Returns the footprint of the cached results; see
+        rdio.memory.cache_footprint."""
+        with self._lock:
+            results = [entry[1] for entry in self._cache.itervalues()]
+        return cache_footprint(results)
+
+    def __call__(self, call, proceed):
+        if call.method not in self.methods: return proceed(call)
+        key = tuple(sorted(call.params.iteritems()))
+        now = self.clock()
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            if entry and (self.ttl is None or now - entry[0] < self.ttl):
+                self._cache[key] = entry
+                self.hits += 1
+                return entry[1]
+            if entry: self.bytes -= entry[2]
+            self.misses += 1
+        result = proceed(call)
+        size = deep_size(result) if self.max_bytes else 0
+        with self._lock:
+            entry = self._cache.pop(key, None)
+            if entry: self.bytes -= entry[2]
+            self._cache[key] = (now, result, size)
+            self.bytes += size
+            while self._cache and (len(self._cache) > self.size or (
+                    self.max_bytes and self.bytes > self.max_bytes)):
+                self.bytes -= self._cache.popitem(last=False)[1][2]
+        return result
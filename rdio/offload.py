@@ -0,0 +1,119 @@
+"""Decodes large API responses in worker processes, so json.loads and model
+construction do not hold the calling process's GIL."""
+
+from itertools import izip
+import json
+import multiprocessing
+
+from rdio import JSONBasedObject, RdioGenericAPIError, \
+    decode_response_result, project
+
+# Responses smaller than this are decoded inline; see bench/offload_bench.py
+# for where the crossover sits on a given machine.
+DEFAULT_THRESHOLD = 256 * 1024
+
+_names = {}
+_projected = {}
+
+
+def _class_ref(cls):
+    projection = getattr(cls, 'projection', None)
+    if projection is None: return cls
+    return (tuple(projection.fields), cls.__name__)
+
+
+def _resolve_class(ref):
+    if not isinstance(ref, tuple): return ref
+    if ref not in _projected:
+        registry = project(ref[0]).registry
+        _projected[ref] = [cls for cls in registry.itervalues()
+                           if cls.__name__ == ref[1]][0]
+    return _projected[ref]
+
+
+def to_record(value, memo=None):
+    """Turns decoded objects into compact, picklable records. Every object
+    becomes a (class, attribute names, values) tuple; the names tuple is
+    shared between objects of the same shape. An object shared between
+    several parents becomes one record, which pickle sends once. The raw
+    _data goes along with the attributes, since exports, snapshots and
+    memory reports read it; nested objects' _data is part of their
+    parent's, so pickle sends that once too."""
+    if memo is None: memo = {}
+    if isinstance(value, JSONBasedObject):
+        record = memo.get(id(value))
+        if record is None:
+            attrs = value.__dict__
+            names = tuple(attrs)
+            names = _names.setdefault(names, names)
+            record = memo[id(value)] = (
+                _class_ref(type(value)), names,
+                tuple([to_record(attrs[name], memo) for name in names]))
+        return record
+    if isinstance(value, list):
+        return [to_record(item, memo) for item in value]
+    return value
+
+
+def from_record(value, memo=None):
+    """Rebuilds objects from records made by to_record, one per record, so
+    objects that were shared are shared again."""
+    if memo is None: memo = {}
+    if isinstance(value, tuple):
+        obj = memo.get(id(value))
+        if obj is None:
+            ref, names, values = value
+            cls = _resolve_class(ref)
+            obj = memo[id(value)] = cls.__new__(cls)
+            obj.__dict__ = dict(izip(names, [from_record(v, memo)
+                                             for v in values]))
+        return obj
+    if isinstance(value, list):
+        return [from_record(item, memo) for item in value]
+    return value
+
+
+def _decode_to_records(content, decoder):
+    # Runs in a worker. Errors are sent back as a message rather than an
+    # exception, since the API exceptions can't be pickled.
+    parsed_content = json.loads(content)
+    if parsed_content['status'] == 'error':
+        return parsed_content['message'], None
+    result = parsed_content['result']
+    if not result: return None, None
+    return None, to_record(decode_response_result(decoder, result))
+
+
+class DecodeOffloader(object):
+    """Hands raw responses of at least threshold bytes to a process pool,
+    which decodes them into records that are rebuilt into objects here."""
+
+    def __init__(self, processes=None, threshold=DEFAULT_THRESHOLD):
+        """Instantiates a new offloader.
+
+        Keyword arguments:
+        processes -- optional. The number of worker processes; defaults to
+                     the number of CPUs.
+        threshold -- optional. The smallest response, in bytes, to offload.
+
+        """
+        self.threshold = threshold
+        self._pool = multiprocessing.Pool(processes)
+
+    def decode(self, content, decoder):
+        """Decodes a response body in a worker process.
+
+        Keyword arguments:
+        content -- the raw body of an API response.
+        decoder -- a picklable callable that turns the result into objects.
+
+        """
+        message, record = self._pool.apply(_decode_to_records,
+                                           (content, decoder))
+        if message is not None: raise RdioGenericAPIError(message)
+        return from_record(record)
+
+    def close(self):
+        """Shuts down the worker processes."""
+        self._pool.close()
+        self._pool.join()
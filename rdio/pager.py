@@ -0,0 +1,139 @@
+"""Pages through paginated API methods with a page size that adapts to how
+long each page takes and how big it is, and remembers what it learned
+between runs."""
+
+import json
+import os
+import socket
+import threading
+import time
+
+DEFAULT_BOUNDS = (10, 1000)
+INITIAL_COUNT = 50
+
+# How many objects of each page are re-encoded to estimate its size.
+SIZE_SAMPLE = 10
+
+
+def _item_bytes(page):
+    sample = [obj._data for obj in page[:SIZE_SAMPLE]
+              if getattr(obj, '_data', None) is not None]
+    if not sample: return None
+    return float(len(json.dumps(sample, separators=(',', ':')))) / len(sample)
+
+
+class AdaptivePager(object):
+    """Chooses count for methods like get_tracks_in_collection, search and
+    user_followers. After every page it compares the time taken with target
+    and moves the method's count towards the size that would have hit it,
+    within that method's bounds and, if max_bytes is set, no bigger than
+    would fit in max_bytes. A page that times out is retried at half the
+    size."""
+
+    def __init__(self, target=1.0, bounds=None, max_bytes=None, path=None,
+                 retries=3, clock=time.time):
+        """Instantiates a new pager, loading what was learned from path if it
+        exists.
+
+        Keyword arguments:
+        target    -- optional. The seconds each request should take.
+        bounds    -- optional. A dictionary of {method name: (least, most)}
+                     counts; other methods use DEFAULT_BOUNDS.
+        max_bytes -- optional. The most JSON each response should carry.
+        path      -- optional. The file to load and save learned sizes in.
+        retries   -- optional. How many times to halve and retry a page that
+                     timed out.
+        clock     -- optional. Returns the current time in seconds.
+
+        """
+        self.target = target
+        self.bounds = bounds or {}
+        self.max_bytes = max_bytes
+        self.path = path
+        self.retries = retries
+        self.clock = clock
+        self.learned = {}
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            with open(path) as state: self.learned = json.load(state)
+
+    def _bounds(self, name):
+        return self.bounds.get(name, DEFAULT_BOUNDS)
+
+    def _clamp(self, name, count, item_bytes):
+        least, most = self._bounds(name)
+        if self.max_bytes and item_bytes:
+            most = min(most, self.max_bytes / item_bytes)
+        return int(max(least, min(most, count)))
+
+    def count(self, name):
+        """Returns the page size to use next for the method called name."""
+        with self._lock: learned = self.learned.get(name, {})
+        return self._clamp(name, learned.get('count', INITIAL_COUNT),
+                           learned.get('item_bytes'))
+
+    def record(self, name, count, items, seconds, item_bytes=None):
+        """Learns from a page of items, asked for with count, that took
+        seconds to fetch and averaged item_bytes of JSON an object."""
+        if not items or seconds <= 0: return
+        # The size that would have taken target, if time grows with size.
+        # Step halfway there (geometrically) so one slow page can't swing
+        # the size wildly.
+        ideal = items * self.target / seconds
+        with self._lock:
+            learned = self.learned.setdefault(name, {})
+            if item_bytes:
+                previous = learned.get('item_bytes') or item_bytes
+                learned['item_bytes'] = (previous + item_bytes) / 2
+            learned['count'] = self._clamp(
+                name, (count * max(ideal, 1)) ** 0.5,
+                learned.get('item_bytes'))
+
+    def _timed_out(self, name, count):
+        least = self._bounds(name)[0]
+        count = max(least, count // 2)
+        with self._lock: self.learned.setdefault(name, {})['count'] = count
+        return count
+
+    def pages(self, method, *args, **kwargs):
+        """Calls method (a bound Api method taking start and count) page
+        after page, yielding each non-empty page as a list of objects, until
+        one comes back short. Other arguments are passed on to method."""
+        name = method.__name__
+        start = kwargs.pop('start', None) or 0
+        while True:
+            count = self.count(name)
+            for attempt in range(self.retries + 1):
+                began = self.clock()
+                try:
+                    page = method(*args, start=start, count=count, **kwargs)
+                    break
+                except socket.timeout:
+                    if (attempt == self.retries or
+                            count <= self._bounds(name)[0]): raise
+                    count = self._timed_out(name, count)
+            seconds = self.clock() - began
+            # search wraps its page in an RdioSearchResult.
+            page = getattr(page, 'results', page) or []
+            # A short last page is mostly per-request overhead, so only full
+            # pages are learned from.
+            if len(page) == count:
+                self.record(name, count, count, seconds, _item_bytes(page))
+            if page: yield page
+            if len(page) < count: return
+            start += len(page)
+
+    def items(self, method, *args, **kwargs):
+        """Like pages, but yields the objects one at a time."""
+        for page in self.pages(method, *args, **kwargs):
+            for item in page: yield item
+
+    def save(self, path=None):
+        """Writes the learned sizes to a file."""
+        with self._lock:
+            learned = dict((name, dict(values))
+                           for name, values in self.learned.iteritems())
+        path = path or self.path
+        temporary = path + '.tmp'
+        with open(temporary, 'w') as state: json.dump(learned, state)
+        os.rename(temporary, path)
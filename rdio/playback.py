@@ -0,0 +1,161 @@
+"""Caches playback tokens per domain and user, refreshing them in the
+background before they expire."""
+
+from collections import OrderedDict
+import threading
+import time
+
+from memory import cache_footprint
+
+
+class _Flight(object):
+    # One in-progress token fetch that concurrent callers can wait on.
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.token = None
+        self.error = None
+
+
+class _Entry(object):
+
+    def __init__(self, token, expires):
+        self.token = token
+        self.expires = expires
+
+
+class PlaybackTokenCache(object):
+    """Caches get_playback_token results per (domain, user). A token is
+    reused until ttl seconds after it was fetched; within refresh_ahead
+    seconds of that it is still served, but a background refresh starts.
+    Concurrent callers needing the same token share a single request. At
+    most size tokens are kept, least recently used dropped first, and
+    expired ones are dropped as new ones come in."""
+
+    def __init__(self, ttl=3600, refresh_ahead=300, clock=time.time,
+                 size=10000):
+        """Instantiates a new cache.
+
+        Keyword arguments:
+        ttl           -- optional. How many seconds a token is used for.
+        refresh_ahead -- optional. How many seconds before expiry to start
+                         refreshing in the background.
+        clock         -- optional. Returns the current time in seconds.
+        size          -- optional. How many tokens to keep.
+
+        """
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.clock = clock
+        self.size = size
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(
+            ('hits', 'misses', 'coalesced', 'refreshes', 'errors'), 0)
+        self._refresh_time = 0.0
+        self._refresh_max = 0.0
+
+    def _key(self, api, domain):
+        token = getattr(api, '_oauth_access_token', None)
+        return (domain, token.key if token else None)
+
+    def get(self, api, domain=None):
+        """Returns a playback token for domain and api's user, fetching one
+        only if there is no usable cached token.
+
+        Keyword arguments:
+        api    -- the Api (or ApiView) of the user.
+        domain -- optional. The domain the playback SWF is embedded in.
+
+        """
+        key = self._key(api, domain)
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry and now < entry.expires:
+                self._entries[key] = entry
+                self._counts['hits'] += 1
+                if (now >= entry.expires - self.refresh_ahead and
+                        key not in self._flights):
+                    flight = self._flights[key] = _Flight()
+                    thread = threading.Thread(target=self._refresh,
+                                              args=(api, domain, key, flight))
+                    thread.daemon = True
+                    thread.start()
+                return entry.token
+            flight = self._flights.get(key)
+            if flight:
+                self._counts['coalesced'] += 1
+                owner = False
+            else:
+                self._counts['misses'] += 1
+                flight = self._flights[key] = _Flight()
+                owner = True
+        if owner: self._refresh(api, domain, key, flight)
+        else: flight.done.wait()
+        if flight.error: raise flight.error
+        return flight.token
+
+    def _refresh(self, api, domain, key, flight):
+        start = time.time()
+        try:
+            flight.token = api.get_playback_token(domain)
+        except Exception as e:
+            flight.error = e
+        elapsed = time.time() - start
+        with self._lock:
+            del self._flights[key]
+            if flight.error:
+                self._counts['errors'] += 1
+            else:
+                self._counts['refreshes'] += 1
+                self._refresh_time += elapsed
+                self._refresh_max = max(self._refresh_max, elapsed)
+                # A failed fetch can come back without a token; don't serve
+                # that to later callers.
+                if flight.token is not None: self._store(key, flight.token)
+        flight.done.set()
+
+    def _store(self, key, token):
+        now = self.clock()
+        entries = self._entries
+        entries.pop(key, None)
+        entries[key] = _Entry(token, now + self.ttl)
+        # The least recently used entries are at the front; drop them while
+        # they have expired or there are too many.
+        while entries:
+            oldest = next(iter(entries))
+            if len(entries) <= self.size and now < entries[oldest].expires:
+                break
+            del entries[oldest]
+
+    def invalidate(self, api=None, domain=None):
+        """Drops the cached token for api's user and domain, or every token
+        if no api is given."""
+        with self._lock:
+            if api is None: self._entries.clear()
+            else: self._entries.pop(self._key(api, domain), None)
+
+    def memory_usage(self):
+        """Returns the footprint of the cached tokens; see
+        rdio.memory.cache_footprint."""
+        with self._lock:
+            tokens = [entry.token for entry in self._entries.itervalues()]
+        return cache_footprint(tokens)
+
+    def stats(self):
+        """Returns counts of hits, misses, coalesced waits, refreshes and
+        errors, plus the hit rate and mean/max refresh latency in seconds.
+        Every hit and coalesced wait is a round trip saved."""
+        with self._lock:
+            stats = dict(self._counts)
+            refreshes = stats['refreshes']
+            stats['refresh_mean'] = (self._refresh_time / refreshes
+                                     if refreshes else 0.0)
+            stats['refresh_max'] = self._refresh_max
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_rate'] = (float(stats['hits'] + stats['coalesced']) /
+                             lookups if lookups else 0.0)
+        return stats
@@ -0,0 +1,134 @@
+"""Serves many Rdio users from one process through a shared consumer and
+transport."""
+
+from collections import OrderedDict
+import threading
+import weakref
+
+import oauth2 as oauth
+
+from rdio import Api, Credentials, PooledHttpTransport
+
+
+class ApiView(Api):
+    """An Api bound to one user's access token. Views share the consumer and
+    transport of the ApiPool that made them, and allow at most
+    max_concurrency calls in flight at once, or any number if it is None.
+    Views given the same slots share one cap."""
+
+    def __init__(self, consumer, token, transport, max_concurrency,
+                 offloader=None, middleware=None, slots=None):
+        self._credentials = Credentials(consumer, token)
+        self._transport = transport
+        self._offloader = offloader
+        if middleware: self.middleware = middleware
+        if slots is None and max_concurrency:
+            slots = threading.BoundedSemaphore(max_concurrency)
+        self._slots = slots
+        self._lock = threading.Lock()
+        self.in_flight = 0
+
+    def set_credentials(self, *args, **kwargs):
+        raise TypeError("ApiView credentials are fixed; ask the pool "
+                        "for another view instead.")
+
+    def call_api(self, data, decoder=None, authenticated=False):
+        """Calls the Rdio API, waiting for a free slot if this user already
+        has max_concurrency calls in flight."""
+        slots = self._slots
+        if slots: slots.acquire()
+        with self._lock: self.in_flight += 1
+        try:
+            return super(ApiView, self).call_api(data, decoder,
+                                                 authenticated)
+        finally:
+            with self._lock: self.in_flight -= 1
+            if slots: slots.release()
+
+
+class ApiPool(object):
+    """Hands out cheap per-user ApiViews over one consumer and one pooled
+    transport. Idle views are evicted least recently used first once there
+    are more than max_views of them.
+
+    Calls without a token all go through the one shared anonymous view,
+    whoever makes them, so max_concurrency doesn't apply to them; they are
+    capped by anonymous_concurrency instead, which is off by default."""
+
+    def __init__(self, consumer_key, consumer_secret, transport=None,
+                 max_views=1000, max_concurrency=4, offloader=None,
+                 middleware=None, anonymous_concurrency=None):
+        """Instantiates a new pool.
+
+        Keyword arguments:
+        consumer_key    -- The oAuth API key for the application.
+        consumer_secret -- The oAuth API secret for the application.
+        transport       -- optional. A thread-safe transport shared by every
+                           view; defaults to a new PooledHttpTransport.
+        max_views       -- optional. The number of views to keep cached.
+        max_concurrency -- optional. The most calls one user may have in
+                           flight at once.
+        offloader       -- optional. A DecodeOffloader shared by every view.
+        middleware      -- optional. The layers calls from every view pass
+                           through, outermost first.
+        anonymous_concurrency -- optional. The most unauthenticated calls
+                           in flight at once, across every caller; None
+                           for no cap.
+
+        """
+        self.consumer = oauth.Consumer(key=consumer_key,
+                                       secret=consumer_secret)
+        self.transport = transport or PooledHttpTransport()
+        self.max_views = max_views
+        self.max_concurrency = max_concurrency
+        self.offloader = offloader
+        self.middleware = middleware
+        self._views = OrderedDict()
+        # A user's cap lives as long as any view of theirs does, so a view
+        # evicted while its caller still holds it shares the cap with the
+        # view that replaces it.
+        self._slots = weakref.WeakValueDictionary()
+        self._lock = threading.Lock()
+        self.anonymous = ApiView(self.consumer, None, self.transport,
+                                 anonymous_concurrency, offloader,
+                                 middleware)
+
+    def __len__(self):
+        return len(self._views)
+
+    def view(self, access_token_key=None, access_token_secret=None):
+        """Returns the view for a user's access token, creating it if needed.
+        Without a token, returns the shared unauthenticated view.
+
+        Keyword arguments:
+        access_token_key    -- The oAuth user's token key.
+        access_token_secret -- The oAuth user's token secret.
+
+        """
+        if not access_token_key: return self.anonymous
+        with self._lock:
+            view = self._views.pop(access_token_key, None)
+            if (view is None or
+                    view._oauth_access_token.secret != access_token_secret):
+                token = oauth.Token(key=access_token_key,
+                                    secret=access_token_secret)
+                view = ApiView(self.consumer, token, self.transport,
+                               self.max_concurrency, self.offloader,
+                               self.middleware,
+                               self._slots.get(access_token_key))
+                if view._slots is not None:
+                    self._slots[access_token_key] = view._slots
+            self._views[access_token_key] = view
+            self._evict()
+            return view
+
+    def _evict(self):
+        # Drop the least recently used idle views. A caller may still hold
+        # one, but its cap stays shared through _slots.
+        excess = len(self._views) - self.max_views
+        if excess <= 0: return
+        for key, view in self._views.items():
+            if not view.in_flight:
+                del self._views[key]
+                excess -= 1
+                if not excess: break
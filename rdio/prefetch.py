@@ -0,0 +1,250 @@
+"""Fetches the top results of searches and charts in the background before
+they are opened, and answers the get calls that open them from a cache.
+
+    prefetcher = Prefetcher(top=3, limiter=limiter)
+    api = Api(..., connections=4, middleware=[prefetcher, Throttle(limiter)])
+
+Prefetches are sent from another thread, so the Api needs a thread-safe
+transport, such as the one connections makes. They go through the layers
+after the Prefetcher, so put it before any throttling or retrying they
+should get."""
+
+from collections import OrderedDict
+import Queue
+import threading
+import time
+
+from memory import cache_footprint, deep_size
+from rdio import ApiCall, parse_result_dictionary
+
+# The calls whose top results are prefetched.
+LISTINGS = frozenset(['search', 'getTopCharts'])
+
+
+def _listed(result):
+    # The objects of a listing, best first: search results hold theirs in
+    # results, charts are a list.
+    return getattr(result, 'results', result) or []
+
+
+def _extras(params):
+    return frozenset(extra for extra in params.get('extras', '').split(',')
+                     if extra)
+
+
+class Prefetcher(object):
+    """A middleware layer that, when a search or chart comes back, queues
+    a get of its top results with extras, then of the first tracks of
+    each, and keeps what was fetched in an LRU cache of objects by key.
+    Later get calls for keys in the cache, with no extras it lacks, are
+    answered from it, in the order of their keys; only the missing keys are
+    sent. Gets with fields always go to the API, since the cached objects
+    aren't decoded for their projection.
+
+    Objects are cached by key alone, not by user, and fields such as
+    canStream and isInCollection differ between users, so share a
+    Prefetcher only between Apis whose users may see the same results.
+
+    Prefetching is opt-in and low priority: one background thread fetches
+    only while no other call through this layer is in flight, skips work
+    while limiter has fewer than reserve calls available or after an
+    error, and drops listings when too many are queued."""
+
+    def __init__(self, top=3, extras=('trackKeys',), tracks=20, size=1000,
+                 max_bytes=None, limiter=None, reserve=1, queue_size=10,
+                 cooldown=30.0, clock=time.time):
+        """Instantiates a new prefetcher.
+
+        Keyword arguments:
+        top        -- optional. How many results of each listing to fetch.
+        extras     -- optional. The extras to fetch them with.
+        tracks     -- optional. How many of each result's trackKeys to
+                      fetch as well; 0 for none.
+        size       -- optional. The most objects to keep.
+        max_bytes  -- optional. The most memory the objects may hold, each
+                      measured when cached as if it shared nothing.
+        limiter    -- optional. The RateLimiter calls wait on.
+        reserve    -- optional. Prefetch only while limiter has at least
+                      this many calls available, leaving them for callers.
+        queue_size -- optional. The most listings waiting to be fetched.
+        cooldown   -- optional. Seconds to stop prefetching after one
+                      fails.
+        clock      -- optional. Returns the current time in seconds.
+
+        """
+        self.top = top
+        self.extras = frozenset(extras)
+        self.tracks = tracks
+        self.size = size
+        self.max_bytes = max_bytes
+        self.limiter = limiter
+        self.reserve = reserve
+        self.cooldown = cooldown
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+        self.used = 0
+        self.skipped = 0
+        self.errors = 0
+        self.bytes = 0
+        self._cache = OrderedDict()
+        self._queue = Queue.Queue(queue_size)
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._foreground = 0
+        self._paused_until = 0
+        self._worker = None
+
+    def __len__(self):
+        return len(self._cache)
+
+    def memory_usage(self):
+        """Returns the footprint of the cached objects; see
+        rdio.memory.cache_footprint."""
+        with self._lock:
+            objects = [entry[1] for entry in self._cache.itervalues()]
+        return cache_footprint(objects)
+
+    def __call__(self, call, proceed):
+        with self._lock: self._foreground += 1
+        try:
+            if call.method == 'get': return self._get(call, proceed)
+            result = proceed(call)
+        finally:
+            with self._lock:
+                self._foreground -= 1
+                if not self._foreground: self._idle.notify_all()
+        if call.method in LISTINGS: self._schedule(result, proceed)
+        return result
+
+    def _get(self, call, proceed):
+        keys = call.params['keys'].split(',')
+        extras = _extras(call.params)
+        # A projection leaves fields out with '-' extras; its decoder wants
+        # objects of its own classes.
+        if any(extra.startswith('-') for extra in extras):
+            return proceed(call)
+        cached = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                entry = self._cache.pop(key, None)
+                if entry is None:
+                    missing.append(key)
+                    continue
+                self._cache[key] = entry
+                if not extras <= entry[0]:
+                    missing.append(key)
+                    continue
+                if not entry[2]:
+                    entry[2] = True
+                    self.used += 1
+                cached[key] = entry[1]
+            self.hits += len(cached)
+            self.misses += len(missing)
+        if not cached: return proceed(call)
+        if missing:
+            call.params['keys'] = ','.join(missing)
+            for obj in proceed(call) or []:
+                if obj is not None: cached[obj.key] = obj
+        return [cached[key] for key in OrderedDict.fromkeys(keys)
+                if key in cached]
+
+    def _schedule(self, result, proceed):
+        keys = [obj.key for obj in _listed(result)[:self.top]
+                if getattr(obj, 'key', None)]
+        with self._lock:
+            keys = [key for key in keys if key not in self._cache]
+            if not keys: return
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run)
+                self._worker.daemon = True
+                self._worker.start()
+        try:
+            self._queue.put_nowait((keys, proceed))
+        except Queue.Full:
+            with self._lock: self.skipped += 1
+
+    def _pressed(self):
+        # Whether callers need the calls more than the cache does.
+        if self.clock() < self._paused_until: return True
+        return (self.limiter is not None and
+                self.limiter.available() < self.reserve)
+
+    def _fetch(self, keys, extras, proceed):
+        # Gets keys and caches them. Returns what was fetched.
+        if self._pressed():
+            with self._lock: self.skipped += 1
+            return []
+        params = {'method': 'get', 'keys': ','.join(keys)}
+        if extras: params['extras'] = ','.join(sorted(extras))
+        try:
+            objects = [obj for obj in proceed(ApiCall(
+                params, parse_result_dictionary)) or [] if obj is not None]
+        except Exception:
+            with self._lock:
+                self.errors += 1
+                self._paused_until = self.clock() + self.cooldown
+            return []
+        sizes = [deep_size(obj) if self.max_bytes else 0 for obj in objects]
+        with self._lock:
+            for obj, size in zip(objects, sizes):
+                entry = self._cache.pop(obj.key, None)
+                if entry: self.bytes -= entry[3]
+                self._cache[obj.key] = [extras, obj, False, size]
+                self.bytes += size
+            while self._cache and (len(self._cache) > self.size or (
+                    self.max_bytes and self.bytes > self.max_bytes)):
+                self.bytes -= self._cache.popitem(last=False)[1][3]
+            self.prefetched += len(objects)
+        return objects
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None: return
+                keys, proceed = job
+                with self._idle:
+                    while self._foreground: self._idle.wait()
+                objects = self._fetch(keys, self.extras, proceed)
+                if self.tracks:
+                    tracks = []
+                    for obj in objects:
+                        tracks.extend((getattr(obj, 'track_keys', None)
+                                       or [])[:self.tracks])
+                    with self._lock:
+                        tracks = [key for key in tracks
+                                  if key not in self._cache]
+                    if tracks: self._fetch(tracks, frozenset(), proceed)
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """Waits until every queued listing is prefetched or skipped."""
+        self._queue.join()
+
+    def close(self):
+        """Stops the background thread once the queue is done."""
+        with self._lock: worker, self._worker = self._worker, None
+        if worker is not None:
+            self._queue.put(None)
+            worker.join()
+
+    def stats(self):
+        """Returns a dictionary of 'hits' and 'misses', the keys asked for
+        with get that were and weren't in the cache, and 'hit_rate'; of
+        'prefetched', the objects fetched, 'used', how many of those were
+        asked for, and 'waste', the fraction never asked for; and of
+        'skipped' and 'errors', the fetches left out under pressure or that
+        failed."""
+        with self._lock:
+            asked = self.hits + self.misses
+            return {
+                'hits': self.hits, 'misses': self.misses,
+                'hit_rate': float(self.hits) / asked if asked else 0.0,
+                'prefetched': self.prefetched, 'used': self.used,
+                'waste': (1 - float(self.used) / self.prefetched
+                          if self.prefetched else 0.0),
+                'skipped': self.skipped, 'errors': self.errors}
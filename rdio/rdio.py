@@ -27,14 +27,22 @@
 __author__ = 'benjaminkreeger@gmail.com'
 __version__ = '0.4'
 
-from urlparse import parse_qsl
+from urlparse import parse_qs, parse_qsl
 import inspect
+import httplib2
 import oauth2 as oauth
 import json
+import Queue
+import threading
 import urllib
 import re
+from collections import OrderedDict, namedtuple
+from functools import partial
 from datetime import datetime, timedelta
 from dateutil import tz
+# datetime.strptime imports this lazily, which can fail when the first call
+# is made from several threads at once.
+import _strptime
 
 # Declare some constants and stuff
 
@@ -43,6 +51,8 @@ OAUTH_TOKEN_URL = 'http://api.rdio.com/oauth/request_token'
 OAUTH_ACCESS_URL = 'http://api.rdio.com/oauth/access_token'
 ROOT_SITE_URL = 'http://www.rdio.com'
 HTTP_METHOD = 'POST'
+FORM_CONTENT_TYPE = 'application/x-www-form-urlencoded'
+SIGNATURE_METHOD = oauth.SignatureMethod_HMAC_SHA1()
 rdio_types = {
     'a': 'album',
     'al': 'album in collection',
@@ -168,10 +178,185 @@ class RdioInvalidParameterException(Exception):
         return repr("%s is an invalid parameter for %s in method %s." % (
             self.value, self.param, self.method,))
 
+# Define how objects are decoded. Every model class lists the fields it reads
+# from Rdio's JSON data in its `schema`; compile_decoder() flattens the schemas
+# of a class and all of its bases into one generated __init__, so decoding an
+# object is a single straight-line function instead of a chain of super()
+# calls and `if 'x' in data` checks.
+MISSING = object()
+
+class Field(object):
+    """Describes one model attribute and the JSON field it is read from. The
+    value is passed through convert, which may be a callable or a dict."""
+
+    def __init__(self, attr, name, required=False, default=None,
+                 convert=None):
+        self.attr = attr
+        self.name = name
+        self.required = required
+        self.default = default
+        self.convert = convert
+
+def required(attr, name, convert=None):
+    """A field that is always present in the data."""
+    return Field(attr, name, required=True, convert=convert)
+
+def optional(attr, name, default=None, convert=None):
+    """A field that may be missing from the data. If default is MISSING the
+    attribute is left unset when the field is missing."""
+    return Field(attr, name, default=default, convert=convert)
+
+def schema_fields(cls):
+    """Returns the fields of cls and its bases, keyed by attribute name."""
+    fields = OrderedDict()
+    for klass in reversed(cls.__mro__):
+        for field in klass.__dict__.get('schema', ()):
+            fields.pop(field.attr, None)
+            fields[field.attr] = field
+    return fields
+
+def compile_decoder(cls, fields=None, post_decode=True):
+    """Compiles the schema of cls (and those of its bases) into cls.__init__.
+
+    Keyword arguments:
+    cls         -- a JSONBasedObject subclass.
+    fields      -- optional. The fields to decode, instead of the schema.
+    post_decode -- optional. If False, cls._post_decode is not called.
+
+    """
+    if fields is None: fields = schema_fields(cls).values()
+    namespace = {}
+    items = ["'_data': data"]
+    missing = []
+    for i, field in enumerate(fields):
+        name = repr(field.name)
+        value = 'data[%s]' % name
+        if isinstance(field.convert, dict):
+            namespace['convert%d' % i] = field.convert
+            value = 'convert%d[%s]' % (i, value)
+        elif field.convert:
+            namespace['convert%d' % i] = field.convert
+            value = 'convert%d(%s)' % (i, value)
+        if isinstance(field.default, list):
+            default = '[]'
+        else:
+            namespace['default%d' % i] = field.default
+            default = 'default%d' % i
+        if field.required:
+            items.append('%r: %s' % (field.attr, value))
+        elif field.default is MISSING:
+            missing.append('    if %s in data: self.%s = %s' % (
+                name, field.attr, value))
+        else:
+            items.append('%r: %s if %s in data else %s' % (
+                field.attr, value, name, default))
+    lines = ['def __init__(self, data):',
+             '    self.__dict__ = {%s}' % ',\n        '.join(items)]
+    lines.extend(missing)
+    if post_decode and hasattr(cls, '_post_decode'):
+        lines.append('    self._post_decode(data)')
+    source = '\n'.join(lines) + '\n'
+    exec(compile(source, '<%s decoder>' % cls.__name__, 'exec'), namespace)
+    cls.__init__ = namespace['__init__']
+    return cls
+
+class _LoaderScope(threading.local):
+    loader = None
+
+# The Loader (see loader.py) whose scope is active on this thread, if any.
+loader_scope = _LoaderScope()
+
+class Reference(object):
+    """A lazy attribute holding the object (or, if many, the list of
+    objects) behind a key attribute, such as an album's tracks behind its
+    track_keys. It is resolved by the active Loader, and raises
+    AttributeError outside of one."""
+
+    def __init__(self, name, key_attr, many=False):
+        self.name = name
+        self.key_attr = key_attr
+        self.many = many
+
+    def __get__(self, obj, cls):
+        if obj is None: return self
+        loader = loader_scope.loader
+        if loader is None:
+            raise AttributeError("%s.%s can only be loaded inside a Loader "
+                                 "scope." % (cls.__name__, self.name))
+        return loader.resolve(obj, self)
+
+class _IdentityMap(threading.local):
+    objects = None
+
+# While a response decodes, the objects decoded so far by (class, key).
+_identity_map = _IdentityMap()
+
+def decode_response_result(decoder, result):
+    """Decodes the result of one response with decoder. Within it, nested
+    objects that repeat, like the owner of every item in an activity stream,
+    decode once and share one instance."""
+    previous = _identity_map.objects
+    _identity_map.objects = {}
+    try:
+        return decoder(result)
+    finally:
+        _identity_map.objects = previous
+
+def _shared(cls, data):
+    # Decodes data as cls, or returns the object already decoded from an
+    # equal payload in this response. Payloads with the same key can differ
+    # in their extras, so the data is compared too.
+    objects = _identity_map.objects
+    if objects is None: return cls(data)
+    ref = (cls, data.get('key'))
+    obj = objects.get(ref)
+    if obj is None or obj._data != data:
+        obj = objects[ref] = cls(data)
+    return obj
+
+# Converters used by the schemas below.
+def _to_timedelta(seconds):
+    return timedelta(seconds=seconds)
+
+def _from_timestamp(value):
+    return datetime.fromtimestamp(int(value))
+
+def _from_time_string(value):
+    return datetime.strptime(value, TIME_FORMAT).replace(tzinfo=UTC)
+
+def _to_gender(code):
+    return rdio_genders[code][0]
+
+def _to_gender_posessive(code):
+    return rdio_genders[code][1]
+
+def _to_result_list(values):
+    return parse_result_list(values)
+
+def _to_rdio_object(value):
+    return derive_rdio_type_from_data(value)
+
+def _to_user(value):
+    return _shared(RdioUser, value)
+
+def _to_track(value):
+    return _shared(RdioTrack, value)
+
+def _to_track_list(values):
+    return [_shared(RdioTrack, x) for x in values]
+
+def _to_album_list(values):
+    return [_shared(RdioAlbum, x) for x in values]
+
+def _to_activity_item_list(values):
+    return [RdioActivityItem(x) for x in values]
+
 # Define objects.
 class JSONBasedObject(object):
     """Describeds a JSON based object (keeps data)."""
 
+    schema = ()
+
     def __init__(self, data):
         super(JSONBasedObject, self).__init__()
         self._data = data
@@ -179,174 +364,150 @@ class JSONBasedObject(object):
 class RdioObject(JSONBasedObject):
     """Describes common fields a base Rdio object will have."""
 
-    def __init__(self, data):
-        super(RdioObject, self).__init__(data)
-        self.key = data['key']
-        self.url = data['url']
-        self.icon = data['icon']
-        self.base_icon = data['baseIcon']
-        self.rdio_type = rdio_types[data['type']]
+    schema = (
+        required('key', 'key'),
+        required('url', 'url'),
+        required('icon', 'icon'),
+        required('base_icon', 'baseIcon'),
+        required('rdio_type', 'type', rdio_types),
+    )
 
 class RdioArtist(RdioObject):
     """Describes an Rdio artist."""
 
-    def __init__(self, data):
-        super(RdioArtist, self).__init__(data)
-        self.name = data['name']
-        self.track_count = data['length']
-        self.has_radio = data['hasRadio']
-        self.short_url = data['shortUrl']
-        self.album_count = -1
-        self.hits = None
-        self.user_count = None
-        self.users = None
-        self.top_songs_key = None
-        self.collection_track_count = None
-        self.radio_key = None
-        if 'albumCount' in data: self.album_count = data['albumCount']
-        if 'hits' in data: self.hits = data['hits']
-        if 'user_count' in data: self.user_count = data['user_count']
-        if 'users' in data: self.users = parse_result_list(data['users'])
-        if 'topSongsKey' in data: self.top_songs_key = data['topSongsKey']
-        if 'count' in data: self.collection_track_count = data['count']
-        if 'radioKey' in data: self.radio_key = data['radioKey']
+    schema = (
+        required('name', 'name'),
+        required('track_count', 'length'),
+        required('has_radio', 'hasRadio'),
+        required('short_url', 'shortUrl'),
+        optional('album_count', 'albumCount', -1),
+        optional('hits', 'hits'),
+        optional('user_count', 'user_count'),
+        optional('users', 'users', convert=_to_result_list),
+        optional('top_songs_key', 'topSongsKey'),
+        optional('collection_track_count', 'count'),
+        optional('radio_key', 'radioKey'),
+    )
+
+    # Attributes a Loader resolves lazily, and the key fields behind them.
+    references = {'top_songs': 'top_songs_key'}
 
 class RdioMusicObject(RdioObject):
     """Describes an Rdio music object."""
 
-    def __init__(self, data):
-        super(RdioMusicObject, self).__init__(data)
-        self.name = data['name']
-        self.artist_name = data['artist']
-        self.artist_url = data['artistUrl']
-        self.artist_key = data['artistKey']
-        self.is_explicit = data['isExplicit']
-        self.is_clean = data['isClean']
-        self.price = data['price']
-        self.can_stream = data['canStream']
-        self.can_sample = data['canSample']
-        self.can_tether = data['canTether']
-        self.short_url = data['shortUrl']
-        self.embed_url = data['embedUrl']
-        self.duration = timedelta(seconds=data['duration'])
-        self.big_icon = None
-        if 'bigIcon' in data: self.big_icon = data['bigIcon']
+    schema = (
+        required('name', 'name'),
+        required('artist_name', 'artist'),
+        required('artist_url', 'artistUrl'),
+        required('artist_key', 'artistKey'),
+        required('is_explicit', 'isExplicit'),
+        required('is_clean', 'isClean'),
+        required('price', 'price'),
+        required('can_stream', 'canStream'),
+        required('can_sample', 'canSample'),
+        required('can_tether', 'canTether'),
+        required('short_url', 'shortUrl'),
+        required('embed_url', 'embedUrl'),
+        required('duration', 'duration', _to_timedelta),
+        optional('big_icon', 'bigIcon'),
+    )
+
+    references = {'artist': 'artist_key'}
 
 class RdioAlbum(RdioMusicObject):
     """Describes an Rdio album."""
 
-    def __init__(self, data):
-        super(RdioAlbum, self).__init__(data)
-        self.release_date = data['displayDate']
-        self.track_keys = []
-        self.release_date_iso = None
-        self.hits = None
-        self.user_count = None
-        self.users = None
-        self.is_compilation = None
-        if 'trackKeys' in data: self.track_keys = data['trackKeys']
-        if 'releaseDateISO' in data:
-            self.release_date_iso = data['releaseDateISO']
-        if 'hits' in data: self.hits = data['hits']
-        if 'user_count' in data: self.user_count = data['user_count']
-        if 'users' in data: self.users = parse_result_list(data['users'])
-        if 'isCompilation' in data: self.is_compilation = data['isCompilation']
+    schema = (
+        required('release_date', 'displayDate'),
+        optional('track_keys', 'trackKeys', []),
+        optional('release_date_iso', 'releaseDateISO'),
+        optional('hits', 'hits'),
+        optional('user_count', 'user_count'),
+        optional('users', 'users', convert=_to_result_list),
+        optional('is_compilation', 'isCompilation'),
+    )
+
+    references = {'tracks': 'track_keys'}
 
 class RdioTrack(RdioMusicObject):
     """Describes an Rdio track."""
 
-    def __init__(self, data):
-        super(RdioTrack, self).__init__(data)
-        self.album_name = data['album']
-        self.album_key = data['albumKey']
-        self.album_url = data['albumUrl']
-        self.album_artist_name = None
-        self.album_artist_key = None
-        if 'albumArtist' in data: self.album_artist_name = data['albumArtist']
-        if 'albumArtistKey' in data:
-            self.album_artist_key = data['albumArtistKey']
-        self.can_download = data['canDownload']
-        self.can_download_album_only = data['canDownloadAlbumOnly']
-        self.play_count = -1
-        self.track_number = -1
-        self.is_on_compilation = None
-        if 'trackNum' in data: self.track_number = data['trackNum']
-        if 'playCount' in data: self.play_count = data['playCount']
-        if 'isOnCompilation' in data:
-            self.is_on_compilation = data['isOnCompilation']
+    schema = (
+        required('album_name', 'album'),
+        required('album_key', 'albumKey'),
+        required('album_url', 'albumUrl'),
+        optional('album_artist_name', 'albumArtist'),
+        optional('album_artist_key', 'albumArtistKey'),
+        required('can_download', 'canDownload'),
+        required('can_download_album_only', 'canDownloadAlbumOnly'),
+        optional('play_count', 'playCount', -1),
+        optional('track_number', 'trackNum', -1),
+        optional('is_on_compilation', 'isOnCompilation'),
+    )
+
+    references = {'album': 'album_key', 'album_artist': 'album_artist_key'}
 
 class RdioPlaylist(RdioObject):
     """Describes an Rdio playlist."""
 
-    def __init__(self, data):
-        super(RdioPlaylist, self).__init__(data)
-        self.name = data['name']
-        self.track_count = data['length']
-        self.owner_name = data['owner']
-        self.owner_url = data['ownerUrl']
-        self.owner_key = data['ownerKey']
-        self.owner_icon = data['ownerIcon']
-        self.last_updated = datetime.fromtimestamp(
-            int(data['lastUpdated']))
-        self.short_url = data['shortUrl']
-        self.embed_url = data['embedUrl']
-        self.track_keys = []
-        self.description = None
-        if 'trackKeys' in data: self.track_keys = data['trackKeys']
-        if 'description' in data: self.description = data['description']
-        # process "tracks" if present
+    schema = (
+        required('name', 'name'),
+        required('track_count', 'length'),
+        required('owner_name', 'owner'),
+        required('owner_url', 'ownerUrl'),
+        required('owner_key', 'ownerKey'),
+        required('owner_icon', 'ownerIcon'),
+        required('last_updated', 'lastUpdated', _from_timestamp),
+        required('short_url', 'shortUrl'),
+        required('embed_url', 'embedUrl'),
+        optional('track_keys', 'trackKeys', []),
+        optional('description', 'description'),
+        optional('tracks', 'tracks', MISSING, _to_track_list),
+    )
+
+    # tracks is only loaded when Rdio didn't send them.
+    references = {'tracks': 'track_keys', 'owner': 'owner_key'}
+
+    def _post_decode(self, data):
+        # Populate track_keys from "tracks" if present
         if 'tracks' in data:
-            self.tracks = [RdioTrack(x) for x in data['tracks']]
-            # Populate track_keys
             self.track_keys = [x.key for x in self.tracks]
 
 class RdioUser(RdioObject):
     """Describes an Rdio user."""
 
-    def __init__(self, data):
-        super(RdioUser, self).__init__(data)
-        self.first_name = data['firstName']
-        self.last_name = data['lastName']
+    schema = (
+        required('first_name', 'firstName'),
+        required('last_name', 'lastName'),
+        required('library_version', 'libraryVersion'),
+        required('gender', 'gender', _to_gender),
+        required('gender_posessive', 'gender', _to_gender_posessive),
+        required('user_type', 'type'),
+        optional('username', 'username'),
+        optional('last_song_played', 'lastSongPlayed', convert=_to_track),
+        optional('display_name', 'displayName'),
+        optional('track_count', 'trackCount'),
+        optional('last_song_play_time', 'lastSongPlayTime',
+                 convert=_from_time_string),
+        optional('is_trial', 'isTrial'),
+        optional('is_subscriber', 'isSubscriber'),
+        optional('is_unlimited', 'isUnlimited'),
+        optional('heavy_rotation_key', 'heavyRotationKey'),
+        optional('network_heavy_rotation_key', 'networkHeavyRotationKey'),
+        optional('collection_key', 'collectionKey'),
+        optional('following_url', 'followingUrl'),
+        optional('collection_url', 'collectionUrl'),
+        optional('playlists_url', 'playlistsUrl'),
+        optional('followers_url', 'followersUrl'),
+    )
+
+    references = {'collection': 'collection_key'}
+
+    # Attributes set by _post_decode, and the fields they are built from.
+    derived = {'name': ('first_name', 'last_name')}
+
+    def _post_decode(self, data):
         self.name = self.get_full_name()
-        self.library_version = data['libraryVersion']
-        self.gender = rdio_genders[data['gender']][0]
-        self.gender_posessive = rdio_genders[data['gender']][1]
-        self.user_type = data['type']
-        self.username = None
-        self.last_song_played = None
-        self.display_name = None
-        self.track_count = None
-        self.last_song_play_time = None
-        self.is_trial = None
-        self.is_subscriber = None
-        self.is_unlimited = None
-        self.heavy_rotation_key = None
-        self.network_heavy_rotation_key = None
-        self.collection_key = None
-        self.following_url = None
-        self.collection_url = None
-        self.playlists_url = None
-        self.followers_url = None
-        if 'username' in data: self.username = data['username']
-        if 'lastSongPlayed' in data:
-            self.last_song_played = RdioTrack(data['lastSongPlayed'])
-        if 'displayName' in data: self.display_name = data['displayName']
-        if 'trackCount' in data: self.track_count = data['trackCount']
-        if 'lastSongPlayTime' in data:
-            self.last_song_play_time = datetime.strptime(
-				data['lastSongPlayTime'], TIME_FORMAT).replace(tzinfo=UTC)
-        if 'isTrial' in data: self.is_trial = data['isTrial']
-        if 'isSubscriber' in data: self.is_subscriber = data['isSubscriber']
-        if 'isUnlimited' in data: self.is_unlimited = data['isUnlimited']
-        if 'heavyRotationKey' in data:
-            self.heavy_rotation_key = data['heavyRotationKey']
-        if 'networkHeavyRotationKey' in data:
-            self.network_heavy_rotation_key = data['networkHeavyRotationKey']
-        if 'collectionKey' in data: self.collection_key = data['collectionKey']
-        if 'followingUrl' in data: self.following_url = data['followingUrl']
-        if 'collectionUrl' in data: self.collection_url = data['collectionUrl']
-        if 'playlistsUrl' in data: self.playlists_url = data['playlistsUrl']
-        if 'followersUrl' in data: self.followers_url = data['followersUrl']
 
     def get_full_url(self):
         return ROOT_SITE_URL + self.url
@@ -357,144 +518,325 @@ class RdioUser(RdioObject):
 class RdioSearchResult(JSONBasedObject):
     """Describes an Rdio search result and the extra fields it brings."""
 
-    def __init__(self, data):
-        super(RdioSearchResult, self).__init__(data)
-        self.album_count = data.get('album_count', 0)
-        self.artist_count = data.get('artist_count', 0)
-        self.number_results = data.get('number_results', 0)
-        self.person_count = data.get('person_count', 0)
-        self.playlist_count = data.get('playlist_count', 0)
-        self.track_count = data.get('track_count', 0)
-        self.results = parse_result_list(data.get('results', ''))
+    schema = (
+        optional('album_count', 'album_count', 0),
+        optional('artist_count', 'artist_count', 0),
+        optional('number_results', 'number_results', 0),
+        optional('person_count', 'person_count', 0),
+        optional('playlist_count', 'playlist_count', 0),
+        optional('track_count', 'track_count', 0),
+        optional('results', 'results', [], _to_result_list),
+    )
 
 class RdioActivityItem(JSONBasedObject):
     """Describes an item in Rdio's history object list."""
 
-    def __init__(self, data):
-        super(RdioActivityItem, self).__init__(data)
-        self.owner = RdioUser(data['owner'])
-        self.date = datetime.strptime(
-			data['date'], TIME_FORMAT).replace(tzinfo=UTC)
-        self.update_type_id = data['update_type']
-        self.update_type = rdio_activity_types[data['update_type']][0]
-        self._verbose_type = rdio_activity_types[data['update_type']][1]
+    schema = (
+        required('owner', 'owner', _to_user),
+        required('date', 'date', _from_time_string),
+        required('update_type_id', 'update_type'),
+        optional('albums', 'albums', [], _to_album_list),
+        optional('reviewed_item', 'reviewed_item', convert=_to_rdio_object),
+        optional('comment', 'comment', ''),
+    )
+
+    def _post_decode(self, data):
+        self.update_type = rdio_activity_types[self.update_type_id][0]
+        self._verbose_type = rdio_activity_types[self.update_type_id][1]
         if self.update_type_id in (0,10,12,):
             self.verbose_update_type = self._verbose_type % (
                 self.owner.name, self.owner.gender_posessive,)
         else: self.verbose_update_type = self._verbose_type % self.owner.name
-        self.albums = []
-        self.reviewed_item = None
-        self.comment = ''
         # gotta be a better way of storing the main subject object
         self.subject = None
-        if 'albums' in data:
-            for album in data['albums']:
-                self.albums.append(RdioAlbum(album))
-            self.subject = self.albums
-        if 'reviewed_item' in data:
-            self.reviewed_item = derive_rdio_type_from_data(
-                data['reviewed_item'])
-            self.subject = self.reviewed_item
-        if 'comment' in data:
-            self.comment = data['comment']
-            self.subject = self.comment
+        if 'albums' in data: self.subject = self.albums
+        if 'reviewed_item' in data: self.subject = self.reviewed_item
+        if 'comment' in data: self.subject = self.comment
 
 class RdioActivityStream(JSONBasedObject):
     """Describes a stream of history for a user, for public, etc."""
 
-    def __init__(self, data):
-        super(RdioActivityStream, self).__init__(data)
-        self.last_id = data['last_id']
-        self.user = RdioUser(data['user']) # public? everyone?
-        self.updates = []
-        if 'updates' in data:
-            for update in data['updates']:
-                self.updates.append(RdioActivityItem(update))
+    schema = (
+        required('last_id', 'last_id'),
+        required('user', 'user', _to_user), # public? everyone?
+        optional('updates', 'updates', [], _to_activity_item_list),
+    )
 
 class RdioPlaylistSet(JSONBasedObject):
     """Describes a set of playlists, owned, collaborated, and subscribed."""
 
-    def __init__(self, data):
-        super(RdioPlaylistSet, self).__init__(data)
-        self.owned_playlists = parse_result_list(data['owned'])
-        self.collaborated_playlists = parse_result_list(data['collab'])
-        self.subscribed_playlists = parse_result_list(data['subscribed'])
+    schema = (
+        required('owned_playlists', 'owned', _to_result_list),
+        required('collaborated_playlists', 'collab', _to_result_list),
+        required('subscribed_playlists', 'subscribed', _to_result_list),
+    )
 
 class RdioStation(RdioObject):
     """Describes basic fields for an Rdio Recommendation Station."""
 
-    def __init__(self, data):
-        super(RdioStation, self).__init__(data)
-        self.count = data['count']
-        self.length = data['length']
-        self.name = data['name']
-        self.reload_on_repeat = data['reloadOnRepeat']
-        self.tracks = data['tracks']
-        self.track_keys = None
-        if 'trackKeys' in data: self.track_keys = data['trackKeys']
+    schema = (
+        required('count', 'count'),
+        required('length', 'length'),
+        required('name', 'name'),
+        required('reload_on_repeat', 'reloadOnRepeat'),
+        required('tracks', 'tracks'),
+        optional('track_keys', 'trackKeys'),
+    )
 
 class RdioArtistStation(RdioStation):
     """Describes an artist recommendation station."""
 
-    def __init__(self, data):
-        super(RdioArtistStation, self).__init__(data)
-        self.artist_name = data['artistName']
-        self.artist_url = data['artistUrl']
-        self.has_radio = data['hasRadio']
-        self.short_url = data['shortUrl']
-        self.album_count = None
-        self.top_songs_key = None
-        self.radio_key = None
-        if 'albumCount' in data: self.album_count = data['albumCount']
-        if 'topSongsKey' in data: self.top_songs_key = data['topSongsKey']
-        if 'radioKey' in data: self.radio_key = data['radioKey']
+    schema = (
+        required('artist_name', 'artistName'),
+        required('artist_url', 'artistUrl'),
+        required('has_radio', 'hasRadio'),
+        required('short_url', 'shortUrl'),
+        optional('album_count', 'albumCount'),
+        optional('top_songs_key', 'topSongsKey'),
+        optional('radio_key', 'radioKey'),
+    )
 
 class RdioHeavyRotationStation(RdioStation):
     """Describes a user network (or global) heavy rotation station."""
 
-    def __init__(self, data):
-        super(RdioHeavyRotationStation, self).__init__(data)
-        self.user = data['user']
+    schema = (
+        required('user', 'user'),
+    )
 
 class RdioHeavyRotationUserStation(RdioStation):
     """Describes a user heavy rotation station."""
 
-    def __init__(self, data):
-        super(RdioHeavyRotationUserStation, self).__init__(data)
-        self.user = data['user']
+    schema = (
+        required('user', 'user'),
+    )
 
 class RdioArtistTopSongsStation(RdioStation):
     """Describes an artist station."""
 
-    def __init__(self, data):
-        super(RdioArtistTopSongsStation, self).__init__(data)
-        self.artist_name = data['artistName']
-        self.artist_url = data['artistUrl']
-        self.has_radio = data['hasRadio']
-        self.short_url = data['shortUrl']
-        self.album_count = None
-        self.top_songs_key = None
-        self.radio_key = None
-        if 'albumCount' in data: self.album_count = data['albumCount']
-        if 'topSongsKey' in data: self.top_songs_key = data['topSongsKey']
-        if 'radioKey' in data: self.radio_key = data['radioKey']
+    schema = (
+        required('artist_name', 'artistName'),
+        required('artist_url', 'artistUrl'),
+        required('has_radio', 'hasRadio'),
+        required('short_url', 'shortUrl'),
+        optional('album_count', 'albumCount'),
+        optional('top_songs_key', 'topSongsKey'),
+        optional('radio_key', 'radioKey'),
+    )
 
 class RdioUserCollectionStation(RdioStation):
     """Describes a user collection station."""
 
-    def __init__(self, data):
-        super(RdioUserCollectionStation, self).__init__(data)
-        self.user = data['user']
+    schema = (
+        required('user', 'user'),
+    )
+
+# Maps every code in rdio_types to the class that decodes it.
+rdio_registry = {
+    'a': RdioAlbum,
+    'al': RdioAlbum,
+    'r': RdioArtist,
+    'rl': RdioArtist,
+    'rr': RdioArtistStation,
+    'tr': RdioArtistTopSongsStation,
+    'h': RdioHeavyRotationStation,
+    'p': RdioPlaylist,
+    't': RdioTrack,
+    's': RdioUser,
+    'c': RdioUserCollectionStation,
+    'e': RdioHeavyRotationUserStation,
+}
+
+for _cls in (RdioObject, RdioArtist, RdioMusicObject, RdioAlbum, RdioTrack,
+             RdioPlaylist, RdioUser, RdioSearchResult, RdioActivityItem,
+             RdioActivityStream, RdioPlaylistSet, RdioStation,
+             RdioArtistStation, RdioHeavyRotationStation,
+             RdioHeavyRotationUserStation, RdioArtistTopSongsStation,
+             RdioUserCollectionStation):
+    compile_decoder(_cls)
+    for _attr, _key_attr in _cls.__dict__.get('references', {}).iteritems():
+        setattr(_cls, _attr, Reference(_attr, _key_attr,
+                                       many=_key_attr.endswith('_keys')))
+del _cls, _attr, _key_attr
+
+class Projection(object):
+    """Describes the model attributes a caller needs. Builds the extras that
+    ask Rdio for only those fields, and slim subclasses of every registered
+    model that decode only those attributes."""
+
+    def __init__(self, fields):
+        self.fields = frozenset(fields) | frozenset(['key'])
+        self.registry = {}
+        names = set()
+        projected = {}
+        for code, cls in rdio_registry.iteritems():
+            if cls not in projected:
+                projected[cls] = self._project(cls, names)
+            self.registry[code] = projected[cls]
+        # '-*' drops Rdio's default fields, so list everything we decode.
+        self.extras = ['-*', 'type'] + sorted(names - set(['type']))
+
+    def _project(self, cls, names):
+        derived = cls.__dict__.get('derived', {})
+        wanted = set(self.fields)
+        for attr in self.fields & set(derived):
+            wanted.update(derived[attr])
+        fields = [f for a, f in schema_fields(cls).iteritems() if a in wanted]
+        names.update(f.name for f in fields)
+        projected = type(cls.__name__, (cls,), {
+            '__module__': cls.__module__,
+            'projection': self})
+        return compile_decoder(projected, fields,
+                               post_decode=bool(self.fields & set(derived)))
+
+_projections = {}
+
+def project(fields):
+    """Returns the (cached) Projection for an iterable of attribute names."""
+    if isinstance(fields, Projection): return fields
+    # Every projection decodes 'key', so asking for it changes nothing.
+    fields = frozenset(fields) | frozenset(['key'])
+    if fields not in _projections:
+        _projections[fields] = Projection(fields)
+    return _projections[fields]
+
+# Define transports, which carry signed requests to the API.
+class HttpTransport(object):
+    """Sends requests over a single httplib2 connection. Not thread safe."""
+
+    def __init__(self, timeout=None):
+        self._http = httplib2.Http(timeout=timeout)
+
+    def request(self, url, body, headers):
+        """Posts body to url. Returns a (response, content) tuple."""
+        return self._http.request(url, HTTP_METHOD, body=body, headers=headers)
+
+class PooledHttpTransport(object):
+    """Shares up to size single-connection transports between threads.
+    Connections are opened only when every existing one is busy, so the
+    socket count follows the number of concurrent requests."""
+
+    def __init__(self, size=10, timeout=None, factory=None):
+        """Instantiates a new pool of connections.
+
+        Keyword arguments:
+        size    -- optional. The most connections to open.
+        timeout -- optional. The socket timeout of each connection.
+        factory -- optional. Makes a new single-connection transport;
+                   defaults to making an HttpTransport.
+
+        """
+        self.size = size
+        self.factory = factory or (lambda: HttpTransport(timeout))
+        self._idle = Queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+
+    def _acquire(self):
+        try: return self._idle.get_nowait()
+        except Queue.Empty: pass
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                return self.factory()
+        return self._idle.get()
+
+    def request(self, url, body, headers):
+        """Posts body to url. Returns a (response, content) tuple."""
+        transport = self._acquire()
+        try:
+            return transport.request(url, body, headers)
+        finally:
+            self._idle.put(transport)
+
+def sign_request(consumer, token, url, data):
+    """Returns the oAuth-signed form body for a POST of data to url.
+
+    Keyword arguments:
+    consumer -- the oauth.Consumer of the application.
+    token    -- the user's oauth.Token, or None.
+    url      -- the URL being posted to.
+    data     -- the dictionary of parameters to post.
+
+    """
+    body = urllib.urlencode(data)
+    request = oauth.Request.from_consumer_and_token(
+        consumer, token=token, http_method=HTTP_METHOD, http_url=url,
+        parameters=parse_qs(body), body=body, is_form_encoded=True)
+    request.sign_request(SIGNATURE_METHOD, consumer, token)
+    return request.to_postdata()
+
+class Credentials(namedtuple('Credentials', 'consumer token')):
+    """An immutable snapshot of the oAuth consumer and access token that
+    requests are signed with."""
+    __slots__ = ()
+
+_method_pattern = re.compile(r'(?:^|&)method=([^&]*)')
+
+def request_method(body):
+    """Returns the API method a signed request body calls, or None."""
+    match = _method_pattern.search(body or '')
+    return urllib.unquote(match.group(1)) if match else None
+
+class ApiCall(object):
+    """One call passing through an Api's middleware. Layers see the API
+    method, the params being posted and whether the call needs the user's
+    token; the raw response and content are set once the request is sent,
+    and the result once it is decoded."""
+    __slots__ = ('method', 'params', 'authenticated', 'decoder',
+                 'response', 'content', 'result')
+
+    def __init__(self, params, decoder=None, authenticated=False):
+        self.method = params['method']
+        self.params = params
+        self.authenticated = authenticated
+        self.decoder = decoder
+        self.response = self.content = self.result = None
+
+    def __repr__(self):
+        return '<ApiCall %s>' % self.method
+
+def compose(layers, send):
+    """Returns a function that passes an ApiCall through layers in order,
+    the first outermost, and then to send.
+
+    Each layer is called as layer(call, proceed) and returns the result.
+    It continues the call with proceed(call), and may change call.params
+    before or the result after; a layer that returns without calling
+    proceed ends the call there, and nothing after it runs.
+
+    """
+    def bind(layer, proceed):
+        return lambda call: layer(call, proceed)
+    for layer in reversed(layers): send = bind(layer, send)
+    return send
 
 # Here's the big kahuna.
 class Api(object):
-    """Handles communication with Rdio API."""
+    """Handles communication with Rdio API.
+
+    An Api can be shared between threads if its transport is thread safe,
+    such as the PooledHttpTransport it makes when given connections. The
+    credentials are one immutable snapshot that set_credentials and
+    authorize_with_verifier replace in a single assignment, so each call
+    signs with the snapshot it started with and no call takes a lock in
+    the Api itself."""
+
+    # Where API calls are posted; see __init__.
+    root_url = ROOT_URL
+    # The layers calls pass through, and them composed; see middleware.
+    _middleware = ()
+    _chain = None
 
     def __init__(self,
                  consumer_key=None,
                  consumer_secret=None,
                  access_token_key=None,
-                 access_token_secret=None):
+                 access_token_secret=None,
+                 transport=None,
+                 offloader=None,
+                 connections=None,
+                 root_url=None,
+                 middleware=None):
         """Instantiates a new Rdio API object.
 
         Keyword arguments:
@@ -502,9 +844,27 @@ class Api(object):
         consumer_secret     -- The oAuth API secret for the application.
         access_token_key    -- The oAuth user's token key.
         access_token_secret -- The oAuth user's token secret.
+        transport           -- optional. The transport API calls are sent
+                               through; defaults to a new HttpTransport.
+        offloader           -- optional. A DecodeOffloader that decodes large
+                               responses in other processes.
+        connections         -- optional. If given without a transport, calls
+                               go through a thread-safe PooledHttpTransport
+                               of up to this many connections.
+        root_url            -- optional. The URL to post API calls to,
+                               instead of ROOT_URL, such as a FakeRdioServer.
+        middleware          -- optional. The layers every call passes
+                               through, outermost first; see compose.
 
         """
-        # The only thing to do right now is to set credentials.
+        self._credentials = Credentials(None, None)
+        if transport is None:
+            if connections: transport = PooledHttpTransport(connections)
+            else: transport = HttpTransport()
+        self._transport = transport
+        self._offloader = offloader
+        if root_url: self.root_url = root_url
+        if middleware: self.middleware = middleware
         self.set_credentials(consumer_key=consumer_key,
                              consumer_secret=consumer_secret,
                              access_token_key=access_token_key,
@@ -522,21 +882,40 @@ class Api(object):
 
         """
 
+        consumer, token = self._credentials
         # Set our keys and secrets, depending on what was passed in.
         if consumer_key and consumer_secret:
             # Get our consumer object, which is just made of a key and secret
-            self._oauth_consumer     = oauth.Consumer(key=consumer_key,
-                                                      secret=consumer_secret)
-            # Get our client object, which is simply a consumer (un-authed)
-            self._oauth_client       = oauth.Client(self._oauth_consumer)
+            consumer = oauth.Consumer(key=consumer_key,
+                                      secret=consumer_secret)
         if access_token_key and access_token_secret:
             # Get our token object, which identifies us to the API for the user
             # Note: must check for access token when making authenticated calls
-            self._oauth_access_token = oauth.Token(key=access_token_key,
-                                                   secret=access_token_secret)
-            # Upgrade our client object to talk to the API on the user's behalf
-            self._oauth_client       = oauth.Client(self._oauth_consumer,
-                                                     self._oauth_access_token)
+            token = oauth.Token(key=access_token_key,
+                                secret=access_token_secret)
+        # Swap both in at once; calls in flight keep the snapshot they read.
+        self._credentials = Credentials(consumer, token)
+
+    @property
+    def middleware(self):
+        """The layers every call passes through, outermost first. Assigning
+        a new list swaps the whole chain at once, so calls in flight finish
+        with the layers they started with."""
+        return self._middleware
+
+    @middleware.setter
+    def middleware(self, layers):
+        layers = tuple(layers or ())
+        chain = compose(layers, self._send) if layers else None
+        self._middleware, self._chain = layers, chain
+
+    @property
+    def _oauth_consumer(self):
+        return self._credentials.consumer
+
+    @property
+    def _oauth_access_token(self):
+        return self._credentials.token
 
     def get_token_and_login_url(self, oauth_callback='oob'):
         """Gets the oAuth token via the oauth2 library.
@@ -547,9 +926,11 @@ class Api(object):
         #if oauth_callback is not defined, we're assuming you have a desktop application
         data = urllib.urlencode({'oauth_callback': oauth_callback})
         try:
-            # Get token and secret from Rdio's authorization endpoint.
-            response, content  = self._oauth_client.request(OAUTH_TOKEN_URL,
-                                                            HTTP_METHOD, data)
+            # Get token and secret from Rdio's authorization endpoint. The
+            # oauth.Client isn't thread safe, so each flow makes its own.
+            client = oauth.Client(self._credentials.consumer)
+            response, content  = client.request(OAUTH_TOKEN_URL,
+                                                HTTP_METHOD, data)
             # Make a dict out of it! Then, return dict.
             return dict(parse_qsl(content))
         except:
@@ -571,18 +952,18 @@ class Api(object):
             if not request_token:
                 raise RdioGenericAPIError("Must set token first.")
 
-            self._oauth_request_token = oauth.Token(key=request_token['oauth_token'],
-                                                    secret=request_token['oauth_token_secret'])
+            oauth_request_token = oauth.Token(key=request_token['oauth_token'],
+                                              secret=request_token['oauth_token_secret'])
             # Tell the token object to get verified.
-            self._oauth_request_token.set_verifier(oauth_verifier)
-            # Update our client object with our private token object.
-            # Don't do this in our set_credentials function as it's just for
-            # the request token, not the full access token.
-            self._oauth_client = oauth.Client(self._oauth_consumer,
-                                              self._oauth_request_token)
+            oauth_request_token.set_verifier(oauth_verifier)
+            # Make a client with our private token object, just for this
+            # request. Don't do this in our set_credentials function as it's
+            # just for the request token, not the full access token.
+            client = oauth.Client(self._credentials.consumer,
+                                  oauth_request_token)
             # Get our full-blown, shiny new access token.
-            response, content  = self._oauth_client.request(OAUTH_ACCESS_URL,
-                                                    HTTP_METHOD)
+            response, content  = client.request(OAUTH_ACCESS_URL,
+                                                HTTP_METHOD)
             parsed_content     = dict(parse_qsl(content))
             token              = parsed_content['oauth_token']
             token_secret       = parsed_content['oauth_token_secret']
@@ -599,34 +980,53 @@ class Api(object):
         except RdioGenericAPIError as e:
             print "API error: %s." % e.msg
 
-    def call_api_authenticated(self, data):
+    def call_api_authenticated(self, data, decoder=None):
         """Handles checking authentication before talking to the Rdio API.
 
         Keyword arguments:
-        data -- the dictionary of data for the call, including 'method' param.
+        data    -- the dictionary of data for the call, including 'method'
+                   param.
+        decoder -- optional. Turns the result into objects; see call_api.
 
         """
-        if not self._oauth_access_token:
+        if not self._credentials.token:
             raise RdioNotAuthenticatedException(data['method'])
-        else: return self.call_api(data)
+        else: return self.call_api(data, decoder, True)
 
-    def call_api(self, data):
+    def call_api(self, data, decoder=None, authenticated=False):
         """Calls the Rdio API. Responsible for handling errors from the API.
 
         Keyword arguments:
-        data -- the dictionary of data for the call, including 'method' param.
+        data          -- the dictionary of data for the call, including
+                         'method' param.
+        decoder       -- optional. A picklable callable that turns the
+                         result into objects. If given, None is returned for
+                         empty results.
+        authenticated -- optional. Whether the call needs the user's token,
+                         for middleware to see.
 
         """
-        data = urllib.urlencode(data)
-        response, content = self._oauth_client.request(ROOT_URL,
-                                                       HTTP_METHOD, data)
-        parsed_content = json.loads(content)
-        status = parsed_content['status']
-        if status == 'error':
-            raise RdioGenericAPIError(parsed_content['message'])
-            return None
-        elif status == 'ok':
-            return parsed_content['result']
+        chain = self._chain
+        call = ApiCall(data, decoder, authenticated)
+        result = chain(call) if chain else self._send(call)
+        loader = loader_scope.loader
+        if loader is not None and decoder: loader.register(result)
+        return result
+
+    def _send(self, call):
+        # The innermost layer: signs, posts and decodes.
+        consumer, token = self._credentials
+        body = sign_request(consumer, token, self.root_url, call.params)
+        call.response, content = self._transport.request(
+            self.root_url, body, {'Content-Type': FORM_CONTENT_TYPE})
+        call.content = content
+        decoder = call.decoder
+        offloader = self._offloader
+        if decoder and offloader and len(content) >= offloader.threshold:
+            call.result = offloader.decode(content, decoder)
+        else:
+            call.result = parse_response(content, decoder)
+        return call.result
 
     def add_friend(self, user):
         """Add a friend to the current user. Returns True if the add succeeds,
@@ -684,9 +1084,7 @@ class Api(object):
             'tracks': ','.join(tracks)}
 
         if extras: data['extras'] = ','.join(extras)
-        result = self.call_api_authenticated(data)
-
-        return RdioPlaylist(result) if result else None
+        return self.call_api_authenticated(data, RdioPlaylist)
 
     def current_user(self, extras=[]):
         """Gets information about the currently logged in user. Requires
@@ -699,8 +1097,7 @@ class Api(object):
         data = {'method': methods['current_user']}
 
         if extras: data['extras'] = ','.join(extras)
-        result = self.call_api_authenticated(data)
-        return RdioUser(result) if result else None
+        return self.call_api_authenticated(data, RdioUser)
 
     def delete_playlist(self, playlist):
         """Delete a playlist.
@@ -729,22 +1126,24 @@ class Api(object):
             else: raise RdioInvalidParameterException(
                 "Invalid email address: %s." % email)
         if vanity_name: data['vanityName'] = vanity_name
-        result = self.call_api(data)
-        return RdioUser(result) if result else None
+        return self.call_api(data, RdioUser)
 
-    def get(self, keys, extras=[]):
+    def get(self, keys, extras=[], fields=None):
         """Fetch one or more objects from Rdio.
 
         Keyword arguments:
         keys   -- a list of keys for the objects to fetch.
         extras -- optional. A list of additional fields to return.
+        fields -- optional. The attributes to decode; only the fields they
+                  need are requested.
 
         """
         data = {'method': methods['get'], 'keys': ','.join(keys)}
 
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
-        results = self.call_api(data)
-        return parse_result_dictionary(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_dictionary, fields=fields))
 
     def get_activity_stream(self, user, scope, last_id=None):
         """Get the activity events for a user, a user's friends, or everyone
@@ -768,11 +1167,10 @@ class Api(object):
                 scope, 'scope', 'get_activity_stream')
         else: raise RdioMissingArgumentError('scope','get_activity_stream')
         if last_id: data['last_id'] = last_id
-        results = self.call_api(data)
-        return RdioActivityStream(results) if results else None
+        return self.call_api(data, RdioActivityStream)
 
     def get_albums_for_artist(self, artist, featuring=False, extras=[],
-                              start=None, count=None):
+                              start=None, count=None, fields=None):
         """Returns the albums by (or featuring) an artist.
 
         Keyword arguments:
@@ -782,23 +1180,29 @@ class Api(object):
         extras      -- optional. A list of optional fields to return.
         start       -- optional. The offset of the first result to return.
         count       -- optional. The maximum number of results to return.
+        fields      -- optional. The attributes to decode; only the fields they
+                       need are requested.
 
         """
         data = {'method': methods['get_albums_for_artist'], 'artist': artist}
 
         if featuring: data['featuring'] = featuring
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
         if start: data['start'] = start
         if count: data['count'] = count
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
-    def get_albums_for_artist_in_collection(self, artist, user=None):
+    def get_albums_for_artist_in_collection(self, artist, user=None,
+                                            fields=None):
         """Returns the albums by an artist in a user's collection.
 
         Keyword arguments:
         artist  -- the key of the artist to retrieve albums for.
         user    -- optional. The owner of the collection to search.
+        fields  -- optional. The attributes to decode; only the fields they
+                   need are requested.
 
         """
         data = {
@@ -806,13 +1210,14 @@ class Api(object):
             'artist': artist}
 
         if user: data['user'] = user
+        if fields: data['extras'] = ','.join(project(fields).extras)
 
-        if user: results = self.call_api(data)
-        else: results = self.call_api_authenticated(data)
-        return parse_result_list(results) if results else None
+        decoder = partial(parse_result_list, fields=fields)
+        if user: return self.call_api(data, decoder)
+        else: return self.call_api_authenticated(data, decoder)
 
     def get_albums_in_collection(self, user=None, start=None, count=None,
-                                 sort=None, query=None):
+                                 sort=None, query=None, fields=None):
         """Returns the albums in a user's collection.
 
         Keyword arguments:
@@ -822,6 +1227,8 @@ class Api(object):
         sort    -- optional. Ways to sort the results. Valid options are
                    'dateAdded', 'playCount', 'artist', and 'name'.
         query   -- optional. The query to filter albums with.
+        fields  -- optional. The attributes to decode; only the fields they
+                   need are requested.
 
         """
         data = {'method': methods['get_albums_in_collection']}
@@ -835,12 +1242,13 @@ class Api(object):
             else: raise RdioInvalidParameterException(
                 sort, 'sort', 'get_albums_in_collection')
         if query: data['query'] = query
-        if user: results = self.call_api(data)
-        else: results = self.call_api_authenticated(data)
-        return parse_result_list(results) if results else None
+        if fields: data['extras'] = ','.join(project(fields).extras)
+        decoder = partial(parse_result_list, fields=fields)
+        if user: return self.call_api(data, decoder)
+        else: return self.call_api_authenticated(data, decoder)
 
     def get_artists_in_collection(self, user=None, start=None, count=None,
-                                  sort=None, query=None):
+                                  sort=None, query=None, fields=None):
         """Returns the albums in a user's collection.
 
         Keyword arguments:
@@ -850,6 +1258,8 @@ class Api(object):
         sort    -- optional. Ways to sort the results. Valid option is
                    'name' only.
         query   -- optional. The query to filter artists with.
+        fields  -- optional. The attributes to decode; only the fields they
+                   need are requested.
 
         """
         data = {'method': methods['get_artists_in_collection']}
@@ -863,9 +1273,10 @@ class Api(object):
             else: raise RdioInvalidParameterException(
                 sort, 'sort', 'get_artists_in_collection')
         if query: data['query'] = query
-        if user: results = self.call_api(data)
-        else: results = self.call_api_authenticated(data)
-        return parse_result_list(results) if results else None
+        if fields: data['extras'] = ','.join(project(fields).extras)
+        decoder = partial(parse_result_list, fields=fields)
+        if user: return self.call_api(data, decoder)
+        else: return self.call_api_authenticated(data, decoder)
 
     def get_heavy_rotation(self, user=None, object_type=None, friends=False,
                            limit=None):
@@ -891,11 +1302,10 @@ class Api(object):
                object_type, 'type', 'get_heavy_rotation')
        if friends: data['friends'] = friends
        if limit: data['limit'] = limit
-       results = self.call_api(data)
-       return parse_result_list(results) if results else None
+       return self.call_api(data, parse_result_list)
 
     def get_new_releases(self, time=None, start=None, count=False,
-                         extras=[]):
+                         extras=[], fields=None):
         """Returns new albums released across a timeframe.
 
         Keyword arguments:
@@ -904,6 +1314,8 @@ class Api(object):
         start    -- optional. The offset of the first result to return.
         count    -- optional. The maximum number of results to return.
         extras   -- optional. A list of additional fields to return.
+        fields   -- optional. The attributes to decode; only the fields they
+                    need are requested.
 
         """
         data = {'method': methods['get_new_releases']}
@@ -915,9 +1327,10 @@ class Api(object):
                 time, 'time', 'get_new_releases')
         if start: data['start'] = start
         if count: data['count'] = count
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
     def get_object_from_short_code(self, short_code):
         """Returns the object that the supplied Rdio short-code is a
@@ -931,8 +1344,7 @@ class Api(object):
             'method': methods['get_object_from_short_code'],
             'short_code': short_code}
 
-        result = self.call_api_authenticated(data)
-        return derive_rdio_type_from_data(result) if result else None
+        return self.call_api_authenticated(data, derive_rdio_type_from_data)
 
     def get_object_from_url(self, url):
         """Return the object that the supplied Rdio short-code is a
@@ -943,8 +1355,7 @@ class Api(object):
 
         """
         data = {'method': methods['get_object_from_url'], 'url': url}
-        result = self.call_api_authenticated(data)
-        return derive_rdio_type_from_data(result) if result else None
+        return self.call_api_authenticated(data, derive_rdio_type_from_data)
 
     def get_playback_token(self, domain=None):
         """Get a playback token. If you are using this for web playback, you
@@ -970,10 +1381,10 @@ class Api(object):
         data = {'method': methods['get_playlists']}
         if extras: data['extras'] = ','.join(extras)
 
-        results = self.call_api_authenticated(data)
-        return RdioPlaylistSet(results) if results else None
+        return self.call_api_authenticated(data, RdioPlaylistSet)
 
-    def get_top_charts(self, result_type, start=None, count=None, extras=[]):
+    def get_top_charts(self, result_type, start=None, count=None, extras=[],
+                       fields=None):
         """Return the site-wide most popular items for a given type.
 
         Keyword arguments:
@@ -982,6 +1393,8 @@ class Api(object):
         start       -- optional. The offset of the first result to return.
         count       -- optional. The maximum number of results to return.
         extras      -- optional. A list of additional fields to return.
+        fields      -- optional. The attributes to decode; only the fields they
+                       need are requested.
 
         """
         data = {'method': methods['get_top_charts']}
@@ -992,17 +1405,21 @@ class Api(object):
             result_type, 'result_type', 'get_top_charts')
         if start: data['start'] = start
         if count: data['count'] = count
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
-    def get_tracks_for_album_in_collection(self, album, user=None, extras=[]):
+    def get_tracks_for_album_in_collection(self, album, user=None, extras=[],
+                                           fields=None):
         """Which tracks on the given album are in the user's collection.
 
         Keyword arguments:
         album  -- the key of the album.
         user   -- optional. The user whose collection to examine.
         extras -- optional. A list of additional fields to return.
+        fields -- optional. The attributes to decode; only the fields they
+                  need are requested.
 
         """
         data = {
@@ -1010,12 +1427,13 @@ class Api(object):
             'album': album}
 
         if user: data['user'] = user
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
     def get_tracks_for_artist(self, artist, appears_on=None, extras=[],
-                              start=None, count=None):
+                              start=None, count=None, fields=None):
         """Get all of the tracks by this artist.
 
         Keyword arguments:
@@ -1025,25 +1443,30 @@ class Api(object):
         extras     -- optional. A list of additional fields to return.
         start      -- optional. The offset of the first result to return.
         count      -- optional. The maximum number of results to return.
+        fields     -- optional. The attributes to decode; only the fields they
+                      need are requested.
 
         """
         data = {'method': methods['get_tracks_for_artist'], 'artist': artist}
 
         if appears_on: data['appears_on'] = appears_on
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
         if start: data['start'] = start
         if count: data['count'] = count
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
     def get_tracks_for_artist_in_collection(self, artist, user=None,
-                                            extras=[]):
+                                            extras=[], fields=None):
         """Which tracks from the given artist are in the user's collection.
 
         Keyword arguments:
         artist -- the key of the artist.
         user   -- optional. The user whose collection to examine.
         extras -- optional. A list of additional fields to return.
+        fields -- optional. The attributes to decode; only the fields they
+                  need are requested.
 
         """
         data = {
@@ -1051,12 +1474,13 @@ class Api(object):
             'artist': artist}
 
         if user: data['user'] = user
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
     def get_tracks_in_collection(self, user=None, start=None, count=None,
-                                 sort=None, query=None):
+                                 sort=None, query=None, fields=None):
         """Get all of the tracks in the user's collection.
 
         Keyword arguments:
@@ -1066,6 +1490,8 @@ class Api(object):
         sort  -- optional. Sort by. Valid values are "dateAdded", "playCount",
                  "artist", "album", and "name".
         query -- optional. Filter collection tracks by this.
+        fields -- optional. The attributes to decode; only the fields they
+                  need are requested.
 
         """
         data = {'method': methods['get_tracks_in_collection']}
@@ -1079,8 +1505,9 @@ class Api(object):
             else: raise RdioInvalidParameterException(
                 sort, 'sort', 'get_tracks_in_collection')
         if query: data['query'] = query
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        if fields: data['extras'] = ','.join(project(fields).extras)
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
     def remove_friend(self, user):
         """Remove a friend from the current user.
@@ -1150,23 +1577,25 @@ class Api(object):
         if extras: data['extras'] = ','.join(extras)
         if start: data['start'] = start
         if count: data['count'] = count
-        results = self.call_api(data)
-        return RdioSearchResult(results) if results else None
+        return self.call_api(data, RdioSearchResult)
 
-    def search_suggestions(self, query, extras=[]):
+    def search_suggestions(self, query, extras=[], fields=None):
         """Match the supplied prefix against artists, albums, tracks, and
         people in the Rdio system. Returns the first 10 matches.
 
         Keyword arguments:
         query  -- the search prefix.
         extras -- optional. A list of additional fields to return.
+        fields -- optional. The attributes to decode; only the fields they
+                  need are requested.
 
         """
         data = {'method': methods['search_suggestions'], 'query': query}
 
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
     def set_playlist_collaborating(self, playlist, collaborating):
         """Start or stop collaborating on a playlist.
@@ -1238,7 +1667,8 @@ class Api(object):
 
         return self.call_api_authenticated(data)
 
-    def user_followers(self, user, start=None, count=None, extras=[]):
+    def user_followers(self, user, start=None, count=None, extras=[],
+                       fields=None):
         """Get a list of users following a user.
 
         Keyword arguments:
@@ -1246,18 +1676,22 @@ class Api(object):
         start -- optional. The offset of the first field to return.
         count -- optional. The max number of results to return.
         extras -- optional. A list of additional fields to return.
+        fields -- optional. The attributes to decode; only the fields they
+                  need are requested.
 
         """
 
         data = {'method': methods['user_followers'], 'user': user}
         if start: data['start'] = start
         if count: data['count'] = count
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
 
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
-    def user_following(self, user, start=None, count=None, extras=[]):
+    def user_following(self, user, start=None, count=None, extras=[],
+                       fields=None):
         """Get a list of users that a user follows.
 
         Keyword arguments:
@@ -1265,29 +1699,26 @@ class Api(object):
         start -- optional. The offset of the first field to return.
         count -- optional. The max number of results to return.
         extras -- optional. A list of additional fields to return.
+        fields -- optional. The attributes to decode; only the fields they
+                  need are requested.
 
         """
 
         data = {'method': methods['user_following'], 'user': user}
         if start: data['start'] = start
         if count: data['count'] = count
+        if fields: extras = project(fields).extras + list(extras)
         if extras: data['extras'] = ','.join(extras)
 
-        results = self.call_api(data)
-        return parse_result_list(results) if results else None
+        return self.call_api(data,
+            partial(parse_result_list, fields=fields))
 
 
 def derive_rdio_type_from_data(rdio_object):
-    if rdio_types[rdio_object['type']] == 'artist':
-        return RdioArtist(rdio_object)
-    if rdio_types[rdio_object['type']] == 'album':
-        return RdioAlbum(rdio_object)
-    if rdio_types[rdio_object['type']] == 'track':
-        return RdioTrack(rdio_object)
-    if rdio_types[rdio_object['type']] == 'playlist':
-        return RdioPlaylist(rdio_object)
-    if rdio_types[rdio_object['type']] == 'user':
-        return RdioUser(rdio_object)
+    """Decodes an object with the class registered for its type, or returns
+    None for unknown types."""
+    cls = rdio_registry.get(rdio_object['type'])
+    return _shared(cls, rdio_object) if cls else None
 
 
 def validate_email(email):
@@ -1301,17 +1732,44 @@ def validate_email(email):
     return 0
 
 
-def parse_result_dictionary(results):
-    """Takes a dictionary and returns a list of RdioObjects."""
-    objects = []
-    for rdio_object in results:
-        objects.append(derive_rdio_type_from_data(results[rdio_object]))
-    return objects
+def parse_response(content, decoder=None):
+    """Parses the body of an API response and returns its result, decoded
+    with decoder if one is given. Raises RdioGenericAPIError for errors."""
+    parsed_content = json.loads(content)
+    status = parsed_content['status']
+    if status == 'error':
+        raise RdioGenericAPIError(parsed_content['message'])
+    elif status == 'ok':
+        result = parsed_content['result']
+        if decoder is None: return result
+        return decode_response_result(decoder, result) if result else None
+
+
+def parse_result_dictionary(results, fields=None):
+    """Takes a dictionary and returns a list of RdioObjects. If fields is
+    given, only those attributes are decoded."""
+    return parse_result_list(results.itervalues(), fields)
 
 
-def parse_result_list(results):
-    """Takes a list and returns a list of RdioObjects."""
+def parse_result_list(results, fields=None):
+    """Takes a list and returns a list of RdioObjects. If fields is given,
+    only those attributes are decoded."""
+    if fields: lookup = project(fields).registry.get
+    else: lookup = rdio_registry.get
     objects = []
+    append = objects.append
+    shared = _identity_map.objects
     for rdio_object in results:
-        objects.append(derive_rdio_type_from_data(rdio_object))
+        cls = lookup(rdio_object['type'])
+        if cls is None:
+            append(None)
+        elif shared is None:
+            append(cls(rdio_object))
+        else:
+            # _shared, inlined since this is the hot path.
+            ref = (cls, rdio_object.get('key'))
+            obj = shared.get(ref)
+            if obj is None or obj._data != rdio_object:
+                obj = shared[ref] = cls(rdio_object)
+            append(obj)
     return objects
@@ -0,0 +1,172 @@
+"""Resolves many Rdio URLs and short-codes at once, concurrently and through
+a cache."""
+
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+import threading
+from urlparse import urlsplit
+
+from memory import cache_footprint
+
+SHORT_HOSTS = ('rd.io', 'www.rd.io')
+HOSTS = ('rdio.com', 'www.rdio.com')
+
+
+def normalize(item):
+    """Returns a ('short_code', code) or ('url', path) tuple for an Rdio URL,
+    short URL, path or bare short-code, or raises ValueError if item is none
+    of those."""
+    text = (item or '').strip()
+    if not text: raise ValueError("%r is not an Rdio URL or short-code." %
+                                  (item,))
+    if '://' not in text and text.split('/', 1)[0] in SHORT_HOSTS + HOSTS:
+        text = 'http://' + text
+    host, path = urlsplit(text)[1:3]
+    host = host.lower()
+    if host in SHORT_HOSTS:
+        parts = [part for part in path.split('/') if part]
+        if len(parts) == 2 and parts[0] == 'x':
+            return ('short_code', parts[1])
+    elif host in HOSTS or (not host and path.startswith('/')):
+        if path.strip('/'): return ('url', '/' + path.strip('/') + '/')
+    elif not host and '/' not in text.strip('/'):
+        return ('short_code', text.strip('/'))
+    raise ValueError("%r is not an Rdio URL or short-code." % (item,))
+
+
+class Resolution(object):
+    """The outcome of resolving one input: the object it names (None if Rdio
+    doesn't know it), or the error that stopped it resolving."""
+
+    def __init__(self, item, target=None, obj=None, error=None):
+        self.item = item
+        self.target = target
+        self.object = obj
+        self.error = error
+
+    def __repr__(self):
+        return '<Resolution %r: %r>' % (self.item, self.error or self.object)
+
+
+class BulkResolver(object):
+    """Resolves URLs and short-codes in bulk. Inputs are normalized and
+    deduplicated, looked up in an LRU cache of earlier resolutions, and the
+    misses are resolved concurrently by at most concurrency threads."""
+
+    def __init__(self, api, concurrency=8, cache_size=10000, chunk_size=100):
+        """Instantiates a new resolver.
+
+        Keyword arguments:
+        api         -- the Api to resolve with.
+        concurrency -- optional. The most requests in flight at once.
+        cache_size  -- optional. How many resolutions to remember.
+        chunk_size  -- optional. The most keys per get call when hydrating.
+
+        """
+        self.api = api
+        self.cache_size = cache_size
+        self.chunk_size = chunk_size
+        self.hits = 0
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._pool = ThreadPool(concurrency)
+
+    def close(self):
+        """Stops the worker threads."""
+        self._pool.close()
+        self._pool.join()
+
+    def _cached(self, target):
+        with self._lock:
+            if target not in self._cache:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            obj = self._cache.pop(target)
+            self._cache[target] = obj
+            return True, obj
+
+    def _remember(self, target, obj):
+        with self._lock:
+            self._cache.pop(target, None)
+            self._cache[target] = obj
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def memory_usage(self):
+        """Returns the footprint of the remembered resolutions; see
+        rdio.memory.cache_footprint."""
+        with self._lock: objects = self._cache.values()
+        return cache_footprint(objects)
+
+    def _fetch(self, target):
+        kind, value = target
+        try:
+            if kind == 'short_code':
+                obj = self.api.get_object_from_short_code(value)
+            else:
+                obj = self.api.get_object_from_url(value)
+        except Exception as e:
+            return target, None, e
+        self._remember(target, obj)
+        return target, obj, None
+
+    def resolve(self, items, extras=None):
+        """Resolves items, returning a Resolution for each in the same order.
+
+        Keyword arguments:
+        items  -- an iterable of Rdio URLs, short URLs, paths and
+                  short-codes.
+        extras -- optional. A list of additional fields; if given, the
+                  resolved objects are re-fetched with them in batched get
+                  calls.
+
+        """
+        results = []
+        outcomes = {}
+        misses = []
+        for item in items:
+            try:
+                target = normalize(item)
+            except ValueError as e:
+                results.append(Resolution(item, error=e))
+                continue
+            results.append(Resolution(item, target))
+            if target in outcomes: continue
+            found, obj = self._cached(target)
+            outcomes[target] = (obj, None)
+            if not found: misses.append(target)
+        for target, obj, error in self._pool.imap_unordered(self._fetch,
+                                                            misses):
+            outcomes[target] = (obj, error)
+        if extras: self._hydrate(outcomes, extras)
+        for result in results:
+            if result.target:
+                result.object, result.error = outcomes[result.target]
+        return results
+
+    def _get(self, keys, extras):
+        # Api.get returns a list, which is keyed here for _hydrate.
+        try:
+            objects = self.api.get(keys, extras=extras) or []
+        except Exception as e:
+            return keys, {}, e
+        return keys, dict((obj.key, obj) for obj in objects
+                          if obj is not None), None
+
+    def _hydrate(self, outcomes, extras):
+        keys = list(OrderedDict.fromkeys(
+            obj.key for obj, error in outcomes.itervalues() if obj))
+        chunks = [keys[i:i + self.chunk_size]
+                  for i in range(0, len(keys), self.chunk_size)]
+        hydrated = {}
+        errors = {}
+        for chunk, objects, error in self._pool.imap_unordered(
+                lambda chunk: self._get(chunk, extras), chunks):
+            hydrated.update(objects)
+            if error: errors.update(dict.fromkeys(chunk, error))
+        for target, (obj, error) in outcomes.items():
+            if obj:
+                outcomes[target] = (hydrated.get(obj.key, obj),
+                                    errors.get(obj.key))
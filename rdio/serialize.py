@@ -0,0 +1,348 @@
+"""A compact binary encoding for decoded model objects, for passing them
+between processes, or keeping them in caches and on disk, in a fraction of
+the bytes pickle takes. It is pure Python, so dump and load are somewhat
+slower than cPickle's; use it where bytes cost more than CPU time, not to
+make serialization faster. bench/serialize_bench.py compares the two.
+
+Each dump is one batch. Every string in it is stored once, in a table at
+the front, and referred to by index. Every object is written as a shape (its
+class and attribute names, also stored once per batch) followed by its
+values, so attribute names are never repeated. An object that appears twice
+in a batch is written once and referred back to. The raw _data is not
+carried; loaded objects have it set to None, like those rebuilt by
+DecodeOffloader.
+
+The body is a stream of varint tokens, each a value kind in the low three
+bits and a payload above them:
+
+    string    index into the string table
+    integer   zigzag-encoded value
+    constant  0 for None, 1 for False, 2 for True
+    object    shape index, followed by one value per attribute
+    reference index of an object written earlier in the batch
+    list      length, followed by the items
+    dict      length, followed by the keys and values
+    extended  0 float (then its repr as a string), 1 naive datetime,
+              2 UTC datetime (then the day ordinal, second of the day and
+              microsecond), 3 timedelta (then days, seconds and
+              microseconds), 4 tuple (then a list)"""
+
+from datetime import datetime, timedelta
+from itertools import chain, izip
+from operator import itemgetter
+
+from rdio import UTC, JSONBasedObject, project
+
+MAGIC = 'RDB1'
+
+_STRING, _INTEGER, _CONSTANT, _OBJECT, _REFERENCE, _LIST, _DICT, \
+    _EXTENDED = range(8)
+_FLOAT, _DATETIME, _UTC_DATETIME, _TIMEDELTA, _TUPLE = range(5)
+
+_NONE = _CONSTANT
+_FALSE = 1 << 3 | _CONSTANT
+_TRUE = 2 << 3 | _CONSTANT
+_constants = (None, False, True)
+
+
+def _varint(n):
+    chunks = []
+    while n >= 0x80:
+        chunks.append(chr(n & 0x7f | 0x80))
+        n >>= 7
+    chunks.append(chr(n))
+    return ''.join(chunks)
+
+
+# Most tokens are small, so their encodings are looked up rather than built:
+# directly below 2 ** 14, and as a first byte plus the rest below 2 ** 21.
+_varints = [_varint(n) for n in range(1 << 14)]
+_low_bytes = [chr(n | 0x80) for n in range(0x80)]
+
+
+def _classes(cls=JSONBasedObject):
+    classes = {cls.__name__: cls}
+    for subclass in cls.__subclasses__():
+        if 'projection' not in subclass.__dict__:
+            classes.update(_classes(subclass))
+    return classes
+
+
+class _Encoder(object):
+
+    def __init__(self):
+        self.strings = {}
+        self.unicodes = {}
+        self.string_list = []
+        self.shapes = {}
+        self.shape_list = []
+        self.objects = {}
+        self.tokens = []
+
+    def string(self, value):
+        # Keep str and unicode apart, since 'a' == u'a'.
+        strings = self.unicodes if type(value) is unicode else self.strings
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(self.string_list)
+            self.string_list.append(value)
+        return index
+
+    def shape(self, obj):
+        # Objects decoded alike have their attributes in the same order, so
+        # the unsorted names are enough to find the shape.
+        attrs = obj.__dict__
+        key = (type(obj), tuple(attrs))
+        shape = self.shapes.get(key)
+        if shape is None:
+            cls = type(obj)
+            names = tuple(name for name in attrs if name != '_data')
+            if len(names) == 1: getter = lambda attrs: (attrs[names[0]],)
+            elif names: getter = itemgetter(*names)
+            else: getter = lambda attrs: ()
+            shape = self.shapes[key] = (len(self.shape_list), getter)
+            projection = getattr(cls, 'projection', None)
+            self.shape_list.append((
+                self.string(cls.__name__),
+                [self.string(field) for field in
+                 sorted(projection.fields)] if projection else [],
+                [self.string(name) for name in names]))
+        return shape
+
+    def values(self, values):
+        # Strings, constants and small integers are by far the most common
+        # values, so they are handled inline.
+        append = self.tokens.append
+        strings = self.strings
+        unicodes = self.unicodes
+        for value in values:
+            kind = type(value)
+            if kind is unicode:
+                index = unicodes.get(value)
+                if index is None: index = self.string(value)
+                append(index << 3)
+            elif kind is str:
+                index = strings.get(value)
+                if index is None: index = self.string(value)
+                append(index << 3)
+            elif value is None:
+                append(_NONE)
+            elif kind is bool:
+                append(_TRUE if value else _FALSE)
+            elif kind is int and value >= 0:
+                append(value << 4 | _INTEGER)
+            else:
+                self.value(value)
+
+    def value(self, value):
+        tokens = self.tokens
+        kind = type(value)
+        if kind is str or kind is unicode:
+            tokens.append(self.string(value) << 3)
+        elif value is None:
+            tokens.append(_NONE)
+        elif kind is bool:
+            tokens.append(_TRUE if value else _FALSE)
+        elif kind is int or kind is long:
+            tokens.append((value << 1 if value >= 0 else ~value << 1 | 1)
+                          << 3 | _INTEGER)
+        elif kind is list:
+            tokens.append(len(value) << 3 | _LIST)
+            self.values(value)
+        elif isinstance(value, JSONBasedObject):
+            index = self.objects.get(id(value))
+            if index is not None:
+                tokens.append(index << 3 | _REFERENCE)
+                return
+            self.objects[id(value)] = len(self.objects)
+            shape, getter = self.shape(value)
+            tokens.append(shape << 3 | _OBJECT)
+            self.values(getter(value.__dict__))
+        elif kind is dict:
+            tokens.append(len(value) << 3 | _DICT)
+            self.values(chain.from_iterable(value.iteritems()))
+        elif kind is float:
+            tokens.append(_FLOAT << 3 | _EXTENDED)
+            self.value(repr(value))
+        elif kind is datetime:
+            if value.tzinfo is None:
+                tokens.append(_DATETIME << 3 | _EXTENDED)
+            elif value.utcoffset() == timedelta(0):
+                tokens.append(_UTC_DATETIME << 3 | _EXTENDED)
+            else:
+                raise TypeError("Can't dump %r; only naive and UTC "
+                                "datetimes are supported." % (value,))
+            self.values((value.toordinal(), value.hour * 3600 +
+                         value.minute * 60 + value.second,
+                         value.microsecond))
+        elif kind is timedelta:
+            tokens.append(_TIMEDELTA << 3 | _EXTENDED)
+            self.value(value.days)
+            self.values((value.seconds, value.microseconds))
+        elif kind is tuple:
+            tokens.append(_TUPLE << 3 | _EXTENDED)
+            self.value(list(value))
+        else:
+            raise TypeError("Can't dump %r." % (value,))
+
+    def output(self):
+        varints = _varints
+        chunks = [MAGIC, _varint(len(self.string_list))]
+        append = chunks.append
+        for value in self.string_list:
+            if type(value) is unicode:
+                value = value.encode('utf-8')
+                header = len(value) << 1 | 1
+            else:
+                header = len(value) << 1
+            append(varints[header] if header < 0x4000 else _varint(header))
+            append(value)
+        chunks.append(_varint(len(self.shape_list)))
+        for name, fields, attrs in self.shape_list:
+            chunks.append(_varint(name))
+            for refs in (fields, attrs):
+                chunks.append(_varint(len(refs)))
+                chunks.extend(_varint(ref) for ref in refs)
+        low = _low_bytes
+        chunks.extend([varints[token] if token < 0x4000 else
+                       low[token & 0x7f] + varints[token >> 7]
+                       if token < 0x200000 else _varint(token)
+                       for token in self.tokens])
+        return ''.join(chunks)
+
+
+def dump(value):
+    """Encodes a model object, or a list, dict or tuple of them, nested as
+    deeply as needed, and returns the encoded string."""
+    encoder = _Encoder()
+    encoder.value(value)
+    return encoder.output()
+
+
+_class_names = None
+_projected = {}
+
+
+def _shape_class(name, fields):
+    global _class_names
+    if fields:
+        key = (name, tuple(fields))
+        if key not in _projected:
+            _projected[key] = [
+                cls for cls in project(fields).registry.itervalues()
+                if cls.__name__ == name][0]
+        return _projected[key]
+    if _class_names is None or name not in _class_names:
+        _class_names = _classes()
+    return _class_names[name]
+
+
+class _Decoder(object):
+
+    def __init__(self, data):
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError("Not a dump of model objects.")
+        self.data = data
+        self.position = len(MAGIC)
+        strings = self.strings = []
+        for i in xrange(self.varint()):
+            header = self.varint()
+            end = self.position + (header >> 1)
+            value = data[self.position:end]
+            strings.append(value.decode('utf-8') if header & 1 else value)
+            self.position = end
+        self.shapes = []
+        for i in xrange(self.varint()):
+            name = strings[self.varint()]
+            fields = [strings[self.varint()] for j in xrange(self.varint())]
+            attrs = [strings[self.varint()] for j in xrange(self.varint())]
+            self.shapes.append((_shape_class(name, fields), attrs))
+        self.objects = []
+        self.tokens = iter(self._tokens()).next
+
+    def varint(self):
+        data = self.data
+        n = shift = 0
+        while True:
+            byte = ord(data[self.position])
+            self.position += 1
+            n |= (byte & 0x7f) << shift
+            if byte < 0x80: return n
+            shift += 7
+
+    def _tokens(self):
+        tokens = []
+        append = tokens.append
+        n = shift = 0
+        for byte in bytearray(buffer(self.data, self.position)):
+            if byte < 0x80:
+                append(n | byte << shift)
+                n = shift = 0
+            else:
+                n |= (byte & 0x7f) << shift
+                shift += 7
+        return tokens
+
+    def values(self, count):
+        next_token = self.tokens
+        strings = self.strings
+        values = []
+        append = values.append
+        for i in xrange(count):
+            token = next_token()
+            kind = token & 7
+            if kind == _STRING:
+                append(strings[token >> 3])
+            elif kind == _CONSTANT:
+                append(_constants[token >> 3])
+            elif kind == _INTEGER:
+                payload = token >> 3
+                append(~(payload >> 1) if payload & 1 else payload >> 1)
+            else:
+                append(self.value(token))
+        return values
+
+    def value(self, token=None):
+        if token is None: token = self.tokens()
+        kind = token & 7
+        payload = token >> 3
+        if kind == _OBJECT:
+            cls, names = self.shapes[payload]
+            obj = cls.__new__(cls)
+            self.objects.append(obj)
+            obj.__dict__ = dict(izip(names, self.values(len(names))))
+            obj._data = None
+            return obj
+        if kind == _LIST:
+            return self.values(payload)
+        if kind == _REFERENCE:
+            return self.objects[payload]
+        if kind == _STRING:
+            return self.strings[payload]
+        if kind == _CONSTANT:
+            return _constants[payload]
+        if kind == _INTEGER:
+            return ~(payload >> 1) if payload & 1 else payload >> 1
+        if kind == _DICT:
+            items = self.values(2 * payload)
+            return dict(izip(items[::2], items[1::2]))
+        if payload == _FLOAT:
+            return float(self.value())
+        if payload == _DATETIME or payload == _UTC_DATETIME:
+            ordinal, seconds, microsecond = self.values(3)
+            date = datetime.fromordinal(ordinal).replace(
+                hour=seconds // 3600, minute=seconds // 60 % 60,
+                second=seconds % 60, microsecond=microsecond)
+            if payload == _UTC_DATETIME: date = date.replace(tzinfo=UTC)
+            return date
+        if payload == _TIMEDELTA:
+            return timedelta(*self.values(3))
+        if payload == _TUPLE:
+            return tuple(self.value())
+        raise ValueError("Unknown token %r." % (token,))
+
+
+def load(data):
+    """Decodes a string made by dump. Model objects are rebuilt without
+    calling their decoders, with _data set to None."""
+    return _Decoder(data).value()
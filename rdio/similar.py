@@ -0,0 +1,168 @@
+"""Finds similar artists from which artists turn up in the same users'
+collections, without calling the API once the collections are crawled."""
+
+from array import array
+from collections import defaultdict
+import heapq
+from itertools import imap
+from math import sqrt
+from multiprocessing.pool import ThreadPool
+
+
+def _key(obj):
+    return intern(str(getattr(obj, 'key', obj)))
+
+
+class ArtistSimilarity(object):
+    """A sparse user by artist matrix, kept as a row of artist ids per user
+    and a column of user ids per artist, with keys interned to ids once.
+
+    Similarity is never computed for all pairs: the co-occurrence of one
+    artist with every other is the sum of the rows of the users in its
+    column, which only touches the collections that contain it. Cosine
+    similarity divides that by the square root of both artists' user
+    counts."""
+
+    def __init__(self):
+        self.user_keys = []
+        self.artist_keys = []
+        self._user_ids = {}
+        self._artist_ids = {}
+        self._rows = []
+        self._columns = []
+
+    def __len__(self):
+        """Returns the number of user-artist pairs."""
+        return sum(imap(len, self._rows))
+
+    def add(self, user, artists):
+        """Adds artists to a user's collection.
+
+        Keyword arguments:
+        user    -- the user, or their key.
+        artists -- the RdioArtists in the collection, or their keys.
+
+        """
+        user = _key(user)
+        user_id = self._user_ids.get(user)
+        if user_id is None:
+            user_id = self._user_ids[user] = len(self.user_keys)
+            self.user_keys.append(user)
+            self._rows.append(array('i'))
+        row = self._rows[user_id]
+        seen = set(row)
+        artist_ids = self._artist_ids
+        for artist in artists:
+            artist = _key(artist)
+            artist_id = artist_ids.get(artist)
+            if artist_id is None:
+                artist_id = artist_ids[artist] = len(self.artist_keys)
+                self.artist_keys.append(artist)
+                self._columns.append(array('i'))
+            if artist_id in seen: continue
+            seen.add(artist_id)
+            row.append(artist_id)
+            self._columns[artist_id].append(user_id)
+
+    def fans(self, artist):
+        """Returns the number of users with artist in their collection."""
+        artist_id = self._artist_ids.get(_key(artist))
+        return 0 if artist_id is None else len(self._columns[artist_id])
+
+    def _counts(self, artist):
+        # The artist's column of the co-occurrence matrix, by artist id.
+        artist_id = self._artist_ids.get(_key(artist))
+        if artist_id is None: return None, {}
+        counts = defaultdict(int)
+        rows = self._rows
+        for user_id in self._columns[artist_id]:
+            for other in rows[user_id]: counts[other] += 1
+        del counts[artist_id]
+        return artist_id, counts
+
+    def co_occurrence(self, artist):
+        """Returns a dictionary of how many users have both artist and each
+        other artist in their collections, by artist key."""
+        artist_id, counts = self._counts(artist)
+        keys = self.artist_keys
+        return dict((keys[other], count)
+                    for other, count in counts.iteritems())
+
+    def similar(self, artist, k=10, min_fans=1):
+        """Returns up to k (artist key, cosine similarity) pairs for the
+        artists most similar to artist, most similar first. Artists no one
+        else has collected have none.
+
+        Keyword arguments:
+        artist   -- the RdioArtist, or its key.
+        k        -- optional. The most similar artists to return.
+        min_fans -- optional. Leaves out artists fewer users have, whose
+                    similarity rests on too few collections to trust.
+
+        """
+        artist_id, counts = self._counts(artist)
+        if artist_id is None: return []
+        columns = self._columns
+        norm = sqrt(len(columns[artist_id]))
+        scores = ((count / (norm * sqrt(len(columns[other]))), other)
+                  for other, count in counts.iteritems()
+                  if len(columns[other]) >= min_fans)
+        keys = self.artist_keys
+        return [(keys[other], score)
+                for score, other in heapq.nlargest(k, scores)]
+
+    @classmethod
+    def crawl(cls, api, user, depth=1, limit=None, page_size=1000,
+              concurrency=8):
+        """Builds a matrix from the collections of user and the users they
+        follow, and the users those follow, to depth.
+
+        Keyword arguments:
+        api         -- the Api to fetch with.
+        user        -- the key of the user to start from.
+        depth       -- optional. How many follows away to crawl.
+        limit       -- optional. The most collections to crawl.
+        page_size   -- optional. How many objects to fetch per call.
+        concurrency -- optional. The most requests in flight at once.
+
+        """
+        def collection(user):
+            artists = []
+            while True:
+                page = api.get_artists_in_collection(
+                    user=user, start=len(artists), count=page_size) or []
+                artists.extend(page)
+                if len(page) < page_size: return user, artists
+
+        def following(user):
+            users = []
+            while True:
+                page = api.user_following(
+                    user, start=len(users), count=page_size) or []
+                users.extend(page)
+                if len(page) < page_size: return users
+
+        matrix = cls()
+        seen = set([user])
+        frontier = [user]
+        pool = ThreadPool(concurrency)
+        try:
+            for level in range(depth + 1):
+                if limit: frontier = frontier[:limit - len(matrix.user_keys)]
+                for found, artists in pool.imap_unordered(collection,
+                                                          frontier):
+                    matrix.add(found, artists)
+                if level == depth or (limit and
+                                      len(matrix.user_keys) >= limit):
+                    break
+                next_frontier = []
+                for users in pool.imap(following, frontier):
+                    for followed in users:
+                        if followed.key not in seen:
+                            seen.add(followed.key)
+                            next_frontier.append(followed.key)
+                frontier = next_frontier
+        finally:
+            pool.close()
+            pool.join()
+        return matrix
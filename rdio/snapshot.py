@@ -0,0 +1,177 @@
+"""A read-only catalog snapshot file that many processes can share through
+mmap. Records are found by key through an on-disk hash table and decoded
+into model objects only when they are looked up.
+
+The file is a header, the records, then the table:
+
+    header  magic 'RDS1', slot count (uint32), record count (uint64) and
+            table offset (uint64)
+    record  key length (uint16), key, JSON length (uint32), JSON
+    slot    crc32 of the key (uint32), record offset (uint64); a zero offset
+            marks an empty slot
+
+The table uses linear probing and is kept at most half full."""
+
+from array import array
+from itertools import izip
+import json
+import mmap
+import struct
+import zlib
+
+from rdio import derive_rdio_type_from_data
+
+MAGIC = 'RDS1'
+
+_header = struct.Struct('>4sIQQ')
+_slot = struct.Struct('>IQ')
+_key_length = struct.Struct('>H')
+_data_length = struct.Struct('>I')
+
+
+def _hash(key):
+    return zlib.crc32(key) & 0xffffffff
+
+
+def _encode_key(key):
+    return key.encode('utf-8') if isinstance(key, unicode) else key
+
+
+def write_snapshot(path, objects):
+    """Writes a snapshot of objects to path and returns how many were
+    written. Keys should be unique; only the first of a repeated key can be
+    looked up.
+
+    Keyword arguments:
+    path    -- the file to write.
+    objects -- an iterable of model objects or raw API dictionaries, such
+               as RdioTracks, RdioAlbums and RdioArtists. It is read once,
+               so it may be a generator.
+
+    """
+    # Only the hashes and offsets are kept in memory, as compact arrays.
+    hashes = array('I')
+    offsets = array('L')
+    with open(path, 'wb') as snapshot:
+        snapshot.write(_header.pack(MAGIC, 0, 0, 0))
+        offset = _header.size
+        for obj in objects:
+            data = obj if isinstance(obj, dict) else obj._data
+            if data is None:
+                raise ValueError("%r has no raw data to snapshot." % (obj,))
+            key = _encode_key(data['key'])
+            payload = json.dumps(data, separators=(',', ':'))
+            record = ''.join((_key_length.pack(len(key)), key,
+                              _data_length.pack(len(payload)), payload))
+            snapshot.write(record)
+            hashes.append(_hash(key))
+            offsets.append(offset)
+            offset += len(record)
+        slots = 1
+        while slots < 2 * len(hashes): slots *= 2
+        table = bytearray(slots * _slot.size)
+        mask = slots - 1
+        for key_hash, record_offset in izip(hashes, offsets):
+            i = key_hash & mask
+            while _slot.unpack_from(table, i * _slot.size)[1]:
+                i = (i + 1) & mask
+            _slot.pack_into(table, i * _slot.size, key_hash, record_offset)
+        snapshot.write(table)
+        snapshot.seek(0)
+        snapshot.write(_header.pack(MAGIC, slots, len(hashes), offset))
+    return len(hashes)
+
+
+class Snapshot(object):
+    """A read-only view of a snapshot file. The file is memory-mapped, so
+    every process that opens it shares one copy in the page cache, and only
+    the records looked up are ever decoded."""
+
+    def __init__(self, path):
+        """Opens a snapshot.
+
+        Keyword arguments:
+        path -- the snapshot file written by write_snapshot.
+
+        """
+        with open(path, 'rb') as snapshot:
+            self._map = mmap.mmap(snapshot.fileno(), 0,
+                                  access=mmap.ACCESS_READ)
+        magic, self._slots, self._count, self._table = _header.unpack_from(
+            self._map)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError("%s is not a snapshot." % (path,))
+
+    def close(self):
+        self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def _find(self, key):
+        # Returns the offset of the JSON of key's record, or None.
+        key = _encode_key(key)
+        key_hash = _hash(key)
+        mapped = self._map
+        mask = self._slots - 1
+        i = key_hash & mask
+        while True:
+            slot_hash, offset = _slot.unpack_from(
+                mapped, self._table + i * _slot.size)
+            if not offset: return None
+            if slot_hash == key_hash:
+                length = _key_length.unpack_from(mapped, offset)[0]
+                start = offset + _key_length.size
+                if mapped[start:start + length] == key:
+                    return start + length
+            i = (i + 1) & mask
+
+    def __contains__(self, key):
+        return self._find(key) is not None
+
+    def raw(self, key):
+        """Returns the JSON of key's record, or None if it isn't here."""
+        offset = self._find(key)
+        if offset is None: return None
+        length = _data_length.unpack_from(self._map, offset)[0]
+        start = offset + _data_length.size
+        return self._map[start:start + length]
+
+    def get(self, key, default=None):
+        """Decodes and returns the object with key, or default."""
+        payload = self.raw(key)
+        if payload is None: return default
+        return derive_rdio_type_from_data(json.loads(payload))
+
+    def __getitem__(self, key):
+        obj = self.get(key)
+        if obj is None: raise KeyError(key)
+        return obj
+
+    def get_many(self, keys):
+        """Returns {key: object} for the keys that are here, leaving the
+        rest out. Unlike Api.get, which returns a list."""
+        objects = {}
+        for key in keys:
+            obj = self.get(key)
+            if obj is not None: objects[key] = obj
+        return objects
+
+    def keys(self):
+        """Yields every key in the order the records were written."""
+        mapped = self._map
+        offset = _header.size
+        while offset < self._table:
+            length = _key_length.unpack_from(mapped, offset)[0]
+            start = offset + _key_length.size
+            yield mapped[start:start + length]
+            offset = start + length
+            offset += _data_length.size + _data_length.unpack_from(
+                mapped, offset)[0]
@@ -0,0 +1,157 @@
+"""Playback queues for Rdio stations that keep upcoming tracks decoded ahead
+of time."""
+
+from collections import deque
+import threading
+import time
+
+from rdio import RdioStation, derive_rdio_type_from_data, rdio_registry
+
+
+class StationQueue(object):
+    """Hands out a station's tracks in order while a background thread keeps
+    up to lookahead fully decoded RdioTracks ready, fetching them with
+    batched Api.get calls. When the station runs out it repeats, reloading
+    it first if the station has reload_on_repeat set.
+
+    Works for any RdioStation: RdioArtistStation, RdioHeavyRotationStation,
+    RdioArtistTopSongsStation, RdioUserCollectionStation and so on."""
+
+    def __init__(self, api, station, lookahead=10, batch_size=None,
+                 extras=None, repeat=True):
+        """Instantiates a new queue and starts filling it.
+
+        Keyword arguments:
+        api        -- the Api to fetch tracks with.
+        station    -- the RdioStation to play.
+        lookahead  -- optional. How many decoded tracks to keep ready; at
+                      least 1.
+        batch_size -- optional. The most keys per get call; defaults to
+                      lookahead.
+        extras     -- optional. A list of additional track fields to fetch.
+        repeat     -- optional. If False, the queue ends with the station
+                      instead of starting over.
+
+        """
+        if not isinstance(station, RdioStation):
+            raise TypeError("%r is not a station." % (station,))
+        if lookahead < 1:
+            raise ValueError("lookahead must be at least 1, not %r."
+                             % (lookahead,))
+        self.api = api
+        self.station = station
+        self.lookahead = lookahead
+        self.batch_size = batch_size or lookahead
+        self.extras = extras or []
+        self.repeat = repeat
+        self.reloads = 0
+        self._ready = deque()
+        self._pending = deque(self._entries(station))
+        self._resolved = 0
+        self._finished = False
+        self._closed = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._fill)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __iter__(self):
+        return self
+
+    def next(self, timeout=None):
+        """Returns the next track, waiting for the background fetch if it is
+        behind. Returns None if timeout seconds pass first, and raises
+        StopIteration when the station is over."""
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            # Other consumers, close and the fill thread ending all wake
+            # waiters too, so each wakeup checks everything again.
+            while not self._ready:
+                if self._error: raise self._error
+                if self._finished or self._closed: raise StopIteration
+                if deadline is None:
+                    self._condition.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0: return None
+                self._condition.wait(remaining)
+            track = self._ready.popleft()
+            self._condition.notify_all()
+            return track
+
+    def close(self):
+        """Stops the background fetch."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def __len__(self):
+        """The number of tracks ready to play."""
+        return len(self._ready)
+
+    def _entries(self, station):
+        # Prefer track keys; fall back to "tracks", which may hold keys or
+        # full track data we can decode without a round trip.
+        if station.track_keys: return list(station.track_keys)
+        return list(station.tracks or [])
+
+    def _fill(self):
+        try:
+            while True:
+                # Refill once half the lookahead has been played, so gets
+                # are batched rather than one per played track.
+                with self._condition:
+                    while (not self._closed and
+                           len(self._ready) > self.lookahead // 2):
+                        self._condition.wait()
+                    if self._closed: return
+                    wanted = min(self.batch_size,
+                                 self.lookahead - len(self._ready))
+                if not self._pending and not self._restart(): break
+                batch = [self._pending.popleft()
+                         for i in range(min(wanted, len(self._pending)))]
+                tracks = self._resolve(batch)
+                self._resolved += len(tracks)
+                with self._condition:
+                    self._ready.extend(tracks)
+                    self._condition.notify_all()
+        except Exception as e:
+            with self._condition: self._error = e
+        with self._condition:
+            self._finished = True
+            self._condition.notify_all()
+
+    def _restart(self):
+        # Don't go round again if the last pass found nothing to play.
+        if not self.repeat or not self._resolved: return False
+        self._resolved = 0
+        station = self.station
+        if station.reload_on_repeat:
+            results = self.api.get([station.key],
+                                   extras=['trackKeys', 'tracks'])
+            if not results: return False
+            self.station = station = results[0]
+            self.reloads += 1
+        self._pending.extend(self._entries(station))
+        return bool(self._pending)
+
+    def _resolve(self, batch):
+        decoded = {}
+        keys = []
+        for entry in batch:
+            if isinstance(entry, dict):
+                if entry.get('type') in rdio_registry:
+                    decoded[entry['key']] = derive_rdio_type_from_data(entry)
+                else:
+                    keys.append(entry['key'])
+            else:
+                keys.append(entry)
+        if keys:
+            for track in self.api.get(keys, extras=self.extras) or []:
+                decoded[track.key] = track
+        ordered = []
+        for entry in batch:
+            key = entry['key'] if isinstance(entry, dict) else entry
+            if key in decoded: ordered.append(decoded[key])
+        return ordered
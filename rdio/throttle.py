@@ -0,0 +1,74 @@
+"""Limits how fast API calls are made."""
+
+import threading
+import time
+
+
+class RateLimiter(object):
+    """A token bucket that lets calls through at rate per second on average,
+    in bursts of up to burst. Safe to share between threads; waiting callers
+    are let through in the order they arrived."""
+
+    def __init__(self, rate, burst=1, clock=time.time, sleep=time.sleep):
+        """Instantiates a new limiter.
+
+        Keyword arguments:
+        rate  -- the calls allowed per second.
+        burst -- optional. How many calls may go through back to back.
+        clock -- optional. Returns the current time in seconds.
+        sleep -- optional. Waits for a number of seconds.
+
+        """
+        self.rate = float(rate)
+        self.burst = burst
+        self.clock = clock
+        self.sleep = sleep
+        self.waits = 0
+        self.waited = 0.0
+        self._tokens = float(burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Waits until a call may go through. Returns how long it waited."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(self.burst, self._tokens +
+                               (now - self._updated) * self.rate)
+            self._updated = now
+            # Take the token now, even if that leaves the bucket in debt,
+            # so later callers queue up behind this one.
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            if wait:
+                self.waits += 1
+                self.waited += wait
+        if wait: self.sleep(wait)
+        return wait
+
+    def available(self):
+        """Returns how many calls could go through now without waiting,
+        which is negative while callers are queued."""
+        with self._lock:
+            return min(self.burst, self._tokens +
+                       (self.clock() - self._updated) * self.rate)
+
+
+class ThrottledTransport(object):
+    """Wraps a transport so requests wait for a RateLimiter first."""
+
+    def __init__(self, transport, limiter):
+        """Instantiates a new throttled transport.
+
+        Keyword arguments:
+        transport -- the transport to pass requests to.
+        limiter   -- the RateLimiter to wait on.
+
+        """
+        self.transport = transport
+        self.limiter = limiter
+
+    def request(self, url, body, headers):
+        """Waits for the limiter, then posts body to url."""
+        self.limiter.acquire()
+        return self.transport.request(url, body, headers)
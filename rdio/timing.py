@@ -0,0 +1,94 @@
+"""Measures API calls per method: how many were made, how many failed, how
+long they took and how many bytes came back."""
+
+import threading
+import time
+
+from rdio import request_method
+
+
+def percentile(values, fraction):
+    """Returns the value at fraction (0 to 1) of the sorted values."""
+    if not values: return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+class CallTimes(object):
+    """Collects call latencies per API method. Safe to share between
+    transports and threads."""
+
+    def __init__(self):
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def record(self, method, seconds, size=0, error=False):
+        with self._lock:
+            calls = self._calls.setdefault(method, [[], 0, 0])
+            calls[0].append(seconds)
+            calls[1] += size
+            calls[2] += error
+
+    def report(self):
+        """Returns a dictionary of {method: {'calls', 'errors', 'bytes',
+        'total', 'mean', 'p50', 'p95', 'p99', 'max', 'rate'}}, with times in
+        seconds and rate in calls per second since the CallTimes was made.
+        """
+        elapsed = time.time() - self.started
+        with self._lock:
+            calls = dict((method, (list(latencies), size, errors))
+                         for method, (latencies, size, errors)
+                         in self._calls.iteritems())
+        report = {}
+        for method, (latencies, size, errors) in calls.iteritems():
+            total = sum(latencies)
+            report[method] = {
+                'calls': len(latencies), 'errors': errors, 'bytes': size,
+                'total': total, 'mean': total / len(latencies),
+                'p50': percentile(latencies, 0.5),
+                'p95': percentile(latencies, 0.95),
+                'p99': percentile(latencies, 0.99),
+                'max': max(latencies),
+                'rate': len(latencies) / elapsed if elapsed else 0.0}
+        return report
+
+    def summary(self):
+        """Returns the report as a table, one method per line."""
+        lines = ['%-28s %7s %6s %9s %9s %9s %9s' % (
+            'method', 'calls', 'errors', 'mean ms', 'p95 ms', 'max ms',
+            'calls/s')]
+        for method, stats in sorted(self.report().iteritems()):
+            lines.append('%-28s %7d %6d %9.1f %9.1f %9.1f %9.1f' % (
+                method, stats['calls'], stats['errors'],
+                stats['mean'] * 1000, stats['p95'] * 1000,
+                stats['max'] * 1000, stats['rate']))
+        return '\n'.join(lines)
+
+
+class TimingTransport(object):
+    """Wraps a transport and records every request in a CallTimes."""
+
+    def __init__(self, transport, times=None):
+        """Instantiates a new timing transport.
+
+        Keyword arguments:
+        transport -- the transport to pass requests to.
+        times     -- optional. The CallTimes to record in.
+
+        """
+        self.transport = transport
+        self.times = times or CallTimes()
+
+    def request(self, url, body, headers):
+        """Posts body to url through the wrapped transport, timing it."""
+        method = request_method(body)
+        start = time.time()
+        try:
+            response, content = self.transport.request(url, body, headers)
+        except Exception:
+            self.times.record(method, time.time() - start, error=True)
+            raise
+        self.times.record(method, time.time() - start, len(content),
+                          int(response.get('status', 200)) >= 400)
+        return response, content
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import json
+import os
+import tempfile
+import time
+import unittest
+import sys
+sys.path += ["../rdio"]
+from urlparse import parse_qs
+from rdio import Api, RdioGenericAPIError
+from cassette import CassetteMissError, RecordingTransport, ReplayTransport
+import fixtures
+
+RESULTS = {
+    'addFriend': True,
+    'addToCollection': True,
+    'addToPlaylist': True,
+    'createPlaylist': fixtures.playlist(),
+    'currentUser': fixtures.user(firstName=u'Bj\xf6rn'),
+    'deletePlaylist': True,
+    'findUser': fixtures.user(),
+    'get': {'t1': fixtures.track(), 'a1': fixtures.album()},
+    'getActivityStream': {'last_id': 9, 'user': fixtures.user(),
+                          'updates': [fixtures.activity()]},
+    'getAlbumsForArtist': [fixtures.album()],
+    'getAlbumsForArtistInCollection': [fixtures.album(type='al')],
+    'getAlbumsInCollection': [fixtures.album(type='al')],
+    'getArtistsInCollection': [fixtures.artist(type='rl')],
+    'getHeavyRotation': [fixtures.album(users=[fixtures.user()])],
+    'getNewReleases': [fixtures.album()],
+    'getObjectFromShortCode': fixtures.artist(),
+    'getObjectFromUrl': fixtures.station(),
+    'getPlaybackToken': 'GAlNi78J_____zlyYWs5ZG02N2pkaHlhcWsyOWJtYjkyN2xvY2FsaG9zdEbwl7EHvbylWSWFWYMZwfc=',
+    'getPlaylists': {'owned': [fixtures.playlist()], 'collab': [],
+                     'subscribed': [fixtures.playlist('p2')]},
+    'getTopCharts': [fixtures.artist()],
+    'getTracksForAlbumInCollection': [fixtures.track()],
+    'getTracksForArtist': [fixtures.track()],
+    'getTracksForArtistInCollection': [fixtures.track()],
+    'removeFriend': True,
+    'removeFromCollection': True,
+    'removeFromPlaylist': True,
+    'search': {'number_results': 1, 'track_count': 1,
+               'results': [fixtures.track()]},
+    'searchSuggestions': [fixtures.artist(), fixtures.user()],
+    'setPlaylistCollaborating': True,
+    'setPlaylistCollaborationMode': True,
+    'setPlaylistFields': True,
+    'setPlaylistOrder': True,
+    'userFollowers': [fixtures.user('s2')],
+    'userFollowing': [fixtures.user('s3')],
+}
+
+CALLS = [
+    ('add_friend', ('s2',), {}),
+    ('add_to_collection', (['t1'],), {}),
+    ('add_to_playlist', ('p1', ['t1']), {}),
+    ('create_playlist', ('Mix', 'A mix', ['t1']), {}),
+    ('current_user', (), {}),
+    ('delete_playlist', ('p1',), {}),
+    ('find_user', (), {'vanity_name': 'ben'}),
+    ('get', (['t1', 'a1'],), {}),
+    ('get_activity_stream', ('s1', 'user'), {}),
+    ('get_albums_for_artist', ('r1',), {}),
+    ('get_albums_for_artist_in_collection', ('r1',), {}),
+    ('get_albums_in_collection', (), {}),
+    ('get_artists_in_collection', (), {}),
+    ('get_heavy_rotation', (), {}),
+    ('get_new_releases', (), {}),
+    ('get_object_from_short_code', ('QitD',), {}),
+    ('get_object_from_url', ('/station/rr1/',), {}),
+    ('get_playback_token', ('localhost',), {}),
+    ('get_playlists', (), {}),
+    ('get_top_charts', ('Artist',), {}),
+    ('get_tracks_for_album_in_collection', ('a1',), {}),
+    ('get_tracks_for_artist', ('r1',), {}),
+    ('get_tracks_for_artist_in_collection', ('r1',), {}),
+    ('get_tracks_in_collection', (), {'start': 2, 'count': 2}),
+    ('get_tracks_in_collection', (), {'start': 4, 'count': 2}),
+    ('remove_friend', ('s2',), {}),
+    ('remove_from_collection', (['t1'],), {}),
+    ('remove_from_playlist', ('p1', ['t1']), {}),
+    ('search', ('daft', ['Track']), {}),
+    ('search_suggestions', ('daf',), {}),
+    ('set_playlist_collaborating', ('p1', True), {}),
+    ('set_playlist_collaboration_mode', ('p1', 1), {}),
+    ('set_playlist_fields', ('p1', 'Mix', 'A mix'), {}),
+    ('set_playlist_order', ('p1', ['t1']), {}),
+    ('user_followers', ('s1',), {}),
+    ('user_following', ('s1',), {}),
+]
+
+
+class FakeRdio(object):
+    """Answers like the live service, from the payloads above."""
+
+    def request(self, url, body, headers):
+        params = dict((k, v[0]) for k, v in parse_qs(body).iteritems())
+        method = params['method']
+        if method == 'getTracksInCollection':
+            start = int(params['start'])
+            result = [fixtures.track('t%d' % i)
+                      for i in range(start, start + int(params['count']))]
+        elif params.get('keys') == 'bad':
+            return {'status': '200'}, json.dumps(
+                {'status': 'error', 'message': 'Invalid key'})
+        else:
+            result = RESULTS[method]
+        time.sleep(0.001)
+        return {'status': '200'}, json.dumps(
+            {'status': 'ok', 'result': result})
+
+
+def snapshot(value):
+    if isinstance(value, list): return [snapshot(item) for item in value]
+    return getattr(value, '_data', value)
+
+
+class CassetteTest(unittest.TestCase):
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        recorder = RecordingTransport(FakeRdio(), self.path)
+        api = Api('ck', 'cs', 'tk', 'ts', transport=recorder)
+        self.expected = [snapshot(getattr(api, name)(*args, **kwargs))
+                         for name, args, kwargs in CALLS]
+        self.assertRaises(RdioGenericAPIError, api.get, ['bad'])
+        recorder.save()
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def replay(self, **kwargs):
+        return Api('other', 'secret', 'tk2', 'ts2',
+                   transport=ReplayTransport(self.path, **kwargs))
+
+    def test_every_method_replays(self):
+        api = self.replay()
+        for (name, args, kwargs), expected in zip(CALLS, self.expected):
+            self.assertEqual(snapshot(getattr(api, name)(*args, **kwargs)),
+                             expected, name)
+
+    def test_pagination(self):
+        api = self.replay()
+        page = api.get_tracks_in_collection(start=4, count=2)
+        self.assertEqual([t.key for t in page], ['t4', 't5'])
+
+    def test_error_path(self):
+        self.assertRaises(RdioGenericAPIError, self.replay().get, ['bad'])
+
+    def test_miss(self):
+        self.assertRaises(CassetteMissError, self.replay().get, ['t9'])
+
+    def test_fixed_latency(self):
+        api = self.replay(latency=0.02)
+        start = time.time()
+        api.current_user()
+        self.assertTrue(time.time() - start >= 0.02)
+
+    def test_recorded_latency(self):
+        transport = ReplayTransport(self.path, latency='recorded')
+        delay = transport._delay(transport._responses.keys()[0])
+        self.assertTrue(0.001 <= delay < 1)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,119 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from StringIO import StringIO
+from urlparse import parse_qsl
+sys.path += ["../rdio"]
+import cli
+import fixtures
+
+
+class FakeRdio(object):
+
+    def __init__(self, tracks=0, followers=None):
+        self.tracks = [fixtures.track('t%d' % i) for i in range(tracks)]
+        self.followers = followers or {}
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def request(self, url, body, headers):
+        params = dict(parse_qsl(body))
+        with self.lock: self.calls.append(params)
+        method = params['method']
+        start = int(params.get('start', 0))
+        count = int(params.get('count', 1000))
+        if method == 'getTracksInCollection':
+            result = self.tracks[start:start + count]
+        elif method == 'get':
+            result = dict((key, fixtures.playlist(key, trackKeys=[
+                't%d' % i for i in range(5)]) if key.startswith('p') else
+                fixtures.track(key)) for key in params['keys'].split(',')
+                if key != 'missing')
+        elif method == 'createPlaylist':
+            result = fixtures.playlist('p99', name=params['name'])
+        elif method == 'addToPlaylist':
+            result = True
+        elif method == 'userFollowers':
+            result = [fixtures.user(key) for key in
+                      self.followers.get(params['user'], [])
+                      ][start:start + count]
+        return {'status': '200'}, json.dumps({'status': 'ok',
+                                              'result': result})
+
+
+class CliTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.output = os.path.join(self.directory, 'out.jsonl')
+        self.stderr = sys.stderr
+        sys.stderr = StringIO()
+
+    def tearDown(self):
+        sys.stderr = self.stderr
+        shutil.rmtree(self.directory)
+
+    def run_cli(self, rdio, *argv, **kwargs):
+        argv = ['--consumer-key', 'k', '--consumer-secret', 's',
+                '--token', 't', '--token-secret', 's',
+                '--output', self.output] + list(argv)
+        if 'input' in kwargs:
+            path = os.path.join(self.directory, 'in')
+            with open(path, 'w') as f: f.write(kwargs['input'])
+            argv[0:0] = ['--input', path]
+        status = cli.main(argv, transport=rdio)
+        with open(self.output) as f:
+            return status, [json.loads(line)['key'] for line in f]
+
+    def test_collection_pages_concurrently(self):
+        rdio = FakeRdio(tracks=23)
+        status, keys = self.run_cli(rdio, '--concurrency', '3',
+                                    '--chunk-size', '5', 'collection')
+        self.assertEqual(status, 0)
+        self.assertEqual(keys, ['t%d' % i for i in range(23)])
+        self.assertEqual(len(rdio.calls), 6)
+        summary = sys.stderr.getvalue()
+        self.assertTrue('getTracksInCollection' in summary)
+        self.assertTrue('23 objects' in summary)
+
+    def test_get_keeps_input_order(self):
+        rdio = FakeRdio()
+        status, keys = self.run_cli(rdio, '--chunk-size', '2', 'get',
+                                    '--extras', 'playCount',
+                                    input='t3 t1\nmissing,t2\n\nt9\n')
+        self.assertEqual(status, 1)
+        self.assertEqual(keys, ['t3', 't1', 't2', 't9'])
+        self.assertEqual(len(rdio.calls), 3)
+        self.assertEqual(rdio.calls[0]['extras'], 'playCount')
+        self.assertTrue('missing was not found' in sys.stderr.getvalue())
+
+    def test_mirror_playlist(self):
+        rdio = FakeRdio()
+        status, keys = self.run_cli(rdio, '--chunk-size', '2',
+                                    'mirror-playlist', 'p1')
+        self.assertEqual(keys, ['p99'])
+        methods = [call['method'] for call in rdio.calls]
+        self.assertEqual(methods, ['get', 'createPlaylist', 'addToPlaylist',
+                                   'addToPlaylist'])
+        self.assertEqual(rdio.calls[1]['tracks'], 't0,t1')
+        self.assertEqual(rdio.calls[1]['name'], 'Copy of Playlist p1')
+        self.assertEqual(rdio.calls[3]['tracks'], 't4')
+
+    def test_followers(self):
+        rdio = FakeRdio(followers={'s1': ['s2', 's3', 's4'],
+                                   's2': ['s1', 's3', 's5'],
+                                   's5': ['s6']})
+        status, keys = self.run_cli(rdio, '--chunk-size', '2', 'followers',
+                                    's1', '--depth', '2')
+        self.assertEqual(sorted(keys), ['s2', 's3', 's4', 's5'])
+        status, keys = self.run_cli(rdio, 'followers', 's1', '--depth', '3',
+                                    '--limit', '2')
+        self.assertEqual(keys, ['s2', 's3'])
+
+
+if __name__ == 'main':
+    unittest.main()
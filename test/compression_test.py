@@ -0,0 +1,141 @@
+import gzip
+import json
+import socket
+import threading
+import time
+import unittest
+import zlib
+import sys
+sys.path += ["../rdio"]
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
+from StringIO import StringIO
+from rdio import PooledHttpTransport, parse_response, parse_result_list
+from compression import CompressedHttpTransport, TransferStats
+import fixtures
+
+CONTENT = json.dumps({'status': 'ok',
+                      'result': [fixtures.track('t%d' % i)
+                                 for i in range(200)]})
+
+
+def gzipped(data):
+    buf = StringIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb') as f: f.write(data)
+    return buf.getvalue()
+
+
+class Server(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    hits = {}
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers['Content-Length']))
+        Handler.hits[self.path] = Handler.hits.get(self.path, 0) + 1
+        if self.path == '/slow' and Handler.hits[self.path] == 1:
+            time.sleep(0.5)
+        body, encoding = CONTENT, None
+        accepted = self.headers.get('Accept-Encoding', '')
+        if self.path == '/gzip' and 'gzip' in accepted:
+            body, encoding = gzipped(CONTENT), 'gzip'
+        elif self.path == '/deflate' and 'deflate' in accepted:
+            body, encoding = zlib.compress(CONTENT), 'deflate'
+        elif self.path == '/raw-deflate' and 'deflate' in accepted:
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -zlib.MAX_WBITS)
+            body = compressor.compress(CONTENT) + compressor.flush()
+            encoding = 'deflate'
+        self.send_response(200)
+        if encoding: self.send_header('Content-Encoding', encoding)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        # Drop the keep-alive connection without telling the client.
+        if self.path == '/close': self.close_connection = 1
+
+    def log_message(self, *args):
+        pass
+
+
+class CompressedHttpTransportTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = Server(('127.0.0.1', 0), Handler)
+        cls.url = 'http://127.0.0.1:%d' % cls.server.server_port
+        thread = threading.Thread(target=cls.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+
+    def setUp(self):
+        self.transport = CompressedHttpTransport(chunk_size=1024)
+
+    def tearDown(self):
+        self.transport.close()
+
+    def post(self, path, method='getTracksInCollection'):
+        return self.transport.request(self.url + path, 'method=%s' % method,
+                                      {'Content-Type': 'text/plain'})
+
+    def test_encodings(self):
+        for path in ('/gzip', '/deflate', '/raw-deflate', '/plain'):
+            response, content = self.post(path)
+            self.assertEqual(content, CONTENT, path)
+            self.assertFalse('content-encoding' in response)
+        self.assertEqual(response.status, 200)
+
+    def test_stats(self):
+        self.post('/gzip')
+        self.post('/gzip')
+        self.post('/plain', 'get')
+        report = self.transport.stats.report()
+        tracks = report['getTracksInCollection']
+        self.assertEqual(tracks['calls'], 2)
+        self.assertEqual(tracks['decompressed'], 2 * len(CONTENT))
+        self.assertEqual(tracks['compressed'], 2 * len(gzipped(CONTENT)))
+        self.assertTrue(tracks['ratio'] > 5)
+        self.assertEqual(report['get']['ratio'], 1.0)
+
+    def test_streaming(self):
+        response, chunks = self.transport.stream(
+            self.url + '/gzip', 'method=get', {})
+        chunks = list(chunks)
+        self.assertTrue(len(chunks) > 1)
+        tracks = parse_response(''.join(chunks), parse_result_list)
+        self.assertEqual(len(tracks), 200)
+
+    def test_resends_on_a_stale_connection(self):
+        self.post('/close')
+        response, content = self.post('/plain')
+        self.assertEqual(content, CONTENT)
+
+    def test_does_not_resend_after_a_timeout(self):
+        transport = CompressedHttpTransport(timeout=0.2)
+        try:
+            transport.request(self.url + '/plain', 'method=get', {})
+            self.assertRaises(socket.timeout, transport.request,
+                              self.url + '/slow', 'method=addToPlaylist', {})
+        finally:
+            transport.close()
+        time.sleep(0.5)
+        self.assertEqual(Handler.hits['/slow'], 1)
+
+    def test_pooled(self):
+        stats = TransferStats()
+        pool = PooledHttpTransport(
+            size=2, factory=lambda: CompressedHttpTransport(stats=stats))
+        response, content = pool.request(self.url + '/gzip', 'method=get',
+                                         {})
+        self.assertEqual(content, CONTENT)
+        self.assertEqual(stats.report()['get']['calls'], 1)
+
+
+if __name__ == 'main':
+    unittest.main()
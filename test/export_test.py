@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path += ["../rdio"]
+from rdio import RdioPlaylist, RdioTrack
+from export import export_playlists, export_tracks_in_collection, read_export
+import fixtures
+
+
+class FakeApi(object):
+
+    def __init__(self, tracks, fail_at=None):
+        self.tracks = tracks
+        self.fail_at = fail_at
+        self.calls = []
+
+    def call_api(self, data, decoder=None):
+        self.calls.append(dict(data))
+        if data['method'] == 'getPlaylists':
+            return {'owned': [fixtures.playlist('p1')], 'collab': [],
+                    'subscribed': [fixtures.playlist('p2')]}
+        if data['start'] == self.fail_at: raise IOError('connection reset')
+        return self.tracks[data['start']:data['start'] + data['count']]
+
+    call_api_authenticated = call_api
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'export')
+        self.tracks = [fixtures.track('t%d' % i) for i in range(10)]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def keys(self):
+        return [record['key'] for record in read_export(self.path)]
+
+    def test_formats_round_trip(self):
+        for format in ('jsonl', 'binary'):
+            for compress in (False, True):
+                if os.path.exists(self.path + '.state'):
+                    os.remove(self.path + '.state')
+                api = FakeApi(self.tracks)
+                count = export_tracks_in_collection(
+                    api, self.path, format=format, compress=compress,
+                    page_size=4, extras=['playCount'])
+                self.assertEqual(count, 10)
+                self.assertEqual(len(api.calls), 3)
+                self.assertEqual(api.calls[0]['extras'], 'playCount')
+                self.assertEqual(self.keys(), ['t%d' % i for i in range(10)])
+                tracks = list(read_export(self.path, decode=True))
+                self.assertTrue(isinstance(tracks[0], RdioTrack))
+
+    def test_resumes_after_the_last_page_written(self):
+        api = FakeApi(self.tracks, fail_at=8)
+        self.assertRaises(IOError, export_tracks_in_collection, api,
+                          self.path, format='binary', compress=True,
+                          page_size=4)
+        # A partial page written after the checkpoint is dropped.
+        with open(self.path, 'ab') as export: export.write('garbage')
+        api = FakeApi(self.tracks)
+        export_tracks_in_collection(api, self.path, format='binary',
+                                    compress=True, page_size=4)
+        self.assertEqual([call['start'] for call in api.calls], [8])
+        self.assertEqual(self.keys(), ['t%d' % i for i in range(10)])
+
+    def test_reruns_a_finished_export(self):
+        export_tracks_in_collection(FakeApi(self.tracks), self.path,
+                                    page_size=4)
+        api = FakeApi(self.tracks[:6])
+        self.assertEqual(export_tracks_in_collection(api, self.path,
+                                                     page_size=4), 6)
+        self.assertEqual([call['start'] for call in api.calls], [0, 4])
+        self.assertEqual(self.keys(), ['t%d' % i for i in range(6)])
+        self.assertEqual(export_playlists(FakeApi([]), self.path), 2)
+        self.assertEqual(export_playlists(FakeApi([]), self.path), 2)
+
+    def test_playlists(self):
+        self.assertEqual(export_playlists(FakeApi([]), self.path), 2)
+        playlists = list(read_export(self.path))
+        self.assertEqual([(p['key'], p['playlistSet']) for p in playlists],
+                         [('p1', 'owned'), ('p2', 'subscribed')])
+        self.assertTrue(isinstance(list(read_export(self.path, True))[0],
+                                   RdioPlaylist))
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,96 @@
+import time
+import unittest
+import sys
+sys.path += ["../rdio"]
+from fakeserver import Catalog, FakeRdioServer
+from rdio import Api, RdioGenericAPIError, RdioTrack, methods
+
+
+class CatalogTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog(artists=10, albums_per_artist=2,
+                               tracks_per_album=5, users=20,
+                               collection_size=30)
+
+    def test_sizes(self):
+        self.assertEqual((self.catalog.albums, self.catalog.tracks), (20, 100))
+        self.assertEqual(self.catalog.object('t99')['albumKey'], 'a19')
+        self.assertEqual(self.catalog.object('t100'), None)
+        self.assertEqual(self.catalog.object('nonsense'), None)
+
+    def test_objects_decode(self):
+        for key in ('r1', 'a1', 't1', 's1', 'p1'):
+            data = self.catalog.object(key)
+            self.assertEqual(data['key'], key)
+        track = RdioTrack(self.catalog.object('t7'))
+        self.assertEqual((track.album_key, track.artist_key), ('a1', 'r0'))
+        self.assertEqual(self.catalog.object('a1')['trackKeys'],
+                         ['t5', 't6', 't7', 't8', 't9'])
+
+    def test_is_deterministic(self):
+        other = Catalog(artists=10, albums_per_artist=2, tracks_per_album=5,
+                        users=20, collection_size=30)
+        self.assertEqual(self.catalog.collection(3), other.collection(3))
+        self.assertEqual(len(set(self.catalog.collection(3))), 30)
+        self.assertEqual(self.catalog.object('p4'), other.object('p4'))
+
+
+class FakeRdioServerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeRdioServer(catalog=Catalog(artists=10),
+                                     latencies={'search': 0.05}).start()
+        self.api = self.server.api()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_calls(self):
+        user = self.api.current_user()
+        self.assertEqual(user.key, 's%d' % self.server.user_for('token'))
+        tracks = self.api.get_tracks_in_collection(start=10, count=5)
+        self.assertEqual(len(tracks), 5)
+        found = self.api.get(['t1', 'a2', 'missing'])
+        self.assertEqual(sorted(obj.key for obj in found), ['a2', 't1'])
+        playlists = self.api.get_playlists()
+        self.assertEqual(len(playlists.owned_playlists), 5)
+        stream = self.api.get_activity_stream('s3', 'user')
+        self.assertEqual(stream.updates[0].owner.key, 's3')
+        self.assertTrue(self.api.add_friend('s2'))
+        self.assertEqual(self.server.requests['get'], 1)
+
+    def test_every_method_is_answered(self):
+        handlers = self.server.handlers
+        for name in methods.itervalues():
+            params = {'keys': 't1', 'type': 'Track', 'user': 's1',
+                      'artist': 'r1', 'album': 'a1', 'url': '/x/t1/',
+                      'short_code': 't1', 'query': 'q', 'types': 'Track',
+                      'email': 'a@b.c', 'name': 'n', 'scope': 'user'}
+            self.assertTrue(handlers.answer(name, params, 0) is not None,
+                            name)
+
+    def test_latency(self):
+        start = time.time()
+        self.api.search('q', ['Track'])
+        self.assertTrue(time.time() - start >= 0.05)
+
+    def test_rejects_bad_signatures(self):
+        api = Api('key', 'wrong', 'token', 'secret',
+                  root_url=self.server.url)
+        self.assertRaises(RdioGenericAPIError, api.get, ['t1'])
+        api = Api('key', 'secret', 'token', 'wrong',
+                  root_url=self.server.url)
+        self.assertRaises(RdioGenericAPIError, api.get, ['t1'])
+
+    def test_authentication(self):
+        anonymous = self.server.api(token=None)
+        self.assertEqual(anonymous.get(['t1'])[0].key, 't1')
+        self.assertRaises(RdioGenericAPIError, anonymous.call_api,
+                          {'method': 'currentUser'})
+        self.assertRaises(RdioGenericAPIError, self.api.call_api,
+                          {'method': 'noSuchMethod'})
+
+
+if __name__ == 'main':
+    unittest.main()
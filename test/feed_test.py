@@ -0,0 +1,85 @@
+from datetime import datetime
+import threading
+import unittest
+import sys
+sys.path += ["../rdio"]
+from feed import MergedFeed
+from rdio import RdioActivityStream, UTC
+import fixtures
+
+
+def date(day, hour=0):
+    return '2011-06-%02dT%02d:00:00' % (day, hour)
+
+
+class FakeApi(object):
+    """Serves activity streams of fixture items by user key."""
+
+    def __init__(self, streams, failing=()):
+        self.streams = streams
+        self.failing = failing
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def get_activity_stream(self, user, scope, last_id=None):
+        with self._lock: self.calls.append((user, scope))
+        if user in self.failing: raise IOError('down')
+        return RdioActivityStream({
+            'last_id': 1, 'user': fixtures.user(user),
+            'updates': [fixtures.activity(fixtures.user(user), stamp,
+                                          albums=[fixtures.album(album)])
+                        for stamp, album in self.streams[user]]})
+
+
+class MergedFeedTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi({
+            's1': [(date(5), 'a1'), (date(3), 'a2'), (date(1), 'a3')],
+            's2': [(date(4), 'a4'), (date(2), 'a5')],
+            's3': [(date(6), 'a6'), (date(6), 'a6'), (date(2, 12), 'a7')],
+            's4': [],
+        })
+        self.feed = MergedFeed(self.api, concurrency=3)
+
+    def tearDown(self):
+        self.feed.close()
+
+    def albums(self, items):
+        return [item.albums[0].key for item in items]
+
+    def test_merges_newest_first(self):
+        items = list(self.feed.items(['s1', 's2', 's3', 's4']))
+        self.assertEqual(self.albums(items),
+                         ['a6', 'a1', 'a4', 'a2', 'a7', 'a5', 'a3'])
+        self.assertEqual(sorted(self.api.calls),
+                         [(user, 'user') for user in 's1 s2 s3 s4'.split()])
+
+    def test_dedupes_users_and_items(self):
+        items = list(self.feed.items(['s3', 's3', 's2']))
+        self.assertEqual(self.albums(items), ['a6', 'a4', 'a7', 'a5'])
+        self.assertEqual(len(self.api.calls), 2)
+
+    def test_limit(self):
+        items = self.feed.items(['s1', 's2', 's3'], limit=3)
+        self.assertEqual(self.albums(items), ['a6', 'a1', 'a4'])
+
+    def test_since(self):
+        since = datetime(2011, 6, 3, tzinfo=UTC)
+        items = self.feed.items(['s1', 's2', 's3'], since=since)
+        self.assertEqual(self.albums(items), ['a6', 'a1', 'a4'])
+
+    def test_is_lazy(self):
+        items = self.feed.items(['s1', 's2'])
+        self.assertEqual(self.api.calls, [])
+        self.assertEqual(next(items).albums[0].key, 'a1')
+
+    def test_keeps_going_past_errors(self):
+        self.api.failing = ('s2',)
+        items = list(self.feed.items(['s1', 's2']))
+        self.assertEqual(self.albums(items), ['a1', 'a2', 'a3'])
+        self.assertTrue(isinstance(self.feed.errors['s2'], IOError))
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""Sample Rdio API payloads shared by the tests."""
+
+
+def artist(key='r1', **extra):
+    data = {
+        'key': key, 'type': 'r', 'url': '/artist/%s/' % key,
+        'icon': 'http://img/%s.jpg' % key, 'baseIcon': 'img/%s.jpg' % key,
+        'name': 'Artist %s' % key, 'length': 10, 'hasRadio': True,
+        'shortUrl': 'http://rd.io/x/%s/' % key, 'albumCount': 2,
+        'radioKey': 'rr%s' % key, 'topSongsKey': 'tr%s' % key}
+    data.update(extra)
+    return data
+
+
+def _music(key, rdio_type, **extra):
+    data = {
+        'key': key, 'type': rdio_type, 'url': '/music/%s/' % key,
+        'icon': 'http://img/%s.jpg' % key, 'baseIcon': 'img/%s.jpg' % key,
+        'name': 'Name %s' % key, 'artist': 'Artist r1', 'artistUrl': '/r1/',
+        'artistKey': 'r1', 'isExplicit': False, 'isClean': False,
+        'price': '9.99', 'canStream': True, 'canSample': True,
+        'canTether': True, 'shortUrl': 'http://rd.io/x/%s/' % key,
+        'embedUrl': 'http://rd.io/e/%s/' % key, 'duration': 215}
+    data.update(extra)
+    return data
+
+
+def album(key='a1', **extra):
+    data = _music(key, 'a', displayDate='Jan 1, 2011',
+                  trackKeys=['t1', 't2'], releaseDateISO='2011-01-01')
+    data.update(extra)
+    return data
+
+
+def track(key='t1', **extra):
+    data = _music(key, 't', album='Name a1', albumKey='a1', albumUrl='/a1/',
+                  albumArtist='Artist r1', albumArtistKey='r1',
+                  canDownload=False, canDownloadAlbumOnly=False, trackNum=1)
+    data.update(extra)
+    return data
+
+
+def playlist(key='p1', **extra):
+    data = {
+        'key': key, 'type': 'p', 'url': '/playlist/%s/' % key,
+        'icon': 'http://img/%s.jpg' % key, 'baseIcon': 'img/%s.jpg' % key,
+        'name': 'Playlist %s' % key, 'length': 2, 'owner': 'Ben Kreeger',
+        'ownerUrl': '/people/ben/', 'ownerKey': 's1', 'ownerIcon': 'i',
+        'lastUpdated': 1300000000.0, 'shortUrl': 'http://rd.io/x/%s/' % key,
+        'embedUrl': 'http://rd.io/e/%s/' % key, 'trackKeys': ['t1', 't2']}
+    data.update(extra)
+    return data
+
+
+def user(key='s1', **extra):
+    data = {
+        'key': key, 'type': 's', 'url': '/people/%s/' % key,
+        'icon': 'http://img/%s.jpg' % key, 'baseIcon': 'img/%s.jpg' % key,
+        'firstName': 'Ben', 'lastName': 'Kreeger', 'libraryVersion': 12,
+        'gender': 'm'}
+    data.update(extra)
+    return data
+
+
+def station(key='rr1', rdio_type='rr', **extra):
+    data = {
+        'key': key, 'type': rdio_type, 'url': '/station/%s/' % key,
+        'icon': 'http://img/%s.jpg' % key, 'baseIcon': 'img/%s.jpg' % key,
+        'count': 5, 'length': 100, 'name': 'Station %s' % key,
+        'reloadOnRepeat': False, 'tracks': [], 'user': 's1',
+        'artistName': 'Artist r1', 'artistUrl': '/r1/', 'hasRadio': True,
+        'shortUrl': 'http://rd.io/x/%s/' % key}
+    data.update(extra)
+    return data
+
+
+def activity(owner=None, date='2011-06-01T12:00:00', update_type=0, **extra):
+    data = {
+        'owner': owner or user(), 'date': date, 'update_type': update_type,
+        'albums': [album()]}
+    data.update(extra)
+    return data
@@ -0,0 +1,89 @@
+import json
+import threading
+import unittest
+import sys
+from urlparse import parse_qsl
+sys.path += ["../rdio"]
+from hydrate import hydrate_playlists
+from rdio import Api, RdioPlaylist, RdioPlaylistSet
+import fixtures
+
+
+class Catalog(object):
+
+    def __init__(self, track_keys):
+        self.track_keys = track_keys
+        self.gets = []
+        self.lock = threading.Lock()
+
+    def request(self, url, body, headers):
+        params = dict(parse_qsl(body))
+        keys = params['keys'].split(',')
+        with self.lock: self.gets.append((keys, params.get('extras')))
+        result = {}
+        for key in keys:
+            if key.startswith('p'):
+                result[key] = fixtures.playlist(
+                    key, trackKeys=self.track_keys[key])
+            elif key != 'gone':
+                result[key] = fixtures.track(key)
+        return {'status': '200'}, json.dumps({'status': 'ok',
+                                              'result': result})
+
+
+def listed(key):
+    # As get_playlists lists it without extras=['trackKeys'].
+    data = fixtures.playlist(key)
+    del data['trackKeys']
+    return data
+
+
+class HydratePlaylistsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog({'p3': ['t2', 't5']})
+        self.api = Api('k', 's', 't', 's', transport=self.catalog)
+        self.sets = RdioPlaylistSet({
+            'owned': [fixtures.playlist('p1', trackKeys=['t1', 't2', 't3']),
+                      fixtures.playlist('p2', trackKeys=['t3', 'gone',
+                                                         't4'])],
+            'collab': [listed('p3')],
+            'subscribed': [fixtures.playlist('p4', trackKeys=[],
+                                             length=0)]})
+
+    def tracks(self, playlist):
+        return [track.key for track in playlist.tracks]
+
+    def test_hydrates_a_playlist_set(self):
+        tracks = hydrate_playlists(self.api, self.sets, chunk_size=2,
+                                   extras=['playCount'])
+        p1, p2 = self.sets.owned_playlists
+        p3, = self.sets.collaborated_playlists
+        p4, = self.sets.subscribed_playlists
+        self.assertEqual(self.tracks(p1), ['t1', 't2', 't3'])
+        self.assertEqual(self.tracks(p2), ['t3', 't4'])
+        self.assertEqual(self.tracks(p3), ['t2', 't5'])
+        self.assertEqual(p4.tracks, [])
+        self.assertTrue(p1.tracks[2] is p2.tracks[0])
+        self.assertTrue(p1.tracks[1] is p3.tracks[0])
+        self.assertEqual(sorted(tracks), ['t1', 't2', 't3', 't4', 't5'])
+        # p3 came without its keys, so they were fetched first.
+        self.assertEqual(self.catalog.gets[0], (['p3'], 'trackKeys'))
+        fetched = [key for keys, extras in self.catalog.gets[1:]
+                   for key in keys]
+        self.assertEqual(sorted(fetched), ['gone', 't1', 't2', 't3', 't4',
+                                           't5'])
+        self.assertEqual(len(self.catalog.gets), 4)
+        self.assertEqual(set(extras for keys, extras in
+                             self.catalog.gets[1:]), set(['playCount']))
+
+    def test_hydrates_a_list(self):
+        playlist = RdioPlaylist(fixtures.playlist('p1',
+                                                  trackKeys=['t2', 't1']))
+        hydrate_playlists(self.api, [playlist])
+        self.assertEqual(self.tracks(playlist), ['t2', 't1'])
+        self.assertEqual(len(self.catalog.gets), 1)
+
+
+if __name__ == 'main':
+    unittest.main()
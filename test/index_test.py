@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+import unittest
+import sys
+sys.path += ["../rdio"]
+from rdio import (RdioAlbum, RdioArtist, RdioInvalidParameterException,
+                  RdioTrack)
+from index import CollectionIndex
+import fixtures
+
+
+class FakeApi(object):
+
+    def __init__(self, tracks):
+        self.tracks = tracks
+        self.calls = []
+
+    def get_tracks_in_collection(self, user=None, start=None, count=None,
+                                 sort=None):
+        self.calls.append((start, count, sort))
+        return self.tracks[start:start + count] or None
+
+    def get_albums_in_collection(self, user=None, start=None, count=None,
+                                 sort=None):
+        return [RdioAlbum(fixtures.album())] if not start else None
+
+    def get_artists_in_collection(self, user=None, start=None, count=None,
+                                  sort=None):
+        return None
+
+
+class CollectionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tracks = [
+            RdioTrack(fixtures.track('t1', name='Windowlicker',
+                                     artist='Aphex Twin', album='Windowlicker',
+                                     playCount=5, trackNum=1)),
+            RdioTrack(fixtures.track('t2', name='Flim', artist='Aphex Twin',
+                                     album='Come to Daddy', playCount=12,
+                                     trackNum=4)),
+            RdioTrack(fixtures.track('t3', name=u'Hyperballad',
+                                     artist=u'Björk', album='Post',
+                                     playCount=9, trackNum=3)),
+            RdioTrack(fixtures.track('t4', name='Come Together',
+                                     artist='The Beatles', album='Abbey Road',
+                                     trackNum=1))]
+        self.index = CollectionIndex(
+            self.tracks,
+            [RdioAlbum(fixtures.album('a1', name='Post', artist=u'Björk')),
+             RdioAlbum(fixtures.album('a2', name='Abbey Road',
+                                      artist='The Beatles'))],
+            [RdioArtist(fixtures.artist('r2', name='The Beatles')),
+             RdioArtist(fixtures.artist('r1', name='Aphex Twin'))])
+
+    def keys(self, results):
+        return [obj.key for obj in results or []]
+
+    def test_defaults_to_date_added_order(self):
+        results = self.index.get_tracks_in_collection()
+        self.assertTrue(results[0] is self.tracks[0])
+        self.assertEqual(self.keys(results), ['t1', 't2', 't3', 't4'])
+
+    def test_sorts(self):
+        tracks = self.index.get_tracks_in_collection
+        self.assertEqual(self.keys(tracks(sort='playCount')),
+                         ['t2', 't3', 't1', 't4'])
+        self.assertEqual(self.keys(tracks(sort='name')),
+                         ['t4', 't2', 't3', 't1'])
+        self.assertEqual(self.keys(tracks(sort='artist')),
+                         ['t2', 't1', 't3', 't4'])
+        self.assertEqual(self.keys(tracks(sort='album')),
+                         ['t4', 't2', 't3', 't1'])
+        self.assertEqual(self.keys(self.index.get_artists_in_collection(
+            sort='name')), ['r1', 'r2'])
+        self.assertRaises(RdioInvalidParameterException,
+                          self.index.get_artists_in_collection,
+                          sort='playCount')
+
+    def test_query_matches_word_prefixes_across_fields(self):
+        tracks = self.index.get_tracks_in_collection
+        self.assertEqual(self.keys(tracks(query='aph')), ['t1', 't2'])
+        self.assertEqual(self.keys(tracks(query='aphex dad')), ['t2'])
+        self.assertEqual(self.keys(tracks(query='windowl')), ['t1'])
+        self.assertEqual(self.keys(tracks(query='come', sort='name')),
+                         ['t4', 't2'])
+        self.assertEqual(self.keys(tracks(query='bjork')), ['t3'])
+        self.assertEqual(self.keys(tracks(query=u'BJÖRK')), ['t3'])
+        self.assertEqual(tracks(query='twinx'), None)
+        self.assertEqual(self.keys(self.index.get_albums_in_collection(
+            query='beat')), ['a2'])
+
+    def test_queries_without_words_match_nothing(self):
+        self.assertEqual(self.index.get_tracks_in_collection(query='?!'),
+                         None)
+
+    def test_empty_index(self):
+        index = CollectionIndex()
+        self.assertEqual(index.tracks.query(u'foo bar', 'name', 0, 10), [])
+        self.assertEqual(index.tracks.query(None, 'name', 0, 10), [])
+
+    def test_paging(self):
+        tracks = self.index.get_tracks_in_collection
+        self.assertEqual(self.keys(tracks(start=1, count=2)), ['t2', 't3'])
+        self.assertEqual(self.keys(tracks(query='aphex', start=1,
+                                          count=5)), ['t2'])
+        self.assertEqual(tracks(start=10), None)
+
+    def test_mirror_pages_through_the_collection(self):
+        api = FakeApi(self.tracks)
+        index = CollectionIndex.mirror(api, page_size=3)
+        self.assertEqual(api.calls, [(0, 3, 'dateAdded'),
+                                     (3, 3, 'dateAdded')])
+        self.assertEqual(len(index.get_tracks_in_collection()), 4)
+        self.assertEqual(len(index.get_albums_in_collection()), 1)
+        self.assertEqual(index.get_artists_in_collection(), None)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,106 @@
+import json
+import unittest
+import sys
+from urlparse import parse_qsl
+sys.path += ["../rdio"]
+from loader import Loader
+from rdio import Api, RdioAlbum, RdioTrack
+import fixtures
+
+
+class Catalog(object):
+    """A transport serving get from a small catalog: artist r1 with albums
+    a1 and a2, each of two tracks, and a playlist by s1."""
+
+    def __init__(self):
+        self.objects = {
+            'r1': fixtures.artist('r1', topSongsKey='tr1'),
+            'a1': fixtures.album('a1', trackKeys=['t1', 't2']),
+            'a2': fixtures.album('a2', trackKeys=['t3', 'gone']),
+            'p1': fixtures.playlist('p1', trackKeys=['t4', 't1'],
+                                    ownerKey='s1'),
+            's1': fixtures.user('s1'),
+        }
+        for i, album in ((1, 'a1'), (2, 'a1'), (3, 'a2'), (4, 'a2')):
+            self.objects['t%d' % i] = fixtures.track(
+                't%d' % i, albumKey=album, artistKey='r1')
+        self.gets = []
+
+    def request(self, url, body, headers):
+        params = dict(parse_qsl(body))
+        if params['method'] == 'get':
+            keys = params['keys'].split(',')
+            self.gets.append(keys)
+            result = dict((key, self.objects[key]) for key in keys
+                          if key in self.objects)
+        elif params['method'] == 'getAlbumsForArtist':
+            result = [self.objects['a1'], self.objects['a2']]
+        return {'status': '200'}, json.dumps({'status': 'ok',
+                                              'result': result})
+
+
+class LoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog()
+        self.api = Api('k', 's', 't', 's', transport=self.catalog)
+
+    def test_batches_references_of_everything_returned(self):
+        with Loader(self.api):
+            albums = self.api.get_albums_for_artist('r1')
+            tracks = [[track.key for track in album.tracks]
+                      for album in albums]
+            self.assertEqual(tracks, [['t1', 't2'], ['t3']])
+            self.assertEqual(self.catalog.gets, [['t1', 't2', 't3', 'gone']])
+            # The tracks came back inside the scope, so theirs batch too.
+            self.assertEqual(albums[0].tracks[0].album.key, 'a1')
+            self.assertEqual(albums[1].tracks[0].album.key, 'a2')
+            self.assertTrue(albums[0].tracks[1].album is
+                            albums[0].tracks[0].album)
+            self.assertEqual(len(self.catalog.gets), 2)
+            self.assertEqual(albums[0].artist.name, 'Artist r1')
+            self.assertEqual(len(self.catalog.gets), 3)
+
+    def test_chunks(self):
+        with Loader(self.api, chunk_size=3) as loader:
+            albums = self.api.get_albums_for_artist('r1')
+            albums[0].tracks
+            self.assertEqual(self.catalog.gets, [['t1', 't2', 't3'],
+                                                 ['gone']])
+            self.assertEqual(loader.calls, 2)
+            usage = loader.memory_usage()
+            self.assertEqual((usage['entries'], usage['objects']), (4, 3))
+            self.assertTrue(usage['data'] > usage['decoded'] > 0)
+
+    def test_objects_from_outside_the_scope(self):
+        found = dict((obj.key, obj) for obj in self.api.get(['p1', 's1']))
+        playlist, user = found['p1'], found['s1']
+        album = RdioAlbum(fixtures.album('a2', trackKeys=['t3']))
+        with Loader(self.api) as loader:
+            loader.register([playlist, user])
+            self.assertEqual([track.key for track in playlist.tracks],
+                             ['t4', 't1'])
+            self.assertEqual(playlist.owner.key, 's1')
+            self.assertEqual(user.collection, None)
+            self.assertEqual(album.tracks[0].key, 't3')
+
+    def test_sent_tracks_are_left_alone(self):
+        with Loader(self.api):
+            playlist = self.api.get(['p1'])[0]
+            playlist.__dict__['tracks'] = [RdioTrack(fixtures.track('t9'))]
+            self.assertEqual(playlist.tracks[0].key, 't9')
+            self.assertEqual(self.catalog.gets, [['p1']])
+
+    def test_only_inside_a_scope(self):
+        track = RdioTrack(fixtures.track())
+        self.assertFalse(hasattr(track, 'album'))
+        with Loader(self.api):
+            with Loader(self.api) as inner:
+                track.album
+            self.assertEqual(inner.calls, 1)
+            self.assertTrue(hasattr(track, 'album'))
+        self.assertRaises(AttributeError, getattr, track, 'album')
+
+
+if __name__ == 'main':
+    unittest.main()
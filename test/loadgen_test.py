@@ -0,0 +1,57 @@
+import unittest
+import sys
+sys.path += ["../rdio"]
+from fakeserver import Catalog, FakeRdioServer
+from loadgen import SCENARIOS, Target, format_curve, run_load, scaling_curve
+
+
+class LoadGeneratorTest(unittest.TestCase):
+
+    def setUp(self):
+        self.catalog = Catalog(artists=20, users=20, collection_size=60)
+        self.server = FakeRdioServer(catalog=self.catalog,
+                                     latency=0.01).start()
+        self.target = Target(self.server.url, 'key', 'secret', 'token',
+                             'secret')
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_scenarios(self):
+        for scenario in sorted(SCENARIOS):
+            result = run_load(self.target, scenario, concurrency=2,
+                              duration=0.1, catalog=self.catalog)
+            self.assertTrue(result['calls'] > 0, scenario)
+            self.assertEqual(result['errors'], 0, scenario)
+            self.assertTrue(result['p50'] >= 0.01)
+            self.assertTrue(result['p50'] <= result['p99'] <= result['max'])
+
+    def test_processes(self):
+        result = run_load(self.target, 'get', concurrency=2, duration=0.2,
+                          mode='process', catalog=self.catalog)
+        self.assertEqual(result['mode'], 'process')
+        self.assertTrue(result['calls'] > 0)
+        self.assertEqual(result['errors'], 0)
+
+    def test_errors_are_counted(self):
+        target = self.target._replace(token_secret='wrong')
+        result = run_load(target, 'get', concurrency=1, duration=0.05,
+                          catalog=self.catalog)
+        self.assertEqual(result['errors'], result['calls'])
+
+    def test_scaling_curve(self):
+        results = scaling_curve(self.target, (1, 4), scenario='get',
+                                duration=0.3, catalog=self.catalog)
+        self.assertEqual([r['concurrency'] for r in results], [1, 4])
+        self.assertTrue(results[1]['throughput'] > results[0]['throughput'])
+        table = format_curve(results).splitlines()
+        self.assertEqual(len(table), 3)
+        self.assertTrue('1.00x' in table[1])
+
+    def test_unknown_options(self):
+        self.assertRaises(ValueError, run_load, self.target, 'nope')
+        self.assertRaises(ValueError, run_load, self.target, mode='async')
+
+
+if __name__ == 'main':
+    unittest.main()
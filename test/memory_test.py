@@ -0,0 +1,89 @@
+import gc
+import sys
+import unittest
+sys.path += ["../rdio"]
+from rdio import (JSONBasedObject, RdioActivityStream, RdioAlbum, RdioTrack,
+                  parse_result_list)
+from memory import AllocationTracker, cache_footprint, deep_size, footprint
+import fixtures
+
+
+class FootprintTest(unittest.TestCase):
+
+    def test_splits_data_and_decoded(self):
+        data = fixtures.track('t1')
+        track = RdioTrack(data)
+        sizes = footprint(track)
+        self.assertEqual(sizes['objects'], 1)
+        self.assertEqual(sizes['data'], deep_size(data))
+        self.assertTrue(sizes['decoded'] > sys.getsizeof(track))
+        self.assertEqual(sizes['total'], sizes['data'] + sizes['decoded'])
+        # The decoded strings are the ones in _data, so they count once.
+        self.assertTrue(track.name is data['name'])
+        self.assertTrue(sizes['decoded'] < sizes['data'])
+
+    def test_result_lists_and_nesting(self):
+        tracks = parse_result_list([fixtures.track('t%d' % i)
+                                    for i in range(5)])
+        self.assertEqual(footprint(tracks)['objects'], 5)
+        # The fixtures share some strings, which are counted once.
+        self.assertTrue(deep_size(tracks) <
+                        sys.getsizeof(tracks) +
+                        sum(deep_size(track) for track in tracks))
+        stream = RdioActivityStream({'last_id': 1, 'user': fixtures.user(),
+                                     'updates': [fixtures.activity()] * 3})
+        nested = footprint(stream)
+        alone = footprint(stream, nested=False)
+        self.assertEqual(alone['objects'], 1)
+        self.assertTrue(nested['objects'] > 3)
+        self.assertTrue(nested['decoded'] > alone['decoded'])
+
+    def test_seen_is_shared(self):
+        track = RdioTrack(fixtures.track())
+        seen = set()
+        self.assertTrue(footprint(track, seen)['total'] > 0)
+        self.assertEqual(footprint(track, seen)['total'], 0)
+        twice = footprint([track, track])
+        self.assertEqual((twice['objects'], twice['data']),
+                         (1, footprint(track)['data']))
+
+    def test_cache_footprint(self):
+        album = RdioAlbum(fixtures.album())
+        usage = cache_footprint([album, album, None])
+        self.assertEqual(usage['entries'], 3)
+        self.assertEqual(usage['total'], deep_size(album))
+        self.assertEqual(cache_footprint([])['total'], 0)
+
+
+class AllocationTrackerTest(unittest.TestCase):
+
+    def test_counts_live_models(self):
+        with AllocationTracker() as tracker:
+            tracks = [RdioTrack(fixtures.track('t%d' % i)) for i in range(3)]
+            RdioAlbum(fixtures.album())
+        RdioTrack(fixtures.track())
+        gc.collect()
+        report = tracker.report()
+        self.assertEqual(sorted(report), ['RdioAlbum', 'RdioTrack'])
+        self.assertEqual((report['RdioTrack']['live'],
+                          report['RdioTrack']['made']), (3, 3))
+        self.assertEqual((report['RdioAlbum']['live'],
+                          report['RdioAlbum']['made']), (0, 1))
+        self.assertEqual(report['RdioTrack']['total'],
+                         cache_footprint(tracks)['total'])
+        self.assertEqual(report['RdioAlbum']['total'], 0)
+
+    def test_stop_restores_constructor(self):
+        first = AllocationTracker().start()
+        second = AllocationTracker().start()
+        first.stop()
+        self.assertTrue('__new__' in JSONBasedObject.__dict__)
+        RdioTrack(fixtures.track())
+        second.stop()
+        self.assertFalse('__new__' in JSONBasedObject.__dict__)
+        self.assertEqual((first.made['RdioTrack'],
+                          second.made['RdioTrack']), (0, 1))
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,220 @@
+import json
+import logging
+import socket
+import unittest
+import sys
+sys.path += ["../rdio"]
+from urlparse import parse_qsl
+from rdio import Api, RdioGenericAPIError, RdioTrack, compose
+from memory import deep_size
+from middleware import (Logged, ResponseCache, Retry, Throttle, Timer,
+                        READ_METHODS)
+from pool import ApiPool
+from throttle import RateLimiter
+import fixtures
+
+
+class FakeTransport(object):
+
+    def __init__(self, failures=0):
+        self.failures = failures
+        self.methods = []
+
+    def request(self, url, body, headers):
+        params = dict(parse_qsl(body))
+        self.methods.append(params['method'])
+        if self.failures:
+            self.failures -= 1
+            raise socket.error('connection reset')
+        if params['method'] == 'search':
+            return {'status': '200'}, json.dumps(
+                {'status': 'error', 'message': 'Search is down'})
+        keys = params.get('keys', 't1').split(',')
+        return {'status': '200'}, json.dumps({'status': 'ok', 'result': dict(
+            (key, fixtures.track(key)) for key in keys)})
+
+
+class Recorder(object):
+
+    def __init__(self, name, seen):
+        self.name = name
+        self.seen = seen
+
+    def __call__(self, call, proceed):
+        self.seen.append((self.name, 'in', call.method, call.authenticated,
+                          call.result))
+        result = proceed(call)
+        self.seen.append((self.name, 'out', call.response['status'],
+                          bool(call.content), call.result is result))
+        return result
+
+
+class ChainTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+        self.seen = []
+
+    def api(self, *layers, **kwargs):
+        return Api('key', 'secret', 'token', 'secret',
+                   transport=self.transport, middleware=layers, **kwargs)
+
+    def test_without_middleware(self):
+        api = Api('key', 'secret', transport=self.transport)
+        self.assertEqual(api.middleware, ())
+        self.assertEqual(api.get(['t1'])[0].key, 't1')
+
+    def test_order(self):
+        api = self.api(Recorder('outer', self.seen),
+                       Recorder('inner', self.seen))
+        api.get(['t1'])
+        self.assertEqual(self.seen, [
+            ('outer', 'in', 'get', False, None),
+            ('inner', 'in', 'get', False, None),
+            ('inner', 'out', '200', True, True),
+            ('outer', 'out', '200', True, True)])
+        del self.seen[:]
+        api.add_friend('s1')
+        self.assertEqual(self.seen[0][:4],
+                         ('outer', 'in', 'addFriend', True))
+
+    def test_layers_change_params_and_results(self):
+        def more_keys(call, proceed):
+            call.params['keys'] += ',t2'
+            return proceed(call)
+        def names(call, proceed):
+            return sorted(obj.key for obj in proceed(call))
+        self.assertEqual(self.api(names, more_keys).get(['t1']),
+                         ['t1', 't2'])
+
+    def test_short_circuit(self):
+        def answer(call, proceed):
+            return [RdioTrack(fixtures.track('t9'))]
+        api = self.api(answer, Recorder('inner', self.seen))
+        self.assertEqual(api.get(['t1'])[0].key, 't9')
+        self.assertEqual((self.seen, self.transport.methods), ([], []))
+
+    def test_errors_pass_through_layers(self):
+        api = self.api(Recorder('outer', self.seen))
+        self.assertRaises(RdioGenericAPIError, api.search, 'q', ['Track'])
+        self.assertEqual(len(self.seen), 1)
+
+    def test_replacing_layers(self):
+        api = self.api(Recorder('first', self.seen))
+        api.middleware = [Recorder('second', self.seen)]
+        api.get(['t1'])
+        self.assertEqual(set(entry[0] for entry in self.seen),
+                         set(['second']))
+        api.middleware = None
+        self.assertEqual(api._chain, None)
+
+    def test_compose(self):
+        add = lambda n: lambda call, proceed: proceed(call) + n
+        self.assertEqual(compose([add('a'), add('b')], lambda c: '')(None),
+                         'ba')
+
+    def test_pool_views(self):
+        pool = ApiPool('key', 'secret', transport=self.transport,
+                       middleware=[Recorder('pool', self.seen)])
+        pool.view('token', 'secret').add_friend('s1')
+        pool.anonymous.get(['t1'])
+        self.assertEqual([entry[2:4] for entry in self.seen[::2]],
+                         [('addFriend', True), ('get', False)])
+
+
+class LayersTest(unittest.TestCase):
+
+    def setUp(self):
+        self.transport = FakeTransport()
+
+    def api(self, *layers):
+        return Api('key', 'secret', transport=self.transport,
+                   middleware=layers)
+
+    def test_timer(self):
+        timer = Timer()
+        api = self.api(timer)
+        api.get(['t1'])
+        self.assertRaises(RdioGenericAPIError, api.search, 'q', ['Track'])
+        report = timer.times.report()
+        self.assertEqual(report['get']['calls'], 1)
+        self.assertTrue(report['get']['bytes'] > 0)
+        self.assertEqual(report['search']['errors'], 1)
+
+    def test_throttle(self):
+        waits = []
+        limiter = RateLimiter(10, clock=lambda: 0, sleep=waits.append)
+        api = self.api(Throttle(limiter))
+        api.get(['t1'])
+        api.get(['t1'])
+        self.assertEqual(waits, [0.1])
+
+    def test_retry(self):
+        waits = []
+        retry = Retry(attempts=3, sleep=waits.append)
+        self.transport.failures = 2
+        self.assertEqual(self.api(retry).get(['t1'])[0].key, 't1')
+        self.assertEqual((retry.retries, waits), (2, [0.5, 1.0]))
+        self.transport.failures = 3
+        self.assertRaises(socket.error, self.api(retry).get, ['t1'])
+        self.transport.failures = 1
+        self.assertRaises(socket.error, self.api(retry).call_api,
+                          {'method': 'addFriend', 'user': 's1'})
+        self.assertRaises(RdioGenericAPIError, self.api(retry).search, 'q',
+                          ['Track'])
+        self.assertEqual(self.transport.methods[-1:], ['search'])
+
+    def test_logged(self):
+        records = []
+        class Handler(logging.Handler):
+            def emit(self, record): records.append(record)
+        logger = logging.getLogger('rdio.test')
+        logger.addHandler(Handler())
+        logger.setLevel(logging.DEBUG)
+        api = self.api(Logged(logger))
+        api.get(['t1'])
+        self.assertRaises(RdioGenericAPIError, api.search, 'q', ['Track'])
+        self.assertEqual([record.levelname for record in records],
+                         ['DEBUG', 'WARNING'])
+        self.assertTrue(records[0].getMessage().startswith('get '))
+
+    def test_response_cache(self):
+        now = [0]
+        cache = ResponseCache(size=2, ttl=10, clock=lambda: now[0])
+        api = self.api(cache)
+        first = api.get(['t1'])
+        self.assertTrue(api.get(['t1']) is first)
+        api.get(['t2'])
+        api.get(['t3'])
+        self.assertEqual(len(cache), 2)
+        api.get(['t1'])
+        now[0] = 11
+        api.get(['t3'])
+        api.get_playback_token()
+        api.get_playback_token()
+        self.assertEqual((cache.hits, cache.misses), (1, 5))
+        self.assertEqual(self.transport.methods.count('getPlaybackToken'), 2)
+        self.assertTrue('getPlaybackToken' not in READ_METHODS)
+
+    def test_response_cache_memory(self):
+        cache = ResponseCache()
+        api = self.api(cache)
+        first = api.get(['t1'])
+        api.get(['t2', 't3'])
+        usage = cache.memory_usage()
+        self.assertEqual((usage['entries'], usage['objects']), (2, 3))
+        self.assertEqual(cache.bytes, 0)
+        budget = ResponseCache(max_bytes=deep_size(first) * 2)
+        api = self.api(budget)
+        api.get(['t1'])
+        api.get(['t2'])
+        self.assertEqual(len(budget), 2)
+        self.assertTrue(budget.bytes <= budget.max_bytes)
+        api.get(['t3'])
+        self.assertEqual(len(budget), 2)
+        api.get(['t1', 't2', 't3', 't4', 't5'])
+        self.assertEqual((len(budget), budget.bytes), (0, 0))
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,91 @@
+import json
+import unittest
+import sys
+sys.path += ["../rdio"]
+from rdio import Api, RdioGenericAPIError, RdioActivityStream, RdioTrack
+from offload import DecodeOffloader, from_record, to_record
+import fixtures
+
+
+def attrs(obj):
+    return dict((k, v) for k, v in obj.__dict__.iteritems() if k != '_data')
+
+
+class StaticTransport(object):
+
+    def __init__(self, payload):
+        self.content = json.dumps(payload)
+
+    def request(self, url, body, headers):
+        return {'status': '200'}, self.content
+
+
+class RecordTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        stream = RdioActivityStream({
+            'last_id': 3, 'user': fixtures.user(),
+            'updates': [fixtures.activity(),
+                        fixtures.activity(update_type=3,
+                                          reviewed_item=fixtures.track())]})
+        rebuilt = from_record(to_record(stream))
+        self.assertTrue(isinstance(rebuilt, RdioActivityStream))
+        self.assertEqual(rebuilt._data, stream._data)
+        self.assertEqual(rebuilt.updates[1].reviewed_item._data,
+                         fixtures.track())
+        self.assertEqual(attrs(rebuilt.updates[1].reviewed_item),
+                         attrs(stream.updates[1].reviewed_item))
+        self.assertEqual(rebuilt.updates[0].date, stream.updates[0].date)
+
+    def test_names_are_shared(self):
+        records = to_record([RdioTrack(fixtures.track('t%d' % i))
+                             for i in range(3)])
+        self.assertTrue(records[0][1] is records[2][1])
+
+
+class DecodeOffloaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.offloader = DecodeOffloader(processes=1, threshold=0)
+
+    def tearDown(self):
+        self.offloader.close()
+
+    def api(self, payload):
+        return Api('ck', 'cs', transport=StaticTransport(payload),
+                   offloader=self.offloader)
+
+    def test_offloaded_decode(self):
+        api = self.api({'status': 'ok',
+                        'result': [fixtures.track(), fixtures.album()]})
+        track, album = api.get_tracks_for_artist('r1')
+        self.assertEqual(attrs(track), attrs(RdioTrack(fixtures.track())))
+        self.assertEqual(album.track_keys, ['t1', 't2'])
+        self.assertEqual(track._data, fixtures.track())
+
+    def test_offloaded_projection(self):
+        api = self.api({'status': 'ok', 'result': [fixtures.track()]})
+        track = api.get_tracks_for_artist('r1', fields=['name'])[0]
+        self.assertTrue(isinstance(track, RdioTrack))
+        self.assertEqual(sorted(attrs(track)), ['key', 'name'])
+
+    def test_offloaded_error(self):
+        api = self.api({'status': 'error', 'message': 'bad key'})
+        self.assertRaises(RdioGenericAPIError, api.get_tracks_for_artist,
+                          'r1')
+
+    def test_shared_objects_stay_shared(self):
+        api = self.api({'status': 'ok', 'result': {
+            'last_id': 1, 'user': fixtures.user(),
+            'updates': [fixtures.activity(), fixtures.activity()]}})
+        stream = api.get_activity_stream('s1', 'user')
+        self.assertTrue(stream.updates[0].owner is stream.updates[1].owner)
+        self.assertTrue(stream.user is stream.updates[0].owner)
+
+    def test_empty_result(self):
+        api = self.api({'status': 'ok', 'result': []})
+        self.assertEqual(api.get_tracks_for_artist('r1'), None)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,130 @@
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+import sys
+sys.path += ["../rdio"]
+from pager import AdaptivePager, INITIAL_COUNT
+from rdio import RdioSearchResult, RdioTrack
+import fixtures
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class Listing(object):
+    """A paginated method over total tracks that takes overhead plus
+    per_item seconds a track, and times out above timeout tracks."""
+
+    def __init__(self, clock, total, overhead=0.1, per_item=0.01,
+                 timeout=None):
+        self.clock = clock
+        self.total = total
+        self.overhead = overhead
+        self.per_item = per_item
+        self.timeout = timeout
+        self.counts = []
+
+    def get_tracks_in_collection(self, user=None, start=None, count=None):
+        self.counts.append(count)
+        if self.timeout and count > self.timeout: raise socket.timeout()
+        end = min(self.total, (start or 0) + count)
+        tracks = [RdioTrack(fixtures.track('t%d' % i))
+                  for i in range(start or 0, end)]
+        self.clock.now += self.overhead + self.per_item * len(tracks)
+        return tracks
+
+
+class AdaptivePagerTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'pager.json')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_pages_through_everything(self):
+        listing = Listing(self.clock, 1234)
+        pager = AdaptivePager(clock=self.clock)
+        keys = [track.key for track in
+                pager.items(listing.get_tracks_in_collection, user='s1')]
+        self.assertEqual(keys, ['t%d' % i for i in range(1234)])
+
+    def test_converges_on_target(self):
+        # overhead + per_item * count == target at count 90.
+        listing = Listing(self.clock, 100000)
+        pager = AdaptivePager(target=1.0, clock=self.clock)
+        pages = pager.pages(listing.get_tracks_in_collection)
+        for i in range(30): next(pages)
+        self.assertEqual(listing.counts[0], INITIAL_COUNT)
+        self.assertTrue(85 <= pager.count('get_tracks_in_collection') <= 95)
+
+    def test_stays_within_bounds(self):
+        listing = Listing(self.clock, 100000, per_item=0.0001)
+        pager = AdaptivePager(bounds={'get_tracks_in_collection': (20, 200)},
+                              clock=self.clock)
+        pages = pager.pages(listing.get_tracks_in_collection)
+        for i in range(20): next(pages)
+        self.assertEqual(max(listing.counts), 200)
+        listing.per_item = 1.0
+        for i in range(20): next(pages)
+        self.assertEqual(listing.counts[-1], 20)
+
+    def test_limits_payload_size(self):
+        listing = Listing(self.clock, 100000, per_item=0.0001)
+        pager = AdaptivePager(max_bytes=20000, clock=self.clock)
+        pages = pager.pages(listing.get_tracks_in_collection)
+        for i in range(20): next(pages)
+        learned = pager.learned['get_tracks_in_collection']
+        self.assertEqual(listing.counts[-1],
+                         int(20000 / learned['item_bytes']))
+
+    def test_halves_pages_that_time_out(self):
+        listing = Listing(self.clock, 30, timeout=20)
+        pager = AdaptivePager(clock=self.clock)
+        tracks = list(pager.items(listing.get_tracks_in_collection))
+        self.assertEqual(len(tracks), 30)
+        self.assertEqual(listing.counts[:3], [50, 25, 12])
+
+    def test_gives_up_after_retries(self):
+        listing = Listing(self.clock, 30, timeout=1)
+        pager = AdaptivePager(retries=2, clock=self.clock)
+        self.assertRaises(socket.timeout, list,
+                          pager.pages(listing.get_tracks_in_collection))
+        self.assertEqual(listing.counts, [50, 25, 12])
+
+    def test_pages_search_results(self):
+        def search(query, types, start=None, count=None):
+            results = [fixtures.track('t%d' % i)
+                       for i in range(start, min(start + count, 60))]
+            self.clock.now += 0.5
+            return RdioSearchResult({'results': results,
+                                     'number_results': 60})
+        pager = AdaptivePager(clock=self.clock)
+        tracks = list(pager.items(search, 'q', ['Track']))
+        self.assertEqual(len(tracks), 60)
+        self.assertTrue(pager.count('search') > INITIAL_COUNT)
+
+    def test_remembers_across_runs(self):
+        listing = Listing(self.clock, 100000)
+        pager = AdaptivePager(path=self.path, clock=self.clock)
+        pages = pager.pages(listing.get_tracks_in_collection)
+        for i in range(30): next(pages)
+        pager.save()
+        learned = pager.count('get_tracks_in_collection')
+        again = AdaptivePager(path=self.path, clock=self.clock)
+        self.assertEqual(again.count('get_tracks_in_collection'), learned)
+        self.assertEqual(again.count('user_followers'), INITIAL_COUNT)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,122 @@
+import threading
+import time
+import unittest
+import sys
+sys.path += ["../rdio"]
+import oauth2 as oauth
+from playback import PlaybackTokenCache
+
+
+class FakeApi(object):
+
+    def __init__(self, user=None, delay=0):
+        self._oauth_access_token = oauth.Token(user, 'x') if user else None
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def get_playback_token(self, domain=None):
+        with self.lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.delay)
+        return 'token-%s-%d' % (domain, calls)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class PlaybackTokenCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = PlaybackTokenCache(ttl=100, refresh_ahead=10,
+                                        clock=self.clock)
+
+    def test_cached_per_domain_and_user(self):
+        ben, ian = FakeApi('ben'), FakeApi('ian')
+        self.assertEqual(self.cache.get(ben, 'a.com'), 'token-a.com-1')
+        self.assertEqual(self.cache.get(ben, 'a.com'), 'token-a.com-1')
+        self.assertEqual(self.cache.get(ben, 'b.com'), 'token-b.com-2')
+        self.assertEqual(self.cache.get(ian, 'a.com'), 'token-a.com-1')
+        stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 3))
+
+    def test_expiry(self):
+        api = FakeApi('ben')
+        self.cache.get(api, 'a.com')
+        self.clock.now += 101
+        self.assertEqual(self.cache.get(api, 'a.com'), 'token-a.com-2')
+
+    def test_background_refresh(self):
+        api = FakeApi('ben')
+        self.cache.get(api, 'a.com')
+        self.clock.now += 95
+        self.assertEqual(self.cache.get(api, 'a.com'), 'token-a.com-1')
+        for i in range(100):
+            if self.cache.stats()['refreshes'] == 2: break
+            time.sleep(0.01)
+        self.clock.now += 10
+        self.assertEqual(self.cache.get(api, 'a.com'), 'token-a.com-2')
+        self.assertEqual(api.calls, 2)
+
+    def test_concurrent_loads_share_one_request(self):
+        api = FakeApi('ben', delay=0.05)
+        tokens = []
+        threads = [threading.Thread(
+            target=lambda: tokens.append(self.cache.get(api, 'a.com')))
+            for i in range(8)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(api.calls, 1)
+        self.assertEqual(set(tokens), set(['token-a.com-1']))
+        stats = self.cache.stats()
+        self.assertEqual(stats['hit_rate'], 7 / 8.0)
+        self.assertTrue(stats['refresh_mean'] >= 0.05)
+
+    def test_errors_are_not_cached(self):
+        class BrokenApi(FakeApi):
+            def get_playback_token(self, domain=None):
+                raise IOError('down')
+        self.assertRaises(IOError, self.cache.get, BrokenApi('ben'), 'a.com')
+        self.assertEqual(self.cache.get(FakeApi('ben'), 'a.com'),
+                         'token-a.com-1')
+        self.assertEqual(self.cache.stats()['errors'], 1)
+
+    def test_missing_tokens_are_not_cached(self):
+        class EmptyApi(FakeApi):
+            def get_playback_token(self, domain=None):
+                self.calls += 1
+        api = EmptyApi('ben')
+        self.assertEqual(self.cache.get(api, 'a.com'), None)
+        self.assertEqual(self.cache.get(api, 'a.com'), None)
+        self.assertEqual(api.calls, 2)
+        self.assertEqual(self.cache.stats()['size'], 0)
+
+    def test_bounded(self):
+        cache = PlaybackTokenCache(ttl=100, clock=self.clock, size=2)
+        apis = [FakeApi('u%d' % i) for i in range(3)]
+        cache.get(apis[0], 'a.com')
+        cache.get(apis[1], 'a.com')
+        cache.get(apis[0], 'a.com')
+        cache.get(apis[2], 'a.com')
+        self.assertEqual(cache.stats()['size'], 2)
+        cache.get(apis[0], 'a.com')
+        cache.get(apis[1], 'a.com')
+        self.assertEqual([api.calls for api in apis], [1, 2, 1])
+        self.clock.now += 101
+        cache.get(apis[2], 'a.com')
+        self.assertEqual(cache.stats()['size'], 1)
+        usage = cache.memory_usage()
+        self.assertEqual(usage['entries'], 1)
+        self.assertTrue(usage['total'] > 0)
+
+
+if __name__ == 'main':
+    unittest.main()
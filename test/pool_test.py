@@ -0,0 +1,111 @@
+import json
+import threading
+import time
+import unittest
+import sys
+sys.path += ["../rdio"]
+from urlparse import parse_qs
+from pool import ApiPool
+import fixtures
+
+
+class FakeTransport(object):
+
+    def __init__(self, delay=0):
+        self.delay = delay
+        self.bodies = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def request(self, url, body, headers):
+        with self.lock:
+            self.bodies.append(parse_qs(body))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock: self.active -= 1
+        params = parse_qs(body)
+        if params['method'] == ['get']:
+            result = dict((key, fixtures.track(key))
+                          for key in params['keys'][0].split(','))
+        else:
+            result = fixtures.user()
+        return {'status': '200'}, json.dumps(
+            {'status': 'ok', 'result': result})
+
+
+class ApiPoolTest(unittest.TestCase):
+
+    def test_views_share_consumer_and_transport(self):
+        transport = FakeTransport()
+        pool = ApiPool('ck', 'cs', transport=transport)
+        first, second = pool.view('k1', 's1'), pool.view('k2', 's2')
+        self.assertTrue(first._transport is second._transport is transport)
+        self.assertTrue(first._oauth_consumer is second._oauth_consumer)
+        self.assertTrue(pool.view('k1', 's1') is first)
+        first.current_user()
+        second.current_user()
+        self.assertEqual([b['oauth_token'] for b in transport.bodies],
+                         [['k1'], ['k2']])
+
+    def test_anonymous_view(self):
+        transport = FakeTransport()
+        pool = ApiPool('ck', 'cs', transport=transport)
+        pool.view().find_user(vanity_name='ben')
+        self.assertFalse('oauth_token' in transport.bodies[0])
+
+    def test_lru_eviction(self):
+        pool = ApiPool('ck', 'cs', transport=FakeTransport(), max_views=2)
+        first = pool.view('k1', 's1')
+        pool.view('k2', 's2')
+        pool.view('k1', 's1')
+        pool.view('k3', 's3')
+        self.assertEqual(len(pool), 2)
+        self.assertTrue(pool.view('k1', 's1') is first)
+
+    def test_concurrency_cap(self):
+        transport = FakeTransport(delay=0.02)
+        pool = ApiPool('ck', 'cs', transport=transport, max_concurrency=2)
+        view = pool.view('k1', 's1')
+        threads = [threading.Thread(target=view.current_user)
+                   for i in range(6)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(transport.peak, 2)
+        self.assertEqual(view.in_flight, 0)
+
+    def test_evicted_views_share_the_cap(self):
+        transport = FakeTransport(delay=0.02)
+        pool = ApiPool('ck', 'cs', transport=transport, max_views=1,
+                       max_concurrency=2)
+        first = pool.view('k1', 's1')
+        pool.view('k2', 's2')
+        second = pool.view('k1', 's1')
+        self.assertFalse(first is second)
+        threads = [threading.Thread(target=view.current_user)
+                   for view in (first, second) * 3]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(transport.peak, 2)
+
+    def anonymous_peak(self, **kwargs):
+        transport = FakeTransport(delay=0.02)
+        pool = ApiPool('ck', 'cs', transport=transport, max_concurrency=2,
+                       **kwargs)
+        results = []
+        def get():
+            results.append(pool.view().get(['t1'])[0].key)
+        threads = [threading.Thread(target=get) for i in range(6)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(results, ['t1'] * 6)
+        return transport.peak
+
+    def test_anonymous_calls_are_not_capped_per_user(self):
+        self.assertEqual(self.anonymous_peak(), 6)
+        self.assertEqual(self.anonymous_peak(anonymous_concurrency=3), 3)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,125 @@
+import threading
+import time
+import unittest
+import sys
+sys.path += ["../rdio"]
+from fakeserver import Catalog, FakeRdioServer
+from prefetch import Prefetcher
+from throttle import RateLimiter
+
+
+class PrefetcherTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = FakeRdioServer(catalog=Catalog(artists=20)).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def api(self, prefetcher, *inner):
+        self.prefetcher = prefetcher
+        return self.server.api(connections=4,
+                               middleware=[prefetcher] + list(inner))
+
+    def gets(self):
+        return self.server.requests.get('get', 0)
+
+    def test_prefetches_top_results(self):
+        api = self.api(Prefetcher(top=2, tracks=3))
+        albums = api.get_top_charts('Album')
+        self.prefetcher.join()
+        self.assertEqual(self.gets(), 2)
+        self.assertEqual(len(self.prefetcher), 2 + 6)
+        album = api.get([albums[0].key], extras=['trackKeys'])[0]
+        self.assertEqual(album.key, albums[0].key)
+        tracks = api.get(album.track_keys[:3])
+        self.assertEqual([t.key for t in tracks], album.track_keys[:3])
+        self.assertEqual(self.gets(), 2)
+        found = api.get([albums[2].key, albums[1].key])
+        self.assertEqual([a.key for a in found],
+                         [albums[2].key, albums[1].key])
+        self.assertEqual(self.gets(), 3)
+        api.get([albums[1].key], extras=['playCount'])
+        self.assertEqual(self.gets(), 4)
+        projected = api.get([albums[1].key], fields=['name'])[0]
+        self.assertEqual(projected.name, albums[1].name)
+        self.assertEqual(self.gets(), 5)
+        stats = self.prefetcher.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (5, 2))
+        self.assertEqual((stats['prefetched'], stats['used']), (8, 5))
+        self.assertAlmostEqual(stats['waste'], 3 / 8.0)
+        usage = self.prefetcher.memory_usage()
+        self.assertEqual((usage['entries'], usage['objects']), (8, 8))
+        self.prefetcher.close()
+
+    def test_memory_budget(self):
+        api = self.api(Prefetcher(top=5, tracks=0, max_bytes=1))
+        api.get_top_charts('Album')
+        self.prefetcher.join()
+        self.assertEqual((len(self.prefetcher), self.prefetcher.bytes),
+                         (0, 0))
+        self.prefetcher.max_bytes = 10 ** 6
+        api.get_top_charts('Artist')
+        self.prefetcher.join()
+        self.assertEqual(len(self.prefetcher), 5)
+        self.assertTrue(0 < self.prefetcher.bytes <= 10 ** 6)
+
+    def test_search(self):
+        api = self.api(Prefetcher(top=1, tracks=0))
+        result = api.search('query', ['Album', 'Track'])
+        self.prefetcher.join()
+        self.assertEqual(self.gets(), 1)
+        api.get([result.results[0].key], extras=['trackKeys'])
+        self.assertEqual(self.gets(), 1)
+        api.search('query', ['Album', 'Track'])
+        self.prefetcher.join()
+        self.assertEqual(self.gets(), 1)
+
+    def test_waits_for_other_calls(self):
+        release = threading.Event()
+        def hold(call, proceed):
+            if call.method == 'currentUser': release.wait()
+            return proceed(call)
+        api = self.api(Prefetcher(top=1), hold)
+        caller = threading.Thread(target=api.current_user)
+        caller.start()
+        try:
+            time.sleep(0.05)
+            api.get_top_charts('Track')
+            time.sleep(0.1)
+            self.assertEqual(self.gets(), 0)
+        finally:
+            release.set()
+            caller.join()
+        self.prefetcher.join()
+        self.assertEqual(self.gets(), 1)
+
+    def test_stops_under_pressure(self):
+        limiter = RateLimiter(1, burst=2)
+        api = self.api(Prefetcher(limiter=limiter, reserve=2))
+        limiter.acquire()
+        api.get_top_charts('Album')
+        self.prefetcher.join()
+        self.assertEqual(self.gets(), 0)
+        self.assertEqual(self.prefetcher.stats()['skipped'], 1)
+
+    def test_backs_off_after_errors(self):
+        now = [0]
+        def fail(call, proceed):
+            if call.method == 'get': raise IOError('over rate limit')
+            return proceed(call)
+        api = self.api(Prefetcher(cooldown=10, clock=lambda: now[0]), fail)
+        api.get_top_charts('Album')
+        self.prefetcher.join()
+        api.get_top_charts('Track')
+        self.prefetcher.join()
+        stats = self.prefetcher.stats()
+        self.assertEqual((stats['errors'], stats['skipped']), (1, 1))
+        now[0] = 11
+        api.get_top_charts('Artist')
+        self.prefetcher.join()
+        self.assertEqual(self.prefetcher.stats()['errors'], 2)
+
+
+if __name__ == 'main':
+    unittest.main()
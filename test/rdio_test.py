@@ -1,7 +1,12 @@
+import json
+import threading
 import unittest
 import sys
+from urlparse import parse_qsl
 sys.path += ["../rdio"]
 from rdio import Api, validate_email
+import rdio
+import fixtures
 
 
 class RdioTest(unittest.TestCase):
@@ -14,5 +19,184 @@ class RdioTest(unittest.TestCase):
         self.assertEqual(validate_email('ben@kree.info'), 1)
 
 
+class DecoderTest(unittest.TestCase):
+
+    def test_registry_covers_every_type(self):
+        self.assertEqual(sorted(rdio.rdio_registry), sorted(rdio.rdio_types))
+
+    def test_decode_track(self):
+        track = rdio.derive_rdio_type_from_data(fixtures.track())
+        self.assertTrue(isinstance(track, rdio.RdioTrack))
+        self.assertEqual(track.key, 't1')
+        self.assertEqual(track.rdio_type, 'track')
+        self.assertEqual(track.duration.seconds, 215)
+        self.assertEqual(track.play_count, -1)
+        self.assertEqual(track.is_on_compilation, None)
+        self.assertEqual(track.big_icon, None)
+
+    def test_decode_stations(self):
+        for code, cls in (('rr', rdio.RdioArtistStation),
+                          ('tr', rdio.RdioArtistTopSongsStation),
+                          ('h', rdio.RdioHeavyRotationStation),
+                          ('e', rdio.RdioHeavyRotationUserStation),
+                          ('c', rdio.RdioUserCollectionStation)):
+            station = rdio.derive_rdio_type_from_data(
+                fixtures.station(rdio_type=code))
+            self.assertTrue(isinstance(station, cls))
+            self.assertEqual(station.track_keys, None)
+
+    def test_decode_collection_types(self):
+        album = rdio.derive_rdio_type_from_data(fixtures.album(type='al'))
+        self.assertTrue(isinstance(album, rdio.RdioAlbum))
+        self.assertEqual(album.rdio_type, 'album in collection')
+
+    def test_unknown_type(self):
+        self.assertEqual(
+            rdio.derive_rdio_type_from_data({'type': 'zz'}), None)
+
+    def test_mutable_defaults_are_not_shared(self):
+        data = fixtures.album()
+        del data['trackKeys']
+        first, second = rdio.RdioAlbum(data), rdio.RdioAlbum(data)
+        first.track_keys.append('t1')
+        self.assertEqual(second.track_keys, [])
+
+    def test_playlist_tracks(self):
+        playlist = rdio.RdioPlaylist(fixtures.playlist(
+            tracks=[fixtures.track('t5'), fixtures.track('t6')]))
+        self.assertEqual(playlist.track_keys, ['t5', 't6'])
+        self.assertFalse(hasattr(rdio.RdioPlaylist(fixtures.playlist()),
+                                 'tracks'))
+
+    def test_user_post_decode(self):
+        user = rdio.RdioUser(fixtures.user(lastSongPlayed=fixtures.track()))
+        self.assertEqual(user.name, 'Ben Kreeger')
+        self.assertEqual(user.gender_posessive, 'his')
+        self.assertTrue(isinstance(user.last_song_played, rdio.RdioTrack))
+
+    def test_activity_item(self):
+        item = rdio.RdioActivityItem(fixtures.activity())
+        self.assertEqual(item.verbose_update_type,
+                         'Ben Kreeger added some music to his collection.')
+        self.assertEqual(item.subject, item.albums)
+
+    def test_compile_subclass(self):
+        class RdioRatedTrack(rdio.RdioTrack):
+            schema = (rdio.optional('rating', 'rating', 0),)
+        rdio.compile_decoder(RdioRatedTrack)
+        track = RdioRatedTrack(fixtures.track(rating=4))
+        self.assertEqual((track.key, track.rating), ('t1', 4))
+
+
+class IdentityMapTest(unittest.TestCase):
+
+    def stream(self):
+        return {'last_id': 1, 'user': fixtures.user('s1'), 'updates': [
+            fixtures.activity(fixtures.user('s1')),
+            fixtures.activity(fixtures.user('s2'), albums=[
+                fixtures.album('a1'), fixtures.album('a2')]),
+            fixtures.activity(fixtures.user('s1'), albums=[
+                fixtures.album('a1', trackKeys=['t9'])]),
+        ]}
+
+    def test_repeats_in_a_response_are_shared(self):
+        stream = rdio.parse_response(
+            json.dumps({'status': 'ok', 'result': self.stream()}),
+            rdio.RdioActivityStream)
+        first, second, third = stream.updates
+        self.assertTrue(first.owner is third.owner)
+        self.assertTrue(first.owner is stream.user)
+        self.assertFalse(first.owner is second.owner)
+        self.assertTrue(first.albums[0] is second.albums[0])
+        # The same key with different data is decoded on its own.
+        self.assertFalse(first.albums[0] is third.albums[0])
+        self.assertEqual(third.albums[0].track_keys, ['t9'])
+
+    def test_only_within_a_response(self):
+        stream = rdio.RdioActivityStream(self.stream())
+        self.assertFalse(stream.updates[0].owner is stream.updates[2].owner)
+        results = [rdio.parse_response(json.dumps(
+            {'status': 'ok', 'result': [fixtures.track()]}),
+            rdio.parse_result_list)[0] for i in range(2)]
+        self.assertFalse(results[0] is results[1])
+
+
+class ProjectionTest(unittest.TestCase):
+
+    def test_extras(self):
+        projection = rdio.project(['name', 'album_key'])
+        self.assertEqual(projection.extras[0], '-*')
+        for name in ('key', 'type', 'name', 'albumKey', 'firstName',
+                     'lastName'):
+            self.assertTrue(name in projection.extras, name)
+        self.assertFalse('embedUrl' in projection.extras)
+        self.assertTrue(rdio.project(['album_key', 'name']) is projection)
+
+    def test_projected_objects(self):
+        track, user = rdio.parse_result_list(
+            [fixtures.track(), fixtures.user()], ['name'])
+        self.assertTrue(isinstance(track, rdio.RdioTrack))
+        self.assertEqual(sorted(track.__dict__), ['_data', 'key', 'name'])
+        self.assertEqual(user.name, 'Ben Kreeger')
+        self.assertFalse(hasattr(user, 'gender'))
+
+    def test_api_fields(self):
+        api = Api()
+        sent = []
+        def call_api(data, decoder=None):
+            sent.append(data)
+            return decoder([fixtures.track()])
+        api.call_api = call_api
+        tracks = api.get_tracks_for_artist('r1', extras=['playCount'],
+                                           fields=['key', 'name'])
+        self.assertEqual(tracks[0].name, 'Name t1')
+        self.assertFalse(hasattr(tracks[0], 'duration'))
+        extras = sent[0]['extras'].split(',')
+        self.assertEqual(extras[0], '-*')
+        self.assertTrue('playCount' in extras)
+
+
+class RecordingTransport(object):
+
+    def __init__(self):
+        self.signed = []
+        self.lock = threading.Lock()
+
+    def request(self, url, body, headers):
+        params = dict(parse_qsl(body))
+        with self.lock:
+            self.signed.append((params['oauth_consumer_key'],
+                                params.get('oauth_token')))
+        return {'status': '200'}, '{"status": "ok", "result": "x"}'
+
+
+class ThreadSafetyTest(unittest.TestCase):
+
+    def test_connections_make_a_pooled_transport(self):
+        api = Api('key', 'secret', connections=8)
+        self.assertTrue(isinstance(api._transport, rdio.PooledHttpTransport))
+        self.assertEqual(api._transport.size, 8)
+        self.assertTrue(isinstance(Api()._transport, rdio.HttpTransport))
+
+    def test_credentials_are_swapped_whole(self):
+        transport = RecordingTransport()
+        api = Api('a', 'a', 'a', 'a', transport=transport)
+        self.assertRaises(AttributeError, setattr, api._credentials,
+                          'token', None)
+        stop = threading.Event()
+        def call():
+            while not stop.is_set(): api.get_playback_token()
+        threads = [threading.Thread(target=call) for i in range(4)]
+        for thread in threads: thread.start()
+        for i in range(300):
+            name = 'ab'[i % 2]
+            api.set_credentials(name, name, name, name)
+        stop.set()
+        for thread in threads: thread.join()
+        self.assertTrue(len(transport.signed) > 4)
+        for consumer_key, token in transport.signed:
+            self.assertEqual(consumer_key, token)
+
+
 if __name__ == 'main':
     unittest.main()
@@ -0,0 +1,135 @@
+import json
+import threading
+import time
+import unittest
+import sys
+sys.path += ["../rdio"]
+from urlparse import parse_qsl
+from rdio import Api, RdioAlbum, RdioTrack
+from resolve import BulkResolver, normalize
+import fixtures
+
+
+class FakeApi(object):
+
+    def __init__(self):
+        self.calls = []
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def _call(self, name, arg):
+        with self.lock:
+            self.calls.append((name, arg))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(0.01)
+        with self.lock: self.active -= 1
+
+    def get_object_from_short_code(self, short_code):
+        self._call('short_code', short_code)
+        if short_code == 'boom': raise IOError('boom')
+        if short_code == 'nope': return None
+        return RdioTrack(fixtures.track('t' + short_code))
+
+    def get_object_from_url(self, url):
+        self._call('url', url)
+        return RdioAlbum(fixtures.album('a1'))
+
+    def get(self, keys, extras=[]):
+        self._call('get', (tuple(keys), tuple(extras)))
+        return [RdioTrack(fixtures.track(key, playCount=7))
+                for key in keys if key.startswith('t')]
+
+
+class FakeTransport(object):
+
+    def request(self, url, body, headers):
+        params = dict(parse_qsl(body))
+        if params['method'] == 'getObjectFromShortCode':
+            result = fixtures.track('t' + params['short_code'])
+        else:
+            result = dict((key, fixtures.track(key, playCount=7))
+                          for key in params['keys'].split(','))
+        return {'status': '200'}, json.dumps({'status': 'ok',
+                                              'result': result})
+
+
+class NormalizeTest(unittest.TestCase):
+
+    def test_forms(self):
+        self.assertEqual(normalize('http://rd.io/x/QisqDDdvIg/'),
+                         ('short_code', 'QisqDDdvIg'))
+        self.assertEqual(normalize(' rd.io/x/QisqDDdvIg '),
+                         ('short_code', 'QisqDDdvIg'))
+        self.assertEqual(normalize('QisqDDdvIg'), ('short_code', 'QisqDDdvIg'))
+        self.assertEqual(
+            normalize('http://www.rdio.com/artist/Aphex_Twin/?x=1#top'),
+            ('url', '/artist/Aphex_Twin/'))
+        self.assertEqual(normalize('/artist/Aphex_Twin'),
+                         ('url', '/artist/Aphex_Twin/'))
+        for item in ('', None, 'http://example.com/x/abc/', 'rd.io/y/abc'):
+            self.assertRaises(ValueError, normalize, item)
+
+
+class BulkResolverTest(unittest.TestCase):
+
+    def setUp(self):
+        self.api = FakeApi()
+        self.resolver = BulkResolver(self.api, concurrency=3)
+
+    def tearDown(self):
+        self.resolver.close()
+
+    def test_dedupes_and_keeps_input_order(self):
+        items = ['rd.io/x/1/', '2', 'http://rd.io/x/1', 'nope', 'boom',
+                 'example.com/x', '/album/a/', 'http://www.rdio.com/album/a']
+        results = self.resolver.resolve(items)
+        self.assertEqual([r.item for r in results], items)
+        self.assertEqual(results[0].object.key, 't1')
+        self.assertTrue(results[0].object is results[2].object)
+        self.assertEqual(results[1].object.key, 't2')
+        self.assertEqual((results[3].object, results[3].error), (None, None))
+        self.assertTrue(isinstance(results[4].error, IOError))
+        self.assertTrue(isinstance(results[5].error, ValueError))
+        self.assertTrue(results[6].object is results[7].object)
+        self.assertEqual(len(self.api.calls), 5)
+        self.assertTrue(1 < self.api.peak <= 3)
+
+    def test_cache(self):
+        self.resolver.resolve(['1', '2', 'boom'])
+        self.api.calls = []
+        results = self.resolver.resolve(['2', '1', 'boom'])
+        self.assertEqual([r.object.key for r in results[:2]], ['t2', 't1'])
+        self.assertEqual(self.api.calls, [('short_code', 'boom')])
+        self.assertEqual((self.resolver.hits, self.resolver.misses), (2, 4))
+        usage = self.resolver.memory_usage()
+        self.assertEqual(usage['objects'], 2)
+        self.assertTrue(usage['total'] > 0)
+
+    def test_hydrates_in_chunks(self):
+        self.resolver.chunk_size = 2
+        results = self.resolver.resolve(['1', '2', '3', '1', 'nope'],
+                                        extras=['playCount'])
+        self.assertEqual([r.object.play_count for r in results[:4]],
+                         [7] * 4)
+        gets = [arg for name, arg in self.api.calls if name == 'get']
+        self.assertEqual(sorted(len(keys) for keys, extras in gets), [1, 2])
+        self.assertEqual(sorted(k for keys, extras in gets for k in keys),
+                         ['t1', 't2', 't3'])
+
+    def test_hydrates_through_an_api(self):
+        api = Api('key', 'secret', 'token', 'secret',
+                  transport=FakeTransport())
+        resolver = BulkResolver(api, concurrency=1, chunk_size=2)
+        try:
+            results = resolver.resolve(['1', '2', '3'],
+                                       extras=['playCount'])
+        finally:
+            resolver.close()
+        self.assertEqual([(r.object.key, r.object.play_count, r.error)
+                          for r in results],
+                         [('t1', 7, None), ('t2', 7, None), ('t3', 7, None)])
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+import unittest
+import sys
+sys.path += ["../rdio"]
+from rdio import (UTC, RdioActivityStream, RdioPlaylist, RdioPlaylistSet,
+                  RdioSearchResult, RdioTrack, RdioUser,
+                  derive_rdio_type_from_data, parse_result_list)
+from serialize import dump, load
+import fixtures
+
+
+class SerializeTest(unittest.TestCase):
+
+    def assertSameObject(self, loaded, original):
+        self.assertEqual(type(loaded), type(original))
+        self.assertEqual(loaded._data, None)
+        expected = dict(original.__dict__)
+        del expected['_data']
+        actual = dict(loaded.__dict__)
+        del actual['_data']
+        self.assertEqual(sorted(actual), sorted(expected))
+        for name, value in expected.iteritems():
+            if hasattr(value, '_data'):
+                self.assertSameObject(actual[name], value)
+            elif isinstance(value, list) and value and hasattr(value[0],
+                                                               '_data'):
+                for a, b in zip(actual[name], value):
+                    self.assertSameObject(a, b)
+            else:
+                self.assertEqual(actual[name], value)
+
+    def test_every_registered_model(self):
+        payloads = [fixtures.artist(), fixtures.album(), fixtures.track(),
+                    fixtures.playlist(tracks=[fixtures.track('t5')]),
+                    fixtures.user(lastSongPlayed=fixtures.track('t9'),
+                                  lastSongPlayTime='2011-06-01T12:00:00'),
+                    fixtures.station('rr1', 'rr', trackKeys=['t1']),
+                    fixtures.station('h1', 'h'),
+                    fixtures.station('tr1', 'tr', trackKeys=['t1']),
+                    fixtures.station('c1', 'c'),
+                    fixtures.station('e1', 'e')]
+        for data in payloads:
+            original = derive_rdio_type_from_data(data)
+            self.assertSameObject(load(dump(original)), original)
+
+    def test_containers(self):
+        stream = RdioActivityStream({
+            'last_id': 5, 'user': fixtures.user(),
+            'updates': [fixtures.activity(),
+                        fixtures.activity(update_type=3,
+                                          reviewed_item=fixtures.track('t2'),
+                                          comment=u'néat')]})
+        loaded = load(dump(stream))
+        self.assertSameObject(loaded, stream)
+        self.assertEqual(loaded.updates[1].subject, u'néat')
+        self.assertEqual(loaded.updates[0].date.tzinfo, UTC)
+        playlists = RdioPlaylistSet({'owned': [fixtures.playlist()],
+                                     'collab': [], 'subscribed': []})
+        self.assertSameObject(load(dump(playlists)), playlists)
+        search = RdioSearchResult({'results': [fixtures.album()],
+                                   'number_results': 1})
+        self.assertSameObject(load(dump(search)), search)
+
+    def test_shared_objects_stay_shared(self):
+        owner = RdioUser(fixtures.user())
+        tracks = [RdioTrack(fixtures.track()), owner, owner]
+        loaded = load(dump(tracks))
+        self.assertTrue(loaded[1] is loaded[2])
+        self.assertFalse(loaded[0] is loaded[1])
+
+    def test_projected_models(self):
+        tracks = parse_result_list([fixtures.track()], fields=['name'])
+        loaded = load(dump(tracks))[0]
+        self.assertEqual(type(loaded), type(tracks[0]))
+        self.assertEqual(loaded.name, 'Name t1')
+
+    def test_plain_values(self):
+        value = {'a': [1, -1, 2 ** 70, -2 ** 70, 0.1, None, True, False],
+                 u'é': ('x', u'x'), 'when': datetime(2011, 1, 2, 3, 4, 5, 6),
+                 'utc': datetime(1999, 12, 31, 23, 59, tzinfo=UTC),
+                 'long': timedelta(-3, 5, 7)}
+        loaded = load(dump(value))
+        self.assertEqual(loaded, value)
+        self.assertEqual([type(v) for v in loaded[u'é']], [str, unicode])
+        self.assertRaises(TypeError, dump, object())
+        self.assertRaises(ValueError, load, 'nope')
+
+    def test_smaller_than_pickle(self):
+        import cPickle
+        tracks = [RdioTrack(fixtures.track('t%d' % i)) for i in range(50)]
+        self.assertTrue(len(dump(tracks)) * 2 < len(cPickle.dumps(tracks, 2)))
+
+
+if __name__ == 'main':
+    unittest.main()
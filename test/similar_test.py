@@ -0,0 +1,80 @@
+import unittest
+import sys
+sys.path += ["../rdio"]
+from rdio import RdioArtist, RdioUser
+from similar import ArtistSimilarity
+import fixtures
+
+
+class FakeApi(object):
+
+    def __init__(self, collections, following):
+        self.collections = collections
+        self.following = following
+        self.calls = []
+
+    def get_artists_in_collection(self, user=None, start=None, count=None,
+                                  sort=None):
+        self.calls.append((user, start))
+        keys = self.collections.get(user, [])[start:start + count]
+        return [RdioArtist(fixtures.artist(key)) for key in keys] or None
+
+    def user_following(self, user, start=None, count=None):
+        # Like the API, answer with a short default page without a count.
+        start, count = start or 0, count or 2
+        return [RdioUser(fixtures.user(key))
+                for key in self.following.get(user, [])[start:start + count]]
+
+
+class ArtistSimilarityTest(unittest.TestCase):
+
+    def setUp(self):
+        self.matrix = ArtistSimilarity()
+        self.matrix.add('s1', ['r1', 'r2', 'r3'])
+        self.matrix.add('s2', ['r1', 'r2'])
+        self.matrix.add('s3', ['r1', 'r4'])
+        self.matrix.add('s4', ['r2', 'r4', 'r4'])
+
+    def test_add(self):
+        self.assertEqual(len(self.matrix), 9)
+        self.assertEqual(self.matrix.fans('r1'), 3)
+        self.matrix.add('s3', ['r1', RdioArtist(fixtures.artist('r5'))])
+        self.assertEqual(len(self.matrix), 10)
+        self.assertEqual(self.matrix.fans('r1'), 3)
+        self.assertEqual(self.matrix.fans('r5'), 1)
+        self.assertEqual(self.matrix.fans('r9'), 0)
+
+    def test_co_occurrence(self):
+        self.assertEqual(self.matrix.co_occurrence('r1'),
+                         {'r2': 2, 'r3': 1, 'r4': 1})
+        self.assertEqual(self.matrix.co_occurrence('r9'), {})
+
+    def test_similar(self):
+        similar = self.matrix.similar('r1')
+        self.assertEqual([key for key, score in similar], ['r2', 'r3', 'r4'])
+        self.assertAlmostEqual(similar[0][1], 2 / 3.0)
+        self.assertAlmostEqual(similar[1][1], 1 / 3.0 ** 0.5)
+        self.assertEqual(self.matrix.similar('r1', k=1), similar[:1])
+        self.assertEqual([key for key, score in
+                          self.matrix.similar('r1', min_fans=2)],
+                         ['r2', 'r4'])
+        self.assertEqual(self.matrix.similar('r9'), [])
+
+    def test_crawl(self):
+        api = FakeApi({'s1': ['r1', 'r2', 'r3'], 's2': ['r1', 'r2'],
+                       's3': ['r2', 'r4'], 's4': ['r9']},
+                      {'s1': ['s2', 's3', 's5'], 's2': ['s1', 's4']})
+        matrix = ArtistSimilarity.crawl(api, 's1', page_size=2)
+        self.assertEqual(sorted(matrix.user_keys), ['s1', 's2', 's3', 's5'])
+        self.assertEqual(len(matrix), 7)
+        self.assertEqual(matrix.similar('r1', k=1)[0][0], 'r2')
+        self.assertEqual(sorted(api.calls)[:2], [('s1', 0), ('s1', 2)])
+        deeper = ArtistSimilarity.crawl(api, 's1', depth=2)
+        self.assertEqual(sorted(deeper.user_keys),
+                         ['s1', 's2', 's3', 's4', 's5'])
+        limited = ArtistSimilarity.crawl(api, 's1', depth=2, limit=2)
+        self.assertEqual(len(limited.user_keys), 2)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import unittest
+import sys
+sys.path += ["../rdio"]
+from rdio import RdioAlbum, RdioArtist, RdioTrack
+from snapshot import Snapshot, write_snapshot
+import fixtures
+
+
+class SnapshotTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'catalog.snapshot')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_lookup(self):
+        objects = ([RdioTrack(fixtures.track('t%d' % i)) for i in range(500)]
+                   + [fixtures.album('a1', name=u'Homogenic é')]
+                   + [RdioArtist(fixtures.artist(u'ré1'))])
+        self.assertEqual(write_snapshot(self.path, iter(objects)), 502)
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(len(snapshot), 502)
+            track = snapshot['t123']
+            self.assertTrue(isinstance(track, RdioTrack))
+            self.assertEqual(track.name, 'Name t123')
+            album = snapshot.get('a1')
+            self.assertTrue(isinstance(album, RdioAlbum))
+            self.assertEqual(album.name, u'Homogenic é')
+            self.assertEqual(snapshot.get(u'ré1').key, u'ré1')
+            self.assertTrue('t0' in snapshot)
+            self.assertFalse('t500' in snapshot)
+            self.assertEqual(snapshot.get('missing'), None)
+            self.assertRaises(KeyError, snapshot.__getitem__, 'missing')
+            self.assertEqual(sorted(snapshot.get_many(['t1', 'x', 't2'])),
+                             ['t1', 't2'])
+            keys = list(snapshot.keys())
+            self.assertEqual(keys[:2], ['t0', 't1'])
+            self.assertEqual(len(keys), 502)
+
+    def test_empty_and_invalid(self):
+        write_snapshot(self.path, [])
+        with Snapshot(self.path) as snapshot:
+            self.assertEqual(len(snapshot), 0)
+            self.assertEqual(snapshot.get('t1'), None)
+        with open(self.path, 'wb') as f: f.write('x' * 64)
+        self.assertRaises(ValueError, Snapshot, self.path)
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,126 @@
+import threading
+import time
+import unittest
+import sys
+sys.path += ["../rdio"]
+from rdio import RdioArtistStation, RdioTrack, derive_rdio_type_from_data
+from stations import StationQueue
+import fixtures
+
+
+class FakeApi(object):
+
+    def __init__(self, stations=()):
+        self.calls = []
+        self.stations = list(stations)
+        self.lock = threading.Lock()
+
+    def get(self, keys, extras=[]):
+        with self.lock: self.calls.append(list(keys))
+        if keys[0].startswith('rr'):
+            return [derive_rdio_type_from_data(self.stations.pop(0))]
+        return [RdioTrack(fixtures.track(key)) for key in keys
+                if key != 'missing']
+
+
+class StationQueueTest(unittest.TestCase):
+
+    def station(self, keys, **extra):
+        return RdioArtistStation(fixtures.station(trackKeys=keys, **extra))
+
+    def test_plays_in_order_with_batched_gets(self):
+        api = FakeApi()
+        keys = ['t%d' % i for i in range(20)]
+        queue = StationQueue(api, self.station(keys), lookahead=6,
+                             repeat=False)
+        self.assertEqual([track.key for track in queue], keys)
+        self.assertTrue(all(len(call) <= 6 for call in api.calls))
+        self.assertTrue(all(len(call) >= 3 for call in api.calls[:-1]))
+
+    def test_lookahead_is_bounded(self):
+        api = FakeApi()
+        queue = StationQueue(api, self.station(['t%d' % i
+                                                for i in range(20)]),
+                             lookahead=4, repeat=False)
+        queue.next()
+        queue.next(timeout=1)
+        self.assertTrue(len(queue) <= 4)
+        queue.close()
+        self.assertRaises(ValueError, StationQueue, api,
+                          self.station(['t1']), lookahead=0)
+
+    def test_decodes_track_data_without_fetching(self):
+        api = FakeApi()
+        station = RdioArtistStation(fixtures.station(
+            tracks=[fixtures.track('t8'), fixtures.track('t9')]))
+        queue = StationQueue(api, station, repeat=False)
+        self.assertEqual([track.key for track in queue], ['t8', 't9'])
+        self.assertEqual(api.calls, [])
+
+    def test_skips_unknown_keys(self):
+        queue = StationQueue(FakeApi(), self.station(['t1', 'missing', 't2']),
+                             repeat=False)
+        self.assertEqual([track.key for track in queue], ['t1', 't2'])
+
+    def test_repeat(self):
+        queue = StationQueue(FakeApi(), self.station(['t1', 't2']))
+        self.assertEqual([queue.next().key for i in range(5)],
+                         ['t1', 't2', 't1', 't2', 't1'])
+        queue.close()
+
+    def test_reload_on_repeat(self):
+        api = FakeApi([fixtures.station(trackKeys=['t3', 't4'])])
+        queue = StationQueue(api, self.station(['t1', 't2'],
+                                               reloadOnRepeat=True))
+        self.assertEqual([queue.next().key for i in range(4)],
+                         ['t1', 't2', 't3', 't4'])
+        self.assertEqual(queue.reloads, 1)
+        queue.close()
+
+    def test_errors_surface(self):
+        class BrokenApi(object):
+            def get(self, keys, extras=[]):
+                raise ValueError('boom')
+        queue = StationQueue(BrokenApi(), self.station(['t1']))
+        self.assertRaises(ValueError, queue.next)
+
+    def test_timed_next_sees_the_end(self):
+        release = threading.Event()
+        class SlowApi(FakeApi):
+            def get(self, keys, extras=[]):
+                release.wait()
+                return []
+        queue = StationQueue(SlowApi(), self.station(['missing']),
+                             repeat=False)
+        outcome = []
+        def play():
+            try: outcome.append(queue.next(timeout=5))
+            except StopIteration: outcome.append(StopIteration)
+        caller = threading.Thread(target=play)
+        caller.start()
+        time.sleep(0.05)
+        release.set()
+        caller.join()
+        self.assertEqual(outcome, [StopIteration])
+
+    def test_timed_next_waits_out_other_wakeups(self):
+        release = threading.Event()
+        class SlowApi(FakeApi):
+            def get(self, keys, extras=[]):
+                release.wait()
+                return FakeApi.get(self, keys, extras)
+        queue = StationQueue(SlowApi(), self.station(['t1']))
+        def wake():
+            time.sleep(0.05)
+            with queue._condition: queue._condition.notify_all()
+        threading.Thread(target=wake).start()
+        start = time.time()
+        self.assertEqual(queue.next(timeout=0.2), None)
+        self.assertTrue(time.time() - start >= 0.2)
+        release.set()
+        self.assertEqual(queue.next(timeout=5).key, 't1')
+        queue.close()
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+import sys
+sys.path += ["../rdio"]
+from throttle import RateLimiter, ThrottledTransport
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+
+
+class RateLimiterTest(unittest.TestCase):
+
+    def test_bursts_then_spaces_calls(self):
+        clock = Clock()
+        limiter = RateLimiter(10, burst=2, clock=clock, sleep=clock.sleep)
+        waits = [limiter.acquire() for i in range(4)]
+        self.assertEqual(waits[:2], [0.0, 0.0])
+        self.assertAlmostEqual(waits[2], 0.1)
+        self.assertAlmostEqual(waits[3], 0.2)
+        self.assertEqual(limiter.waits, 2)
+        clock.now = 10.0
+        self.assertEqual(limiter.acquire(), 0.0)
+
+    def test_available(self):
+        clock = Clock()
+        limiter = RateLimiter(10, burst=2, clock=clock, sleep=clock.sleep)
+        self.assertEqual(limiter.available(), 2)
+        for i in range(3): limiter.acquire()
+        self.assertAlmostEqual(limiter.available(), -1)
+        clock.now = 0.15
+        self.assertAlmostEqual(limiter.available(), 0.5)
+        clock.now = 10.0
+        self.assertEqual(limiter.available(), 2)
+
+    def test_throttled_transport(self):
+        clock = Clock()
+        limiter = RateLimiter(1, clock=clock, sleep=clock.sleep)
+        class Transport(object):
+            def request(self, url, body, headers): return {}, 'ok'
+        transport = ThrottledTransport(Transport(), limiter)
+        self.assertEqual(transport.request('u', 'b', {}), ({}, 'ok'))
+        transport.request('u', 'b', {})
+        self.assertEqual(clock.slept, [1.0])
+
+
+if __name__ == 'main':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+import sys
+sys.path += ["../rdio"]
+from timing import CallTimes, TimingTransport, percentile
+
+
+class TimingTest(unittest.TestCase):
+
+    def test_percentile(self):
+        values = range(100, 0, -1)
+        self.assertEqual(percentile(values, 0.5), 51)
+        self.assertEqual(percentile(values, 0.99), 100)
+        self.assertEqual(percentile([], 0.5), 0.0)
+
+    def test_records_per_method(self):
+        class Transport(object):
+            def request(self, url, body, headers):
+                if 'fail' in body: raise IOError()
+                return {'status': '200'}, 'x' * 10
+        transport = TimingTransport(Transport())
+        transport.request('u', 'method=get&keys=a', {})
+        transport.request('u', 'keys=a&method=get', {})
+        self.assertRaises(IOError, transport.request, 'u',
+                          'method=search&fail=1', {})
+        report = transport.times.report()
+        self.assertEqual(report['get']['calls'], 2)
+        self.assertEqual(report['get']['bytes'], 20)
+        self.assertEqual(report['search']['errors'], 1)
+        self.assertTrue('search' in transport.times.summary())
+
+
+if __name__ == 'main':
+    unittest.main()